@@ -12,5 +12,6 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'djangoProject_News_Portal.settings')
+os.environ.setdefault('ASYNC_VIEWS', '1')  # лента, пост и поиск - асинхронные представления (news_portal/urls.py)
 
 application = get_asgi_application()
@@ -0,0 +1,72 @@
+# Сборка CACHES из пространств имен settings.CACHE_NAMESPACES: у каждого свой псевдоним кэша,
+# префикс ключей, TTL, предел размера и вытеснение. Модуль импортируется из settings, поэтому
+# не зависит от приложений и моделей.
+#
+# Политика пространства имен:
+#   TIMEOUT        - время жизни ключа по умолчанию, сек.
+#   MAX_ENTRIES    - предел числа ключей (locmem и file)
+#   CULL_FREQUENCY - при достижении предела вытесняется 1/CULL_FREQUENCY ключей: у locmem -
+#                    давно не читавшиеся (LRU), у file - произвольные; 0 - очистка целиком.
+#                    У redis размер ограничивают TTL и maxmemory-policy сервера
+#   LOCAL          - {'TIMEOUT', 'MAX_ENTRIES'} локального LRU перед общим кэшем в двухуровневом
+#                    режиме (news_portal.tiered_cache); без LOCAL пространство всегда одноуровневое
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'redis': 'django.core.cache.backends.redis.RedisCache',
+}
+
+
+def namespace_cache(name, policy, backend='locmem', location=None):
+    """Элемент CACHES одноуровневого кэша пространства имен name"""
+    if backend not in BACKENDS:
+        raise ImproperlyConfigured(f'Неизвестный CACHE_BACKEND {backend!r}: ожидается {", ".join(BACKENDS)}')
+    config = {'BACKEND': BACKENDS[backend], 'TIMEOUT': policy.get('TIMEOUT', 300), 'KEY_PREFIX': name}
+    if backend == 'redis':
+        config['LOCATION'] = location
+    else:
+        config['LOCATION'] = name if backend == 'locmem' else os.path.join(location, name)
+        config['OPTIONS'] = {'MAX_ENTRIES': policy.get('MAX_ENTRIES', 300),
+                             'CULL_FREQUENCY': policy.get('CULL_FREQUENCY', 3)}
+    return config
+
+
+def build_caches(namespaces, backend='locmem', location=None, two_tier=False, invalidation_url=None):
+    """CACHES для settings; two_tier ставит локальный LRU перед общим кэшем пространств с LOCAL
+    (для locmem не имеет смысла - он и так в памяти процесса)"""
+    caches = {}
+    for name, policy in namespaces.items():
+        shared = namespace_cache(name, policy, backend, location)
+        if two_tier and policy.get('LOCAL') and backend != 'locmem':
+            caches[name] = {
+                'BACKEND': 'news_portal.tiered_cache.TwoTierCache',
+                'LOCATION': name,
+                'TIMEOUT': shared['TIMEOUT'],
+                'OPTIONS': {'SHARED': shared, 'LOCAL': policy['LOCAL'], 'INVALIDATION_URL': invalidation_url,
+                            'CHANNEL': f'cache-invalidation:{name}'},
+            }
+        else:
+            caches[name] = shared
+    return caches
+
+
+def atomic_cache_flag(name, backend, default=False, env=os.environ):
+    """Флаг режима, которому нужен общий кэш с атомарным incr, - redis (очереди голосов и комментов):
+    locmem свой в каждом процессе, у file incr - неатомарные get и set, и оба вытесняют ключи при
+    достижении MAX_ENTRIES. default действует только с redis, с другим бэкендом режим выключен,
+    а включенный переменной окружения name - ошибка"""
+    enabled = env.get(name, '1' if default and backend == 'redis' else '0') == '1'
+    if enabled and backend != 'redis':
+        raise ImproperlyConfigured(f'{name} требует CACHE_BACKEND=redis')
+    return enabled
+
+
+def clear_all():
+    """Очистка всех пространств имен (тесты, бенчмарки)"""
+    from django.core.cache import caches
+    for alias_cache in caches.all():
+        alias_cache.clear()
@@ -14,7 +14,19 @@ app.conf.broker_connection_retry_on_startup = True
 app.conf.beat_schedule = {'send_weekly_messages':
                           {'task':
                            'news_portal.tasks.weekly_mailing',
-                           'schedule': crontab(day_of_week='monday', hour='8', minute='00')}}
+                           'schedule': crontab(day_of_week='monday', hour='8', minute='00')},
+                          'flush_votes':
+                          {'task':
+                           'news_portal.tasks.flush_votes',
+                           'schedule': 10},  # сброс буферизованных голосов (при VOTES_BUFFERED=1)
+                          'flush_comments':
+                          {'task':
+                           'news_portal.tasks.flush_comments',
+                           'schedule': 2},  # запись комментов из очереди пачками
+                          'trim_feeds':
+                          {'task':
+                           'news_portal.tasks.trim_feeds',
+                           'schedule': crontab(hour='4', minute='30')}}  # обрезка персональных лент
 
 # app.conf.beat_schedule = {'hello_world_every_5_sec':
 #                               {'task': 'news_portal.tasks.hello_world',
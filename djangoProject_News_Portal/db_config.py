@@ -0,0 +1,81 @@
+# Сборка DATABASES: основная база 'default', необязательный псевдоним для чтения 'replica'
+# (маршрутизацию выполняет news_portal.db.PrimaryReplicaRouter) и, за внешним пулером, прямое
+# соединение 'direct' для потоковых выборок рассылок. Модуль импортируется из settings,
+# поэтому не зависит от приложений и моделей.
+#
+# Переменные окружения (databases_from_env):
+#   DB_ENGINE             - 'sqlite' (по умолчанию) или 'postgres'
+#   DB_NAME               - файл SQLite или имя базы PostgreSQL; DB_USER, DB_PASSWORD, DB_HOST, DB_PORT
+#   DB_CONN_MAX_AGE       - сколько секунд держать соединение между запросами (0 - новое на каждый
+#                           запрос, 'none' - без ограничения); по умолчанию 60
+#   DB_CONN_HEALTH_CHECKS - проверка постоянного соединения перед первым запросом к базе (по умолчанию 1)
+#   DB_POOLER             - 1: DB_HOST/DB_PORT - внешний пулер (pgbouncer в режиме transaction). Серверные
+#                           курсоры через него не работают и выключаются, а рассылки читают потоком
+#                           через прямое соединение DB_DIRECT_HOST/DB_DIRECT_PORT (псевдоним 'direct')
+#   DB_READ_REPLICA       - 1: псевдоним 'replica' (для postgres - DB_REPLICA_HOST/DB_REPLICA_PORT)
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+READ_ALIAS = 'replica'
+DIRECT_ALIAS = 'direct'
+
+ENGINES = {'sqlite': 'django.db.backends.sqlite3', 'postgres': 'django.db.backends.postgresql'}
+
+
+def _flag(env, name, default='0'):
+    return env.get(name, default) == '1'
+
+
+def _conn_max_age(value):
+    return None if value.lower() == 'none' else int(value)
+
+
+def env_database(env=os.environ, sqlite_path=None):
+    """Настройки основной базы из переменных окружения"""
+    engine = env.get('DB_ENGINE', 'sqlite')
+    if engine not in ENGINES:
+        raise ImproperlyConfigured(f'Неизвестный DB_ENGINE {engine!r}: ожидается {", ".join(ENGINES)}')
+    config = {
+        'ENGINE': ENGINES[engine],
+        'CONN_MAX_AGE': _conn_max_age(env.get('DB_CONN_MAX_AGE', '60')),
+        'CONN_HEALTH_CHECKS': _flag(env, 'DB_CONN_HEALTH_CHECKS', '1'),
+    }
+    if engine == 'sqlite':
+        config['NAME'] = env.get('DB_NAME', sqlite_path)
+        return config
+    config.update({
+        'NAME': env.get('DB_NAME'),
+        'USER': env.get('DB_USER'),
+        'PASSWORD': env.get('DB_PASSWORD'),
+        'HOST': env.get('DB_HOST', 'localhost'),
+        'PORT': env.get('DB_PORT', '5432'),
+        'DISABLE_SERVER_SIDE_CURSORS': _flag(env, 'DB_POOLER'),
+        'OPTIONS': {'connect_timeout': int(env.get('DB_CONNECT_TIMEOUT', '5'))},
+    })
+    return config
+
+
+def build_databases(primary, replica=None, direct=None):
+    """replica - настройки базы для чтения поверх настроек основной: для SQLite достаточно {} (тот же
+    файл, отдельное соединение), для PostgreSQL - HOST/PORT реплики; direct - то же для прямого
+    соединения мимо пулера; None - без псевдонима. В тестах оба псевдонима - зеркала основной базы"""
+    databases = {'default': primary}
+    if replica is not None:
+        databases[READ_ALIAS] = {**primary, **replica, 'TEST': {'MIRROR': 'default'}}
+    if direct is not None:
+        databases[DIRECT_ALIAS] = {**primary, **direct, 'TEST': {'MIRROR': 'default'}}
+    return databases
+
+
+def databases_from_env(env=os.environ, sqlite_path=None):
+    """DATABASES целиком из переменных окружения"""
+    primary = env_database(env, sqlite_path)
+    replica = direct = None
+    if _flag(env, 'DB_READ_REPLICA'):
+        replica = {key: env[f'DB_REPLICA_{key}'] for key in ('HOST', 'PORT') if f'DB_REPLICA_{key}' in env}
+    if primary['ENGINE'] == ENGINES['postgres'] and _flag(env, 'DB_POOLER'):
+        # долгая потоковая выборка идет мимо пулера и не переживает задачу - без CONN_MAX_AGE
+        direct = {'HOST': env.get('DB_DIRECT_HOST', primary['HOST']), 'PORT': env.get('DB_DIRECT_PORT', '5432'),
+                  'DISABLE_SERVER_SIDE_CURSORS': False, 'CONN_MAX_AGE': 0}
+    return build_databases(primary, replica, direct)
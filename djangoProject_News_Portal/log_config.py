@@ -0,0 +1,146 @@
+# Асинхронная запись логов: обработчик запроса только кладет запись в очередь (AsyncQueueHandler),
+# а в файлы ее пишет отдельный поток (BatchingQueueListener) - пачками, со сбросом буфера на диск
+# один раз на пачку. Файловые обработчики (Batched*FileHandler) не сбрасывают буфер после каждой
+# записи - это делает поток-слушатель. JsonFormatter - формат "одна запись - одна строка JSON"
+# для сборщиков логов. Подключение - в settings.LOGGING (ключи handlers и listener обработчика
+# очереди поддерживает logging.config с Python 3.12), элементы для файлов собирает file_handler.
+#
+# Ротация (settings.LOG_ROTATION):
+#   'external' - файлы ротирует logrotate, обработчик (BatchedWatchedFileHandler) заново открывает
+#                переименованный файл. Годится, когда в один файл пишут несколько процессов
+#                (воркеры gunicorn и Celery).
+#   'internal' - ротация по размеру и по времени в самом процессе (RotatingFileHandler и
+#                TimedRotatingFileHandler). Они не рассчитаны на несколько процессов: одновременные
+#                ротации переименовывают файлы друг у друга и теряют записи - только для одного
+#                процесса (runserver, один воркер).
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+from datetime import datetime, timezone
+from logging.handlers import (QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler,
+                              WatchedFileHandler)
+
+from django.core.exceptions import ImproperlyConfigured
+
+# атрибуты, которые есть у любой записи; остальные пришли через extra= и попадают в JSON
+_RECORD_ATTRS = frozenset(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    """Запись одной строкой JSON: время, уровень, логгер, модуль, сообщение, трассировка и поля extra"""
+    def format(self, record):
+        data = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'module': record.module,
+            'message': record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data['exc_info'] = record.exc_text
+        if record.stack_info:
+            data['stack_info'] = record.stack_info
+        data.update((key, value) for key, value in vars(record).items() if key not in _RECORD_ATTRS)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class AsyncQueueHandler(QueueHandler):
+    """Сообщение и трассировка форматируются сразу (аргументы записи могут измениться после
+    возврата из обработчика), а в поток-слушатель уходит запись без ссылок на кадры стека"""
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg, record.args = record.getMessage(), None
+        if record.exc_info:
+            record.exc_text = record.exc_text or logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class _BatchFlushMixin:
+    def flush(self):  # после каждой записи буфер не сбрасывается - это делает flush_batch
+        pass
+
+    def flush_batch(self):
+        with self.lock:
+            if self.stream and hasattr(self.stream, 'flush'):
+                self.stream.flush()
+
+
+class BatchedWatchedFileHandler(_BatchFlushMixin, WatchedFileHandler):
+    """Без ротации: файл переоткрывается, если его переименовал или удалил logrotate"""
+
+
+class BatchedRotatingFileHandler(_BatchFlushMixin, RotatingFileHandler):
+    """Ротация по размеру (maxBytes, backupCount) - только для одного процесса"""
+
+
+class BatchedTimedRotatingFileHandler(_BatchFlushMixin, TimedRotatingFileHandler):
+    """Ротация по времени (when, interval, backupCount) - только для одного процесса"""
+
+
+def file_handler(filename, formatter, rotation='external', level='INFO', **rotate):
+    """Элемент LOGGING['handlers'] для файла; rotate - параметры ротации в режиме 'internal':
+    maxBytes и backupCount (по размеру) или when и backupCount (по времени)"""
+    handler = {'level': level, 'filename': filename, 'encoding': 'utf-8', 'formatter': formatter}
+    if rotation == 'external':
+        handler['class'] = f'{__name__}.BatchedWatchedFileHandler'
+    elif rotation == 'internal':
+        rotating = BatchedTimedRotatingFileHandler if 'when' in rotate else BatchedRotatingFileHandler
+        handler['class'] = f'{__name__}.{rotating.__name__}'
+        handler.update(rotate)
+    else:
+        raise ImproperlyConfigured(f'Неизвестный LOG_ROTATION {rotation!r}: ожидается external или internal')
+    return handler
+
+
+class BatchingQueueListener(QueueListener):
+    """Поток-слушатель очереди: забирает все накопившиеся записи (не больше batch_size), передает их
+    обработчикам и сбрасывает буферы файлов один раз на пачку. Запускается сразу при настройке
+    логирования, перезапускается в дочернем процессе после fork (воркеры gunicorn с --preload
+    и Celery), при выходе дописывает очередь до конца"""
+    batch_size = 500
+
+    def __init__(self, queue, *handlers, respect_handler_level=False):
+        super().__init__(queue, *handlers, respect_handler_level=respect_handler_level)
+        self.start()
+        atexit.register(self.stop)
+        os.register_at_fork(after_in_child=self._restart_in_child)
+
+    def stop(self):  # повторная остановка (atexit после явной) - ничего не делает
+        if self._thread is not None:
+            super().stop()
+
+    def _restart_in_child(self):
+        # поток родителя в дочерний процесс не копируется, а его блокировка очереди могла остаться
+        # захваченной: очередь пересоздается на месте (обработчик ссылается на тот же объект), без
+        # записей родителя - их запишет сам родитель
+        if isinstance(self.queue, queue.Queue):
+            self.queue.__init__(self.queue.maxsize)
+        self._thread = None
+        self.start()
+
+    def _monitor(self):
+        has_task_done = hasattr(self.queue, 'task_done')
+        stopped = False
+        while not stopped:
+            batch = [self.dequeue(True)]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.dequeue(False))
+                except queue.Empty:
+                    break
+            for record in batch:
+                if record is self._sentinel:
+                    stopped = True
+                else:
+                    self.handle(record)
+            for handler in self.handlers:
+                getattr(handler, 'flush_batch', handler.flush)()
+            if has_task_done:
+                for _ in batch:
+                    self.queue.task_done()
@@ -14,6 +14,10 @@ from dotenv import load_dotenv, find_dotenv  # импорт компоненто
 # для защиты персональных данных и секртных ключей в файле .env
 from pathlib import Path
 
+from .cache_config import build_caches, atomic_cache_flag
+from .db_config import databases_from_env
+from .log_config import file_handler
+
 load_dotenv(find_dotenv())
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -57,11 +61,14 @@ INSTALLED_APPS = [
 SITE_ID = 1
 
 MIDDLEWARE = [
+    'news_portal.profiling.PerformanceBudgetMiddleware',  # выборочные замеры и бюджеты представлений
+    'news_portal.db.ReadOnlyRoutingMiddleware',  # чтение запросов GET - из реплики, если она настроена
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'news_portal.user_cache.CachedAuthenticationMiddleware',  # AuthenticationMiddleware с пользователем из кэша
+    'news_portal.roles.RolesMiddleware',  # request.user_roles: группы и права пользователя из кэша
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 
@@ -114,20 +121,20 @@ WSGI_APPLICATION = 'djangoProject_News_Portal.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        # #настройки при использовании postgres
-        # 'ENGINE': 'django.db.backends.postgresql', # при использовании postgres,
-        # 'HOST': os.getenv('DB_HOST'),
-        # 'PORT': os.getenv('DB_PORT'),
-        # 'USER': os.getenv('DB_USER'),
-        # 'NAME': os.getenv('DB_NAME'),
-        # 'PASSWORD': os.getenv('DB_PASSWORD')
-        # # #
-            # Настройки при использовании sqlite
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'DB_django (2)',
-    }
+# основная база, реплика для чтения и постоянные соединения задаются переменными окружения
+# (DB_ENGINE=sqlite|postgres, DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, DB_CONN_MAX_AGE,
+# DB_POOLER, DB_READ_REPLICA - см. db_config.py); по умолчанию - файл SQLite
+DATABASES = databases_from_env(os.environ, BASE_DIR / 'DB_django (2)')
+DATABASE_ROUTERS = ['news_portal.db.PrimaryReplicaRouter']
+REPLICA_PIN_SECONDS = 5  # сколько клиент читает из основной базы после своего POST (отставание реплики)
+
+# PRAGMA каждого нового соединения с SQLite (news_portal.db.apply_sqlite_pragmas)
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',  # читатели не ждут писателя, писатель - читателей
+    'synchronous': 'NORMAL',  # в режиме WAL безопасно: при сбое питания теряется только последняя транзакция
+    'mmap_size': 256 * 1024 * 1024,  # чтение файла базы через отображение в память
+    'cache_size': -64 * 1024,  # страничный кэш соединения, КиБ (отрицательное значение)
+    'busy_timeout': 5000,  # мс ожидания блокировки до ошибки "database is locked"
 }
 
 
@@ -219,15 +226,60 @@ CELERY_ACCEPT_CONTENT = ['application/json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 
+# рассылка уведомлений подписчикам: размер пачки (одно SMTP-соединение на пачку)
+# и число пачек одной рассылки, отправляемых параллельно
+MAIL_CHUNK_SIZE = 500
+MAIL_FANOUT_PARALLELISM = 4
+
 #------- КЭШ ------------
-# CACHES = {'default':
-#               {'BACKEND':'django.core.cache.backends.filebased.FileBasedCache',
-#                'LOCATION': os.path.join(BASE_DIR, 'cache_files'),  # здесь указывается директория для кэшируемых файлов
-#                'OPTIONS': {'MAX_ENTRIES':1}}}
-#
-# CACHE_MIDDLEWARE_ALIAS = 'default'
-# CACHE_MIDDLEWARE_SECONDS = 60  # здесь задается время жизни кэша
-# CACHE_MIDDLEWARE_KEY_PREFIX = 'news_portal'  # необязательный параметр, который определяет разделение ключей для указанного приложения
+# время жизни кэша (сек.): пост на странице поста и карточки постов в ленте
+POST_CACHE_TIMEOUT = 300
+FRAGMENT_CACHE_TIMEOUT = 600
+CHOICES_CACHE_TIMEOUT = 3600  # список категорий для форм (news_portal.choices)
+
+# бэкенд кэша: 'locmem' (свой в каждом процессе, для разработки и тестов), 'redis' или 'file' -
+# общий для всех воркеров; CACHE_LOCATION - адрес Redis или каталог файлового кэша
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'locmem')
+CACHE_LOCATION = os.getenv('CACHE_LOCATION', 'redis://localhost:6379/1' if CACHE_BACKEND == 'redis'
+                           else str(BASE_DIR / 'cache_files'))
+# двухуровневый режим: локальный LRU в процессе перед общим кэшем для пространств с LOCAL;
+# сообщения о сброшенных ключах рассылаются через Redis (для file - CACHE_INVALIDATION_URL)
+CACHE_TWO_TIER = os.getenv('CACHE_TWO_TIER', '0') == '1'
+CACHE_INVALIDATION_URL = os.getenv('CACHE_INVALIDATION_URL',
+                                   CACHE_LOCATION if CACHE_BACKEND == 'redis' else None)
+# пространства имен кэша (политики описаны в cache_config.py)
+CACHE_NAMESPACES = {
+    # очереди голосов и комментов, роли, варианты форм, статистика профилирования
+    'default': {'TIMEOUT': 300, 'MAX_ENTRIES': 10000},
+    # версионный кэш страницы поста (news_portal.post_cache)
+    'posts': {'TIMEOUT': POST_CACHE_TIMEOUT, 'MAX_ENTRIES': 20000, 'CULL_FREQUENCY': 4,
+              'LOCAL': {'TIMEOUT': 30, 'MAX_ENTRIES': 2000}},
+    # фрагменты шаблонов ({% cache %} сам берет псевдоним template_fragments)
+    'template_fragments': {'TIMEOUT': FRAGMENT_CACHE_TIMEOUT, 'MAX_ENTRIES': 20000, 'CULL_FREQUENCY': 4,
+                           'LOCAL': {'TIMEOUT': 60, 'MAX_ENTRIES': 5000}},
+    # сессии: без локального уровня, чтобы выход из аккаунта сразу действовал во всех воркерах
+    'sessions': {'TIMEOUT': 1209600, 'MAX_ENTRIES': 100000, 'CULL_FREQUENCY': 10},
+    # счетчики ограничения частоты запросов (news_portal.ratelimit), всегда в общем кэше
+    'ratelimit': {'TIMEOUT': 3600, 'MAX_ENTRIES': 100000, 'CULL_FREQUENCY': 10},
+}
+CACHES = build_caches(CACHE_NAMESPACES, CACHE_BACKEND, CACHE_LOCATION, CACHE_TWO_TIER, CACHE_INVALIDATION_URL)
+
+# сессии: 'cached_db' читает из кэша sessions (в базу - только запись и промахи кэша),
+# 'signed_cookies' - данные сессии в подписанной cookie, без хранилища на сервере, 'db' - только база.
+# С locmem-кэшем по умолчанию 'db': выход из аккаунта не сбросил бы сессию в кэше других воркеров
+SESSION_BACKEND = os.getenv('SESSION_BACKEND', 'db' if CACHE_BACKEND == 'locmem' else 'cached_db')
+SESSION_ENGINE = f'django.contrib.sessions.backends.{SESSION_BACKEND}'
+SESSION_CACHE_ALIAS = 'sessions'
+
+# пользователь запроса из кэша (news_portal.user_cache) вместо выборки из базы на каждый запрос;
+# по той же причине только с общим кэшем
+AUTH_USER_CACHE = os.getenv('AUTH_USER_CACHE', '0' if CACHE_BACKEND == 'locmem' else '1') == '1'
+AUTH_USER_CACHE_TIMEOUT = 300
+
+# время жизни кэша групп и прав пользователя (news_portal.roles), сек. Сигналы сбрасывают его
+# только в кэше своего воркера, поэтому с locmem кэш живет несколько секунд: отнятое право
+# перестает действовать в остальных воркерах почти сразу, а не через час
+ROLES_CACHE_TIMEOUT = int(os.getenv('ROLES_CACHE_TIMEOUT', 5 if CACHE_BACKEND == 'locmem' else 3600))
 
 SOCIALACCOUNT_PROVIDERS = {'yandex':
                                {'APP':
@@ -246,7 +298,72 @@ APSCHEDULER_DATETIME_FORMAT = "N j, Y, f:s a"
 # # если задача не выполняется за 25 секунд, то она автоматически снимается, можете поставить время побольше, но как правило, это сильно бьёт по производительности сервера
 APSCHEDULER_RUN_NOW_TIMEOUT = 25  # Seconds
 
+# файл, в котором команда recompute_ratings хранит время последнего пересчета рейтингов
+RECOMPUTE_RATINGS_STATE_FILE = BASE_DIR / 'recompute_ratings.state'
+
+# лайки/дизлайки: при True голоса копятся в кэше и сбрасываются в БД пачками задачей flush_votes.
+# Нужен общий кэш с атомарным incr - redis (cache_config.atomic_cache_flag)
+VOTES_BUFFERED = atomic_cache_flag('VOTES_BUFFERED', CACHE_BACKEND)
+VOTES_FLUSH_BATCH = 500  # сколько объектов обновляется одним UPDATE
+
+# комменты ставятся в очередь и пишутся пачками задачей flush_comments (news_portal.comments).
+# Очереди нужен общий кэш с атомарным incr: по умолчанию она включена только с redis,
+# с locmem и file комменты пишутся сразу
+COMMENTS_QUEUED = atomic_cache_flag('COMMENTS_QUEUED', CACHE_BACKEND, default=True)
+COMMENTS_FLUSH_BATCH = 500  # сколько комментов пишется одним bulk_create
+
+# ограничение частоты запросов (news_portal.ratelimit): "число/s|m|h|d" на пользователя
+# (анонимного - на IP-адрес, вход - всегда на IP-адрес); действуют только перечисленные лимиты
+RATE_LIMIT_ENABLED = True
+RATE_LIMITS = {
+    # публикаций в сутки (как прежняя проверка COUNT по постам автора); строгим лимит будет только
+    # с общим CACHE_BACKEND (redis, file): с locmem у каждого воркера и после перезапуска - свой счет
+    'create_post': '4/d',
+    'comment': '10/m',  # комментов (API и запись очереди комментов)
+    'subscribe': '10/m',  # изменений подписок
+    'search': '60/m',  # запросов к поиску
+    'login': '10/m',  # попыток входа
+}
+
+# курсорная пагинация ленты (без OFFSET и COUNT(*)); при False она включается только параметром ?cursor=
+KEYSET_PAGINATION = False
+
+# асинхронные представления ленты, поста и поиска; включаются в asgi.py, под WSGI не нужны
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', '0') == '1'
+
+# максимальная длина персональной ленты "мои категории" (news_portal.feed)
+FEED_MAX_LENGTH = 200
+
+# сжатое хранение текста длинных статей (news_portal.fields): размер текста в байтах, начиная
+# с которого он хранится сжатым; None - сжатие выключено. Уже сохраненные посты переписывает
+# команда recompress_post_content
+POST_CONTENT_COMPRESS_MIN_LENGTH = None
+
+# полнотекстовый поиск: 'auto' (FTS5 для sqlite, tsvector для postgres), 'fts5', 'postgres' или 'regex'
+SEARCH_BACKEND = 'auto'
+SEARCH_MAX_RESULTS = 1000  # сколько самых релевантных постов возвращает поиск
+
+# замеры производительности (news_portal.profiling.PerformanceBudgetMiddleware):
+# доля замеряемых запросов, замер пиковой памяти (дорого) и бюджеты по имени url
+PERF_SAMPLE_RATE = 0.05
+PERF_TRACE_MEMORY = False
+PERF_BUDGETS = {
+    'main_page': {'time_ms': 300, 'queries': 12},
+    'post_detail': {'time_ms': 200, 'queries': 10},
+    'search_post': {'time_ms': 300, 'queries': 10},
+    'edit_post': {'time_ms': 300, 'queries': 12},
+}
+
 # ЛОГГИРОВАНИЕ
+# файлы пишет отдельный поток пачками (djangoProject_News_Portal.log_config): логгеры отдают записи
+# обработчикам *_queue, те - в очередь. LOG_FORMAT=json - файлы в формате "строка JSON на запись"
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')
+# ротация: 'external' - logrotate (в файлы пишут несколько процессов), 'internal' - в процессе,
+# только для одного процесса (runserver, один воркер); подробнее - в log_config.py
+LOG_ROTATION = os.getenv('LOG_ROTATION', 'external')
+LOG_MAX_BYTES = 10 * 1024 * 1024  # 'internal': ротация general.log и errors.log по размеру
+LOG_BACKUP_COUNT = 5
+LOG_SECURITY_DAYS = 30  # 'internal': security.log ротируется в полночь, хранится столько дней
 
 LOGGING = {
     'version': 1,
@@ -280,7 +397,10 @@ LOGGING = {
         'mail': {
             'format': '{asctime} - {levelname} - {message} - {pathname}',
             'style': '{'
-        }
+        },
+        'json': {
+            '()': 'djangoProject_News_Portal.log_config.JsonFormatter',
+        },
     },
     'filters': {
         'require_debug_true': {
@@ -310,23 +430,33 @@ LOGGING = {
             'formatter': 'console_error'
         },
         'general_file': {
+            **file_handler('logs/general.log', 'json' if LOG_FORMAT == 'json' else 'general', LOG_ROTATION,
+                           maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT),
+            'filters': ['require_debug_false'],
+        },
+        'errors_file': file_handler('logs/errors.log', 'json' if LOG_FORMAT == 'json' else 'errors', LOG_ROTATION,
+                                    level='ERROR', maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT),
+        'security_file': file_handler('logs/security.log', 'json' if LOG_FORMAT == 'json' else 'security',
+                                      LOG_ROTATION, when='midnight', backupCount=LOG_SECURITY_DAYS),
+        # очереди перед файлами: запрос не ждет записи на диск
+        'general_queue': {
             'level': 'INFO',
             'filters': ['require_debug_false'],
-            'class': 'logging.FileHandler',
-            'filename': 'logs/general.log',
-            'formatter': 'general'
+            'class': 'djangoProject_News_Portal.log_config.AsyncQueueHandler',
+            'handlers': ['general_file'],
+            'listener': 'djangoProject_News_Portal.log_config.BatchingQueueListener',
         },
-        'errors_file': {
+        'errors_queue': {
             'level': 'ERROR',
-            'class': 'logging.FileHandler',
-            'filename': 'logs/errors.log',
-            'formatter': 'errors'
+            'class': 'djangoProject_News_Portal.log_config.AsyncQueueHandler',
+            'handlers': ['errors_file'],
+            'listener': 'djangoProject_News_Portal.log_config.BatchingQueueListener',
         },
-        'security_file': {
+        'security_queue': {
             'level': 'INFO',
-            'class': 'logging.FileHandler',
-            'filename': 'logs/security.log',
-            'formatter': 'security'
+            'class': 'djangoProject_News_Portal.log_config.AsyncQueueHandler',
+            'handlers': ['security_file'],
+            'listener': 'djangoProject_News_Portal.log_config.BatchingQueueListener',
         },
         'mail_admins': {
             'level': 'ERROR',
@@ -337,34 +467,39 @@ LOGGING = {
     },
     'loggers': {
         'django': {
-            'handlers': ['console_debug', 'console_warning', 'console_error', 'general_file'],
+            'handlers': ['console_debug', 'console_warning', 'console_error', 'general_queue'],
             'level': 'DEBUG',
             'propagate': True,
         },
         'django.request': {
-            'handlers': ['errors_file', 'mail_admins'],
+            'handlers': ['errors_queue', 'mail_admins'],
             'level': 'ERROR',
             'propagate': False,
         },
         'django.server': {
-            'handlers': ['errors_file', 'mail_admins'],
+            'handlers': ['errors_queue', 'mail_admins'],
             'level': 'ERROR',
             'propagate': False,
         },
         'django.template': {
-            'handlers': ['errors_file'],
+            'handlers': ['errors_queue'],
             'level': 'ERROR',
             'propagate': False,
         },
         'django.db.backends': {
-            'handlers': ['errors_file'],
+            'handlers': ['errors_queue'],
             'level': 'ERROR',
             'propagate': False,
         },
         'django.security': {
-            'handlers': ['security_file'],
+            'handlers': ['security_queue'],
             'level': 'INFO',
             'propagate': False,
         },
+        'news_portal.performance': {
+            'handlers': ['console_warning', 'general_queue'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
     }
 }
\ No newline at end of file
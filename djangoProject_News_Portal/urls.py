@@ -16,11 +16,15 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
+from allauth.account.views import login as account_login
+from news_portal.ratelimit import ratelimit
 
 urlpatterns = [
    path('admin/', admin.site.urls),
    path('sign/', include('sign.urls')),
    path('', include('protect.urls')),
+   # попытки входа ограничиваются по IP-адресу (settings.RATE_LIMITS['login'])
+   path('accounts/login/', ratelimit('login', by='ip', methods=('POST',))(account_login), name='account_login'),
    path('accounts/', include('allauth.urls')),
    path('pages/', include('django.contrib.flatpages.urls')),
    path('cuda/', include('django.contrib.flatpages.urls')),
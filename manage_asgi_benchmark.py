@@ -0,0 +1,157 @@
+"""
+Нагрузочный тест ленты, страницы поста и поиска: WSGI (gunicorn, потоки) против ASGI (uvicorn,
+асинхронные представления). Для каждого сервера замеряются запросы в секунду и задержки p50/p99.
+Запуск: python manage_asgi_benchmark.py [--clients 500] [--duration 30] [--workers 1] [--threads 32]
+Нужны пакеты gunicorn и uvicorn. Работает на отдельной SQLite базе (bench_asgi.sqlite3).
+Клиент - простой HTTP/1.1 клиент на asyncio с keep-alive, по соединению на клиента.
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from manage_index_benchmark import BASE_DIR, use_bench_database, seed_database
+
+BENCH_DB = BASE_DIR / 'bench_asgi.sqlite3'
+HOST = '127.0.0.1'
+# настройки серверов: рабочие настройки проекта на отдельной базе, без отладки и выборочных замеров
+SETTINGS = f'''from djangoProject_News_Portal.settings import *
+DATABASES['default']['NAME'] = {str(BENCH_DB)!r}
+DEBUG = False
+ALLOWED_HOSTS = ['*']
+PERF_SAMPLE_RATE = 0.0
+'''
+
+
+def create_session(user_id=1):
+    """Сессия вошедшего пользователя для cookie sessionid"""
+    from django.contrib.auth import SESSION_KEY, BACKEND_SESSION_KEY, HASH_SESSION_KEY
+    from django.contrib.auth.models import User
+    from django.contrib.sessions.backends.db import SessionStore
+    user = User.objects.get(pk=user_id)
+    session = SessionStore()
+    session[SESSION_KEY] = str(user.pk)
+    session[BACKEND_SESSION_KEY] = 'django.contrib.auth.backends.ModelBackend'
+    session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    session.create()
+    return session.session_key
+
+
+def urls(n_posts):
+    rnd = random.Random(7)
+    while True:
+        yield rnd.choice(['/news/', '/news/?page=2', f'/news/{rnd.randint(1, n_posts)}/',
+                          '/news/search/?search_title=%D0%BD%D0%B0%D1%83%D0%BA%D0%B0'])
+
+
+async def fetch(reader, writer, path, cookie):
+    writer.write(f'GET {path} HTTP/1.1\r\nHost: {HOST}\r\nCookie: sessionid={cookie}\r\n\r\n'.encode())
+    await writer.drain()
+    head = await reader.readuntil(b'\r\n\r\n')
+    status = int(head.split(b' ', 2)[1])
+    headers = dict(line.split(b':', 1) for line in head.split(b'\r\n')[1:] if b':' in line)
+    length = {key.strip().lower(): value for key, value in headers.items()}.get(b'content-length')
+    if length is None:
+        raise RuntimeError('ответ без Content-Length')
+    await reader.readexactly(int(length))
+    return status
+
+
+async def client(port, cookie, deadline, paths, latencies, errors):
+    reader, writer = await asyncio.open_connection(HOST, port)
+    try:
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                status = await fetch(reader, writer, next(paths), cookie)
+            except (OSError, asyncio.IncompleteReadError, RuntimeError):
+                errors.append(1)
+                writer.close()
+                reader, writer = await asyncio.open_connection(HOST, port)
+                continue
+            if status == 200:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors.append(status)
+    finally:
+        writer.close()
+
+
+async def load(port, cookie, clients, duration, n_posts):
+    latencies, errors = [], []
+    paths = urls(n_posts)
+    deadline = time.perf_counter() + duration
+    started = time.perf_counter()
+    await asyncio.gather(*(client(port, cookie, deadline, paths, latencies, errors) for _ in range(clients)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        'rps': len(latencies) / elapsed,
+        'p50': statistics.median(latencies) * 1000 if latencies else None,
+        'p99': latencies[int(len(latencies) * 0.99) - 1] * 1000 if latencies else None,
+        'requests': len(latencies),
+        'errors': len(errors),
+    }
+
+
+def wait_for_port(port, timeout=30):
+    import socket
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection((HOST, port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'Сервер на порту {port} не запустился')
+
+
+def run_server(command, port, settings_dir, **options):
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE='bench_settings',
+               PYTHONPATH=os.pathsep.join([str(settings_dir), str(BASE_DIR)]))
+    server = subprocess.Popen(command, cwd=BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_port(port)
+        return asyncio.run(load(port, **options))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--clients', type=int, default=500)
+    parser.add_argument('--duration', type=int, default=30, help='секунд на каждый сервер')
+    parser.add_argument('--workers', type=int, default=1, help='процессов сервера')
+    parser.add_argument('--threads', type=int, default=32, help='потоков на процесс gunicorn')
+    parser.add_argument('--posts', type=int, default=10_000)
+    args = parser.parse_args()
+
+    use_bench_database(BENCH_DB)
+    seed_database(args.posts, n_users=1_000, n_authors=100)
+    cookie = create_session()
+    options = {'cookie': cookie, 'clients': args.clients, 'duration': args.duration, 'n_posts': args.posts}
+
+    with tempfile.TemporaryDirectory() as settings_dir:
+        Path(settings_dir, 'bench_settings.py').write_text(SETTINGS)
+        results = {
+            f'WSGI gunicorn ({args.workers}x{args.threads} потоков)': run_server(
+                [sys.executable, '-m', 'gunicorn', 'djangoProject_News_Portal.wsgi:application', '-k', 'gthread',
+                 '-w', str(args.workers), '--threads', str(args.threads), '-b', f'{HOST}:8101',
+                 '--backlog', '2048'], 8101, settings_dir, **options),
+            f'ASGI uvicorn ({args.workers} процесс.)': run_server(
+                [sys.executable, '-m', 'uvicorn', 'djangoProject_News_Portal.asgi:application', '--host', HOST,
+                 '--port', '8102', '--workers', str(args.workers), '--no-access-log', '--backlog', '2048'],
+                8102, settings_dir, **options),
+        }
+
+    print(f"\n{'='*80}\n{args.clients} клиентов, {args.duration} сек на сервер\n{'='*80}")
+    for name, result in results.items():
+        print(f"{name}: {result['rps']:.1f} запросов/сек, p50 {result['p50'] or 0:.1f} мс, "
+              f"p99 {result['p99'] or 0:.1f} мс, ответов {result['requests']}, ошибок {result['errors']}")
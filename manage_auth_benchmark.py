@@ -0,0 +1,102 @@
+"""
+Бенчмарк цены авторизации на запрос вошедшего пользователя: сессии в базе и пользователь из базы
+(как было) против сессий cached_db / signed_cookies и пользователя из кэша (news_portal.user_cache).
+1) Только стек middleware (сессии, авторизация, роли, allauth) вокруг представления-пустышки.
+2) Страница ленты main_page целиком.
+Для каждого варианта - мкс на запрос (медиана из 5 прогонов) и число SQL-запросов.
+Кэш - LocMem в процессе, что для одного процесса равноценно общему кэшу без сетевой задержки.
+Запуск: python manage_auth_benchmark.py [--requests 2000] [--posts 200000]
+"""
+import argparse
+import statistics
+import time
+
+from manage_index_benchmark import use_bench_database, seed_database
+
+SESSION_ENGINES = 'django.contrib.sessions.backends.'
+VARIANTS = {
+    'db + AuthenticationMiddleware (было)': ('db', 'django.contrib.auth.middleware.AuthenticationMiddleware', False),
+    'cached_db + пользователь из кэша': ('cached_db', 'news_portal.user_cache.CachedAuthenticationMiddleware', True),
+    'signed_cookies + пользователь из кэша': ('signed_cookies', 'news_portal.user_cache.CachedAuthenticationMiddleware',
+                                             True),
+}
+AUTH_STACK = ['django.contrib.sessions.middleware.SessionMiddleware', None, 'news_portal.roles.RolesMiddleware',
+              'allauth.account.middleware.AccountMiddleware']
+
+
+def per_request(func, n):
+    """Медиана из 5 прогонов, мкс на вызов, и число SQL-запросов одного вызова"""
+    from django.db import connection
+    queries = []
+
+    def count(execute, sql, params, many, context):  # CaptureQueriesContext сбросил бы сигнал начала запроса
+        queries.append(sql)
+        return execute(sql, params, many, context)
+
+    func()  # прогрев кэшей
+    with connection.execute_wrapper(count):
+        func()
+    runs = []
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(n):
+            func()
+        runs.append((time.perf_counter() - start) / n * 1e6)
+    return statistics.median(runs), len(queries)
+
+
+def auth_stack(middleware):
+    """Цепочка middleware авторизации вокруг представления, которое только читает request.user"""
+    from django.http import HttpResponse
+    from django.utils.module_loading import import_string
+
+    def view(request):
+        return HttpResponse(str(request.user.is_authenticated))
+
+    handler = view
+    for path in reversed([middleware if path is None else path for path in AUTH_STACK]):
+        handler = import_string(path)(handler)
+    return handler
+
+
+def run(n):
+    from django.contrib.auth.models import User
+    from django.conf import settings
+    from django.test import Client, RequestFactory, override_settings
+    from djangoProject_News_Portal.cache_config import clear_all
+
+    user = User.objects.get(pk=1)
+    results = {}
+    for name, (engine, middleware, user_cache) in VARIANTS.items():
+        middleware_list = [middleware if 'AuthenticationMiddleware' in path else path for path in settings.MIDDLEWARE]
+        with override_settings(SESSION_ENGINE=SESSION_ENGINES + engine, AUTH_USER_CACHE=user_cache,
+                               MIDDLEWARE=middleware_list, ALLOWED_HOSTS=['*'], PERF_SAMPLE_RATE=0.0):
+            clear_all()
+            client = Client()
+            client.force_login(user)
+            cookie = client.cookies[settings.SESSION_COOKIE_NAME].value
+            handler = auth_stack(middleware)
+
+            def stack_request():
+                request = RequestFactory().get('/news/')
+                request.COOKIES[settings.SESSION_COOKIE_NAME] = cookie
+                handler(request)
+
+            results[name] = (per_request(stack_request, n), per_request(lambda: client.get('/news/'), n // 10))
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--posts', type=int, default=200_000)
+    args = parser.parse_args()
+
+    use_bench_database()
+    seed_database(args.posts)
+    results = run(args.requests)
+    for title, index in (('Стек middleware авторизации (представление-пустышка)', 0), ('Лента main_page', 1)):
+        print(f"\n{'='*80}\n{title}\n{'='*80}")
+        for name, measures in results.items():
+            micros, queries = measures[index]
+            print(f'{name}: {micros:.1f} мкс, SQL-запросов: {queries}')
@@ -0,0 +1,125 @@
+"""
+Бенчмарк выборок ленты с длинными статьями: сколько байт данных передает база на страницу ленты
+с полным текстом постов (как было) и с defer('content') и сохраненным превью (как стало),
+а также объем хранения и чтение текста при сжатом хранении длинных статей.
+Запуск: python manage_content_benchmark.py [--posts 2000] [--min-length 2048]
+Работает на отдельной SQLite базе (bench_content.sqlite3), база создается заново при каждом запуске.
+"""
+import argparse
+import random
+import statistics
+import time
+import tracemalloc
+
+from manage_index_benchmark import BASE_DIR, WORDS, use_bench_database
+
+BENCH_DB = BASE_DIR / 'bench_content.sqlite3'
+PAGE_SIZE = 10
+PAGES = 20
+
+
+def seed(n_posts):
+    from django.core.management import call_command
+    from django.contrib.auth.models import User
+    from news_portal.models import Post, Author
+
+    call_command('migrate', run_syncdb=True, verbosity=0)
+    rnd = random.Random(5)
+    author = Author.objects.create(user=User.objects.create(username='bench_author'))
+    # статьи от 2 до 40 КБ: средний размер ~20 КБ текста в UTF-8
+    posts = [Post(author=author, title=f'{rnd.choice(WORDS).capitalize()} {i}',
+                  content=' '.join(rnd.choice(WORDS) for _ in range(rnd.randint(100, 2000))))
+             for i in range(n_posts)]
+    Post.objects.bulk_create(posts, batch_size=500)
+
+
+def row_bytes(value):
+    if value is None:
+        return 0
+    if isinstance(value, str):
+        return len(value.encode())
+    if isinstance(value, bytes):
+        return len(value)
+    return 8  # числа и даты
+
+
+def measure_pages(queryset):
+    """Байт в строках результата, время и пик памяти на страницу ленты (среднее по PAGES страницам)"""
+    from django.db import connection
+    sizes, timings, peaks = [], [], []
+    for page in range(PAGES):
+        page_qs = queryset[page * PAGE_SIZE:(page + 1) * PAGE_SIZE]
+        sql, params = page_qs.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            sizes.append(sum(row_bytes(value) for row in cursor.fetchall() for value in row))
+        tracemalloc.start()
+        start = time.perf_counter()
+        posts = list(page_qs)
+        timings.append((time.perf_counter() - start) * 1000)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        assert all(post.preview for post in posts)
+    return statistics.mean(sizes), statistics.mean(timings), statistics.mean(peaks)
+
+
+def stored_content_bytes():
+    from django.db import connection
+    from news_portal.models import Post
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT SUM(LENGTH(CAST(content AS BLOB))) FROM {Post._meta.db_table}')
+        return cursor.fetchone()[0]
+
+
+def measure_detail(n_posts, repeat=200):
+    """Чтение текста одного поста (страница поста): байт из базы и время с распаковкой"""
+    from django.db import connection
+    from news_portal.models import Post
+    rnd = random.Random(9)
+    ids = list(Post.objects.values_list('pk', flat=True))
+    sizes, timings = [], []
+    for _ in range(repeat):
+        pk = rnd.choice(ids)
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT content FROM {Post._meta.db_table} WHERE id = %s', [pk])
+            sizes.append(row_bytes(cursor.fetchone()[0]))
+        start = time.perf_counter()
+        Post.objects.only('content').get(pk=pk).content
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.mean(sizes), statistics.mean(timings)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--posts', type=int, default=2000)
+    parser.add_argument('--min-length', type=int, default=2048, help='порог сжатия текста, байт')
+    args = parser.parse_args()
+
+    BENCH_DB.unlink(missing_ok=True)
+    use_bench_database(BENCH_DB)
+    from io import StringIO
+    from django.conf import settings
+    from django.core.management import call_command
+    from news_portal.models import Post
+
+    print(f'Заполнение базы: {args.posts} постов...')
+    seed(args.posts)
+    feed = Post.objects.select_related('author', 'author__user').order_by('-create_time')
+    results = {
+        'лента: полный текст постов (до)': measure_pages(feed),
+        "лента: defer('content') + превью (после)": measure_pages(feed.defer('content')),
+    }
+    plain_storage, plain_detail = stored_content_bytes(), measure_detail(args.posts)
+
+    settings.POST_CONTENT_COMPRESS_MIN_LENGTH = args.min_length
+    call_command('recompress_post_content', stdout=StringIO())
+    results['лента: полный текст, сжатое хранение'] = measure_pages(feed)
+    compressed_storage, compressed_detail = stored_content_bytes(), measure_detail(args.posts)
+
+    print(f"\n{'='*80}\nСтраница ленты ({PAGE_SIZE} постов), среднее по {PAGES} страницам\n{'='*80}")
+    for name, (size, timing, peak) in results.items():
+        print(f'{name}: {size / 1024:.1f} КБ из базы, {timing:.2f} мс, пик памяти {peak / 1024:.1f} КБ')
+    print(f"\n{'='*80}\nСжатое хранение текста (порог {args.min_length} байт)\n{'='*80}")
+    print(f'Текст всех постов в базе: {plain_storage / 2 ** 20:.1f} МБ -> {compressed_storage / 2 ** 20:.1f} МБ')
+    print(f'Текст одного поста: {plain_detail[0] / 1024:.1f} КБ, {plain_detail[1]:.2f} мс -> '
+          f'{compressed_detail[0] / 1024:.1f} КБ, {compressed_detail[1]:.2f} мс (с распаковкой)')
@@ -0,0 +1,110 @@
+"""
+Бенчмарк еженедельного дайджеста (my_job из runapscheduler): время на подписчика при росте их числа.
+Запуск: python manage_digest_benchmark.py [размеры ...]  (по умолчанию 1000 10000 100000)
+Прежний алгоритм (запрос на каждого подписчика и проверка дублей по списку) замеряется
+только до 10000 подписчиков - дальше он слишком долгий.
+Работает на отдельной SQLite базе (bench_digest.sqlite3), письма отправляются в память.
+"""
+import sys
+import time
+import random
+from datetime import datetime, timedelta, timezone
+
+from manage_index_benchmark import BASE_DIR, use_bench_database
+
+N_CATEGORIES = 20
+N_POSTS = 300
+OLD_MAX = 10_000
+
+
+def seed_posts():
+    from django.core.management import call_command
+    from django.contrib.auth.models import User
+    from news_portal.models import Post, Author, Category, PostCategory
+
+    call_command('migrate', run_syncdb=True, verbosity=0)
+    rnd = random.Random(1)
+    author = Author.objects.create(user=User.objects.create(username='bench_author'))
+    categories = Category.objects.bulk_create([Category(category=f'Категория {i}') for i in range(N_CATEGORIES)])
+    posts = Post.objects.bulk_create([Post(author=author, title=f'Пост {i}', content='текст')
+                                      for i in range(N_POSTS)])
+    PostCategory.objects.bulk_create([PostCategory(post=post, category=category) for post in posts
+                                      for category in rnd.sample(categories, rnd.randint(1, 2))])
+    # половина постов - старше недели и в дайджест не попадает
+    Post.objects.filter(pk__in=[p.pk for p in posts[::2]]).update(
+        create_time=datetime.now(timezone.utc) - timedelta(days=30))
+
+
+def add_subscribers(start, stop):
+    from django.contrib.auth.models import User
+    from news_portal.models import Category, UserSubcribes
+    rnd = random.Random(start)
+    categories = list(Category.objects.values_list('pk', flat=True))
+    users = User.objects.bulk_create([User(username=f'sub{i}', email=f'sub{i}@test.com', password='!')
+                                      for i in range(start, stop)], batch_size=5000)
+    UserSubcribes.objects.bulk_create([UserSubcribes(subcribe_id=user.pk, category_id=category)
+                                       for user in users for category in rnd.sample(categories, 3)],
+                                      batch_size=5000)
+
+
+def old_my_job():
+    """Прежняя реализация my_job (до перевода на один группирующий запрос)"""
+    from django.conf import settings
+    from django.contrib.auth.models import User
+    from django.core.mail import EmailMultiAlternatives
+    from django.template.loader import render_to_string
+    from news_portal.models import Post, Category
+
+    delta = datetime.now(timezone.utc) - timedelta(days=7)
+    posts = Post.objects.filter(create_time__gte=delta)
+    post_pk = Post.objects.filter(create_time__gte=delta).values_list('pk', flat=True)
+    categories = set(Category.objects.filter(post__in=posts))
+    user_pk = set(User.objects.filter(category__in=categories).values_list('pk', flat=True))
+    for user in User.objects.filter(pk__in=user_pk):
+        post_list, current_post_list = [], []
+        for post in Post.objects.filter(pk__in=post_pk, category__in=categories, category__usersubcribes__subcribe=user):
+            if post not in current_post_list:
+                current_post_list.append(post)
+                post_list.append(post)
+        html = render_to_string('flatpages/mail/scheduler_message.html', {'username': user.username, 'post': post_list})
+        msg = EmailMultiAlternatives(subject='Список публикаций за неделю подписчикам ', body='',
+                                     from_email=settings.DEFAULT_FROM_EMAIL, to=[f'{user.email}'])
+        msg.attach_alternative(html, 'text/html')
+        msg.send()
+
+
+def measure(job):
+    from django.core import mail
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    mail.outbox = []
+    with CaptureQueriesContext(connection) as ctx:
+        start = time.perf_counter()
+        job()
+        elapsed = time.perf_counter() - start
+    return elapsed, len(ctx.captured_queries), len(mail.outbox)
+
+
+if __name__ == '__main__':
+    sizes = sorted(int(arg) for arg in sys.argv[1:]) or [1_000, 10_000, 100_000]
+    db = BASE_DIR / 'bench_digest.sqlite3'
+    db.unlink(missing_ok=True)
+    use_bench_database(db)
+
+    from django.conf import settings
+    settings.EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
+    from news_portal.management.commands.runapscheduler import my_job
+
+    seed_posts()
+    print(f"\n{'='*80}\nДАЙДЖЕСТ: {N_POSTS} постов, {N_CATEGORIES} категорий, 3 подписки на пользователя\n{'='*80}")
+    current = 0
+    for size in sizes:
+        add_subscribers(current, size)
+        current = size
+        elapsed, queries, mails = measure(my_job)
+        print(f"{size:>8} подписчиков: {elapsed:8.2f} сек, {elapsed / size * 1e6:7.1f} мкс/подписчика, "
+              f"{queries} SQL запросов, писем {mails}")
+        if size <= OLD_MAX:
+            elapsed, queries, mails = measure(old_my_job)
+            print(f"{'':>8} прежний my_job: {elapsed:8.2f} сек, {elapsed / size * 1e6:7.1f} мкс/подписчика, "
+                  f"{queries} SQL запросов, писем {mails}")
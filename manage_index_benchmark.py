@@ -0,0 +1,201 @@
+"""
+Бенчмарк индексов: планы запросов и время выполнения до и после создания индексов.
+Запуск: python manage_index_benchmark.py [количество_постов]  (по умолчанию 1 000 000)
+Работает на отдельной SQLite базе (bench_db.sqlite3), рабочая база проекта не затрагивается.
+"""
+import os
+import sys
+import django
+import random
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+# Настройка Django окружения на отдельной базе
+BASE_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BASE_DIR))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'djangoProject_News_Portal.settings')
+BENCH_DB = BASE_DIR / 'bench_db.sqlite3'
+# словарь для заголовков тестовых постов (нужен, чтобы поиск по словам был осмысленным)
+WORDS = ['новости', 'технологии', 'наука', 'спорт', 'экономика', 'политика', 'культура', 'погода',
+         'здоровье', 'образование', 'космос', 'автомобили', 'финансы', 'путешествия', 'история']
+
+
+def use_bench_database(path=BENCH_DB):
+    """Переключение базы по умолчанию на отдельный файл (до первого подключения к БД)"""
+    from django.conf import settings
+    settings.DATABASES['default']['NAME'] = path
+    django.setup()
+
+
+def seed_database(n_posts, n_users=10_000, n_authors=1_000, n_categories=20, n_comments=None, batch=50_000):
+    """Заполнение базы тестовыми данными сырыми INSERT пачками (ORM здесь слишком медленный)"""
+    from django.core.management import call_command
+    from django.db import connection, transaction
+    from django.contrib.auth.models import User
+    from news_portal.models import Post, Author, Category, PostCategory, Comment, UserSubcribes
+
+    call_command('migrate', run_syncdb=True, verbosity=0)
+    if Post.objects.count() >= n_posts:
+        print(f"База уже заполнена: {Post.objects.count()} постов")
+        return
+    n_comments = n_posts // 5 if n_comments is None else n_comments
+    print(f"Заполнение базы: {n_posts} постов, {n_users} пользователей, {n_comments} комментов...")
+
+    rnd = random.Random(42)
+    now = datetime.now(timezone.utc)
+    dt = connection.ops.adapt_datetimefield_value
+
+    def insert(model, columns, rows):
+        sql = (f'INSERT INTO {model._meta.db_table} ({", ".join(columns)}) '
+               f'VALUES ({", ".join(["%s"] * len(columns))})')
+        with connection.cursor() as cursor:
+            for i in range(0, len(rows), batch):
+                cursor.executemany(sql, rows[i:i + batch])
+
+    with transaction.atomic():
+        insert(User, ['id', 'username', 'email', 'password', 'first_name', 'last_name', 'is_superuser',
+                      'is_staff', 'is_active', 'date_joined'],
+               [(i, f'user{i}', f'user{i}@test.com', '!', '', '', False, False, True, dt(now))
+                for i in range(1, n_users + 1)])
+        insert(Author, ['id', 'user_id', 'raiting'], [(i, i, 0) for i in range(1, n_authors + 1)])
+        insert(Category, ['id', 'category'], [(i, f'Категория {i}') for i in range(1, n_categories + 1)])
+        insert(UserSubcribes, ['subcribe_id', 'category_id'],
+               [(u, c) for u in range(1, n_users + 1)
+                for c in rnd.sample(range(1, n_categories + 1), 3)])
+
+    for start in range(1, n_posts + 1, batch):
+        stop = min(start + batch, n_posts + 1)
+        with transaction.atomic():
+            rows, links = [], []
+            for pk in range(start, stop):
+                created = dt(now - timedelta(minutes=rnd.randint(0, 2 * 365 * 24 * 60)))
+                content = f'Содержание поста {pk}. ' * 20
+                rows.append((pk, rnd.randint(1, n_authors), 'NS', created, created,
+                             f'{rnd.choice(WORDS).capitalize()} и {rnd.choice(WORDS)} {pk}',
+                             content, content[:124], 0, 0, ''))
+                for c in rnd.sample(range(1, n_categories + 1), rnd.randint(1, 2)):
+                    links.append((pk, c))
+            insert(Post, ['id', 'author_id', 'postType', 'create_time', 'update_time', 'title', 'content',
+                          'preview', 'raiting', 'comment_count', 'category_labels'], rows)
+            insert(PostCategory, ['post_id', 'category_id'], links)
+        print(f"  ...{stop - 1} постов")
+
+    with transaction.atomic():
+        rows = []
+        for i in range(n_comments):
+            created = dt(now - timedelta(minutes=rnd.randint(0, 2 * 365 * 24 * 60)))
+            rows.append((rnd.randint(1, n_posts), rnd.randint(1, n_users), 'коммент', created, created, 0))
+        insert(Comment, ['post_id', 'user_id', 'comment_text', 'create_time', 'update_time', 'raiting'], rows)
+    # счетчики комментов и подписи категорий (сырые INSERT идут в обход сигналов)
+    from news_portal import counters
+    with transaction.atomic():
+        counters.reconcile_comment_counts()
+        counters.refresh_labels()
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    print("База заполнена")
+
+
+def benchmark_queries():
+    """Набор запросов, которые выполняют представления и задачи проекта"""
+    from django.db.models import Count
+    from news_portal.models import Post, Comment, UserSubcribes
+
+    now = datetime.now(timezone.utc)
+    post = Post.objects.order_by('-create_time').only('pk').first()
+    return {
+        'Лента (PostsList)': lambda: list(Post.objects.select_related('author', 'author__user')
+                                          .order_by('-create_time', '-pk')[:10]),
+        'Лимит постов автора за сутки (create_post)':
+            lambda: Post.objects.filter(create_time__gte=now - timedelta(days=1), author__user_id=1).count(),
+        'Посты автора': lambda: list(Post.objects.filter(author_id=1).order_by('-create_time')[:10]),
+        'Неделя публикаций (weekly_mailing)':
+            lambda: Post.objects.filter(create_time__gte=now - timedelta(days=7))
+                                .values('pk', 'category__subscribers__id').count(),
+        'Комменты к посту (PostDetail)':
+            lambda: list(Comment.objects.filter(post_id=post.pk).order_by('create_time')),
+        'Подписчики категории': lambda: UserSubcribes.objects.filter(category_id=1).count(),
+        'Постов в категориях': lambda: list(Post.objects.filter(category__id=1).aggregate(n=Count('pk')).values()),
+    }
+
+
+def measure(queries, repeat=5):
+    results = {}
+    for name, query in queries.items():
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            query()
+            timings.append(time.perf_counter() - start)
+        results[name] = statistics.median(timings)
+    return results
+
+
+def explain(queries):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    plans = {}
+    for name, query in queries.items():
+        with CaptureQueriesContext(connection) as ctx:
+            query()
+        sql = ctx.captured_queries[-1]['sql']
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}' if connection.vendor == 'sqlite' else f'EXPLAIN {sql}')
+            plans[name] = [' '.join(str(col) for col in row[-1:]) for row in cursor.fetchall()]
+    return plans
+
+
+def project_indexes():
+    """Индексы и ограничения, объявленные в Meta моделей приложения"""
+    from django.apps import apps
+    # ограничения идут первыми: на SQLite их удаление пересоздает таблицу вместе с индексами из Meta
+    for model in apps.get_app_config('news_portal').get_models():
+        for constraint in model._meta.constraints:
+            yield model, 'constraint', constraint
+    for model in apps.get_app_config('news_portal').get_models():
+        for index in model._meta.indexes:
+            yield model, 'index', index
+
+
+def set_indexes(enabled):
+    from django.db import connection
+    with connection.schema_editor() as editor:
+        for model, kind, obj in project_indexes():
+            with connection.cursor() as cursor:
+                exists = obj.name in connection.introspection.get_constraints(cursor, model._meta.db_table)
+            if enabled and not exists:
+                editor.add_index(model, obj) if kind == 'index' else editor.add_constraint(model, obj)
+            elif not enabled and exists:
+                editor.remove_index(model, obj) if kind == 'index' else editor.remove_constraint(model, obj)
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+
+def print_report(title, timings, plans):
+    print(f"\n{'='*80}\n{title}\n{'='*80}")
+    for name, seconds in timings.items():
+        print(f"{name}: {seconds * 1000:.2f} мс")
+        for line in plans[name]:
+            print(f"      {line}")
+
+
+if __name__ == '__main__':
+    n_posts = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    use_bench_database()
+    seed_database(n_posts)
+
+    queries = benchmark_queries()
+    set_indexes(False)
+    before = measure(queries)
+    print_report("БЕЗ ИНДЕКСОВ", before, explain(queries))
+
+    set_indexes(True)
+    after = measure(queries)
+    print_report("С ИНДЕКСАМИ", after, explain(queries))
+
+    print(f"\n{'='*80}\nСРАВНЕНИЕ\n{'='*80}")
+    for name in queries:
+        speedup = before[name] / after[name] if after[name] else float('inf')
+        print(f"{name}: {before[name] * 1000:.2f} мс -> {after[name] * 1000:.2f} мс (x{speedup:.1f})")
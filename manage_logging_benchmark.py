@@ -0,0 +1,127 @@
+"""
+Бенчмарк цены логирования для запроса: прежние logging.FileHandler (запись и flush на диск в потоке
+запроса) против очереди AsyncQueueHandler с потоком-слушателем и пачечной записью
+(djangoProject_News_Portal.log_config).
+1) Время одного вызова logger.info в вызывающем потоке: среднее и p99.
+2) Лента main_page, во время которой пишется --records записей (так пишет логгер django на уровне
+   DEBUG): время ответа без логов и с каждым из вариантов.
+Логи пишутся во временный каталог, запись которого обычно попадает в страничный кэш ОС и почти
+ничего не стоит. Медленное хранилище (сетевой диск, диск под нагрузкой) имитирует --flush-delay-ms:
+каждый сброс буфера файла на диск дополнительно ждет столько миллисекунд.
+Запуск: python manage_logging_benchmark.py [--records 20] [--calls 20000] [--requests 300]
+[--posts 200000] [--flush-delay-ms 0]
+"""
+import argparse
+import logging
+import logging.config
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from manage_index_benchmark import use_bench_database, seed_database
+
+LOGGER = 'bench.logging'
+
+
+def logging_config(variant, directory):
+    """Логгер LOGGER с файлом как в settings.LOGGING: 'sync' - как было, 'async' - через очередь"""
+    filename = str(Path(directory) / f'{variant}.log')
+    handlers = {'file': {'class': 'logging.FileHandler', 'filename': filename, 'formatter': 'general',
+                         'encoding': 'utf-8'}}
+    if variant == 'async':
+        handlers['file'] = {'class': 'djangoProject_News_Portal.log_config.BatchedRotatingFileHandler',
+                            'filename': filename, 'maxBytes': 100 * 1024 * 1024, 'backupCount': 1,
+                            'formatter': 'general', 'encoding': 'utf-8'}
+        handlers['queue'] = {'class': 'djangoProject_News_Portal.log_config.AsyncQueueHandler',
+                             'handlers': ['file'],
+                             'listener': 'djangoProject_News_Portal.log_config.BatchingQueueListener'}
+    return {
+        'version': 1,
+        'disable_existing_loggers': False,
+        'formatters': {'general': {'format': '{asctime} - {levelname} - {module} - {message}', 'style': '{'}},
+        'handlers': handlers,
+        'loggers': {LOGGER: {'handlers': ['queue' if variant == 'async' else 'file'], 'level': 'INFO',
+                             'propagate': False}},
+    }
+
+
+def slow_down(variant, delay):
+    """Задержка каждого сброса буфера файла: у FileHandler - на каждую запись, у очереди - на пачку"""
+    handler = logging.getLogger(LOGGER).handlers[0]
+    if variant == 'async':
+        handler = handler.listener.handlers[0]
+        flush = handler.flush_batch
+        handler.flush_batch = lambda: (flush(), time.sleep(delay))
+    else:
+        flush = handler.flush
+        handler.flush = lambda: (flush(), time.sleep(delay))
+
+
+def stop(variant):
+    logger = logging.getLogger(LOGGER)
+    for handler in logger.handlers:
+        if variant == 'async':
+            handler.listener.stop()
+        handler.close()
+    logger.handlers.clear()
+
+
+def per_call(n):
+    logger = logging.getLogger(LOGGER)
+    latencies = []
+    for i in range(n):
+        start = time.perf_counter()
+        logger.info('Запрос %s: пост %s, пользователь %s', i, i % 1000, i % 37)
+        latencies.append(time.perf_counter() - start)
+    return statistics.mean(latencies) * 1e6, statistics.quantiles(latencies, n=100)[98] * 1e6
+
+
+def page_latency(records, n):
+    from django.test import Client, override_settings
+    from django.contrib.auth.models import User
+
+    logger = logging.getLogger(LOGGER)
+    with override_settings(ALLOWED_HOSTS=['*'], PERF_SAMPLE_RATE=0.0):
+        client = Client()
+        client.force_login(User.objects.get(pk=1))
+        client.get('/news/')
+        runs = []
+        for _ in range(n):
+            start = time.perf_counter()
+            client.get('/news/')
+            for i in range(records):
+                logger.info('Запрос ленты: запись %s', i)
+            runs.append(time.perf_counter() - start)
+    return statistics.median(runs) * 1e3
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--records', type=int, default=20)
+    parser.add_argument('--calls', type=int, default=20_000)
+    parser.add_argument('--requests', type=int, default=300)
+    parser.add_argument('--posts', type=int, default=200_000)
+    parser.add_argument('--flush-delay-ms', type=float, default=0)
+    args = parser.parse_args()
+
+    use_bench_database()
+    seed_database(args.posts)
+    titles = {'sync': 'FileHandler в потоке запроса (было)', 'async': 'очередь и поток-слушатель (стало)'}
+    calls, pages = {}, {'без логов': page_latency(0, args.requests)}
+    with tempfile.TemporaryDirectory() as directory:
+        for variant, title in titles.items():
+            logging.config.dictConfig(logging_config(variant, directory))
+            if args.flush_delay_ms:
+                slow_down(variant, args.flush_delay_ms / 1000)
+            calls[title] = per_call(args.calls)
+            pages[title] = page_latency(args.records, args.requests)
+            stop(variant)
+
+    print(f"\nЗадержка сброса буфера на диск: {args.flush_delay_ms} мс")
+    print(f"\n{'='*80}\nВызов logger.info в потоке запроса ({args.calls} вызовов)\n{'='*80}")
+    for title, (mean, p99) in calls.items():
+        print(f'{title}: среднее {mean:.1f} мкс, p99 {p99:.1f} мкс')
+    print(f"\n{'='*80}\nЛента main_page, {args.records} записей лога на запрос (медиана)\n{'='*80}")
+    for title, millis in pages.items():
+        print(f'{title}: {millis:.2f} мс')
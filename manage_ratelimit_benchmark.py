@@ -0,0 +1,74 @@
+"""
+Бенчмарк ограничения частоты запросов (news_portal.ratelimit): сколько лимит добавляет к запросу.
+1) Представление-пустышка без лимита, с декоратором ratelimit и с выключенным RATE_LIMIT_ENABLED -
+   разница времени ответа и есть цена лимита (счетчики в кэше ratelimit, LocMem).
+2) Прежняя проверка лимита публикаций в create_post (COUNT по постам автора за сутки) против
+   проверки по счетчикам в кэше, на базе с постами (bench_db.sqlite3 из manage_index_benchmark).
+Запуск: python manage_ratelimit_benchmark.py [--requests 20000] [--posts 200000]
+"""
+import argparse
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+
+from manage_index_benchmark import use_bench_database, seed_database
+
+
+def per_call(func, n):
+    """Медиана из 5 прогонов, мкс на вызов"""
+    runs = []
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(n):
+            func()
+        runs.append((time.perf_counter() - start) / n * 1e6)
+    return statistics.median(runs)
+
+
+def view_overhead(n):
+    from django.contrib.auth.models import AnonymousUser
+    from djangoProject_News_Portal.cache_config import clear_all
+    from django.http import HttpResponse
+    from django.test import RequestFactory, override_settings
+    from news_portal.ratelimit import ratelimit
+
+    def view(request):
+        return HttpResponse('ok')
+
+    limited = ratelimit('bench')(view)
+    request = RequestFactory().get('/news/search/', REMOTE_ADDR='10.0.0.1')
+    request.user = AnonymousUser()
+    clear_all()
+    with override_settings(RATE_LIMITS={'bench': f'{10 * n}/m'}):
+        results = {'без лимита': per_call(lambda: view(request), n),
+                   'ratelimit (лимит включен)': per_call(lambda: limited(request), n)}
+        with override_settings(RATE_LIMIT_ENABLED=False):
+            results['ratelimit (RATE_LIMIT_ENABLED = False)'] = per_call(lambda: limited(request), n)
+    return results
+
+
+def create_post_check(n):
+    from news_portal.models import Post
+    from news_portal.ratelimit import peek
+
+    delta = datetime.now(timezone.utc) - timedelta(days=1)
+    return {
+        'COUNT постов автора за сутки (было)':
+            per_call(lambda: Post.objects.filter(create_time__gte=delta, author__user_id=1).count() > 3, n),
+        'счетчики в кэше, peek (стало)': per_call(lambda: peek('create_post:user:1', 4, 86400), n),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=20_000)
+    parser.add_argument('--posts', type=int, default=200_000)
+    args = parser.parse_args()
+
+    use_bench_database()
+    seed_database(args.posts)
+    for title, results in (('Цена лимита на запрос (представление-пустышка)', view_overhead(args.requests)),
+                           ('Проверка лимита публикаций create_post', create_post_check(args.requests // 10))):
+        print(f"\n{'='*80}\n{title}\n{'='*80}")
+        for name, micros in results.items():
+            print(f'{name}: {micros:.1f} мкс')
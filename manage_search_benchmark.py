@@ -0,0 +1,57 @@
+"""
+Бенчмарк поиска: прежний фильтр PostFilter через iregex против полнотекстового индекса.
+Запуск: python manage_search_benchmark.py [количество_постов]  (по умолчанию 1 000 000)
+Использует отдельную базу бенчмарка индексов (bench_db.sqlite3).
+"""
+import sys
+import time
+import statistics
+
+from manage_index_benchmark import use_bench_database, seed_database
+
+
+def run(params, repeat=5):
+    """Медианное время поиска так, как его выполняет PostFilterView: COUNT для пагинатора и первая страница"""
+    from news_portal.filters import PostFilter
+    from news_portal.models import Post
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        qs = PostFilter(params, Post.objects.all()).qs
+        total = qs.count()
+        list(qs[:10])
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), total
+
+
+if __name__ == '__main__':
+    n_posts = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    use_bench_database()
+    seed_database(n_posts)
+
+    from django.core.management import call_command
+    from django.test.utils import override_settings
+
+    print("Перестроение полнотекстового индекса...")
+    start = time.perf_counter()
+    call_command('rebuild_search_index')
+    print(f"Индекс построен за {time.perf_counter() - start:.1f} сек")
+
+    cases = {
+        'Одно слово': {'search_title': 'космос'},
+        'Словоформа': {'search_title': 'технологиями'},
+        'Два слова': {'search_title': 'спорт погода'},
+        'Автор': {'search_author': 'user777'},
+        'Заголовок и автор': {'search_title': 'наука', 'search_author': 'user15'},
+        'Редкое совпадение': {'search_title': f'{n_posts - 1}'},
+    }
+
+    print(f"\n{'='*80}\nСРАВНЕНИЕ ПОИСКА ({n_posts} постов)\n{'='*80}")
+    for name, params in cases.items():
+        with override_settings(SEARCH_BACKEND='regex'):
+            regex_time, regex_found = run(params)
+        fts_time, fts_found = run(params)
+        speedup = regex_time / fts_time if fts_time else float('inf')
+        print(f"{name} {params}:\n"
+              f"    iregex:  {regex_time * 1000:9.2f} мс (найдено {regex_found})\n"
+              f"    индекс:  {fts_time * 1000:9.2f} мс (найдено {fts_found})  x{speedup:.1f}")
@@ -6,6 +6,7 @@ admin.site.register(md.Post)
 admin.site.register(md.PostCategory)
 admin.site.register(md.Author)
 admin.site.register(md.Comment)
+admin.site.register(md.MailingCheckpoint)
 
 
 
@@ -8,6 +8,7 @@ class NewsPortalConfig(AppConfig):
     verbose_name = 'djangoProject_News_Portal'
     def ready(self): # это переопределенный метод
         import news_portal.signals
+        import news_portal.db  # PRAGMA новых соединений SQLite
         from .scheduler import scheduler
         from .tasks import hello_world
         print('begin')
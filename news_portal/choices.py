@@ -0,0 +1,36 @@
+# Кэшированные варианты выбора для форм постов и подписок.
+# Список категорий нужен на каждой странице ленты (форма подписок) и в формах постов;
+# он хранится в кэше и сбрасывается сигналами при изменении категорий (signals.py).
+from django.conf import settings
+from django.core.cache import cache
+from django.forms.models import ModelChoiceIterator
+
+from .models import Category
+
+CATEGORIES_KEY = 'choices:categories'
+
+
+def categories():
+    result = cache.get(CATEGORIES_KEY)
+    if result is None:
+        result = list(Category.objects.order_by('pk'))
+        cache.set(CATEGORIES_KEY, result, timeout=getattr(settings, 'CHOICES_CACHE_TIMEOUT', 3600))
+    return result
+
+
+def invalidate_categories():
+    cache.delete(CATEGORIES_KEY)
+
+
+class CachedCategoryIterator(ModelChoiceIterator):
+    """Варианты поля категорий из кэша вместо запроса к БД при каждом рендере формы.
+    Проверка отправленных значений по-прежнему идет через queryset поля"""
+
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ('', self.field.empty_label)
+        for category in categories():
+            yield self.choice(category)
+
+    def __len__(self):
+        return len(categories()) + (self.field.empty_label is not None)
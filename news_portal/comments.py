@@ -0,0 +1,157 @@
+# Очередь записи комментов.
+# Запрос к API (views.add_comment) только кладет коммент в очередь в кэше и сразу отвечает 202.
+# Задача flush_comments забирает очередь пачками по COMMENTS_FLUSH_BATCH и пишет каждую пачку
+# одним bulk_create в короткой транзакции: при шквале комментов SQLite берет блокировку записи
+# один раз на пачку, а не на каждый коммент. Кэш поста и счетчики comment_count обновляются
+# тоже один раз на пачку (bulk_create не вызывает сигналы).
+# Очередь - нумерованные ключи comments:item:<n>: номер выдает атомарный incr хвоста,
+# а задача сдвигает голову очереди после записи пачки.
+# Очередь включается settings.COMMENTS_QUEUED и требует redis: с locmem задача Celery читала бы кэш
+# другого процесса, у file incr хвоста не атомарен, а вытеснение ключей теряет комменты очереди -
+# без очереди коммент пишется сразу.
+import logging
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DataError, IntegrityError, transaction
+from django.db.models import Case, Count, F, IntegerField, Value, When
+from django.utils import timezone
+
+from .models import Post, Comment, User
+from .post_cache import invalidate_post
+from .ratelimit import get_rate, hit
+
+logger = logging.getLogger(__name__)
+
+HEAD_KEY = 'comments:head'  # номер последнего записанного коммента
+TAIL_KEY = 'comments:tail'  # номер последнего поставленного в очередь
+GAP_KEY = 'comments:gap'
+LOCK_KEY = 'comments:flush_lock'
+
+
+def _item_key(number):
+    return f'comments:item:{number}'
+
+
+def rate():  # (комментов, за секунд) из settings.RATE_LIMITS['comment']; None - без лимита
+    return get_rate('comment')
+
+
+def allow(user_id):
+    """Быстрая проверка лимита в запросе (счетчики в кэше, news_portal.ratelimit)"""
+    limit = rate()
+    return limit is None or hit(f'comment:user:{user_id}', *limit)
+
+
+def queued():
+    return getattr(settings, 'COMMENTS_QUEUED', False)
+
+
+def write(post_id, user_id, text):
+    """Запись коммента сразу, без очереди; возвращает 0, если коммент отброшен лимитом"""
+    return _write([(post_id, user_id, text)])
+
+
+def enqueue(post_id, user_id, text):
+    """Постановка коммента в очередь; возвращает его номер в очереди"""
+    cache.add(TAIL_KEY, 0, timeout=None)
+    number = cache.incr(TAIL_KEY)
+    cache.set(_item_key(number), (post_id, user_id, text), timeout=None)
+    return number
+
+
+def pending():
+    return cache.get(TAIL_KEY, 0) - cache.get(HEAD_KEY, 0)
+
+
+def _take(head, limit):
+    """Комменты после head (не больше limit), номер последнего из них и признак того,
+    что выборка остановилась на еще не записанном комменте"""
+    numbers = range(head + 1, min(cache.get(TAIL_KEY, 0), head + limit) + 1)
+    found = cache.get_many([_item_key(n) for n in numbers])
+    items, last = [], head
+    for number in numbers:
+        item = found.get(_item_key(number))
+        if item is None:
+            # номер уже выдан, но коммент еще не записан в кэш: ждем до следующего сброса,
+            # а если пропуск остался с прошлого сброса (запрос упал между incr и set) - пропускаем
+            if cache.get(GAP_KEY) != number:
+                cache.set(GAP_KEY, number, timeout=None)
+                return items, last, True
+        else:
+            items.append(item)
+        last = number
+    return items, last, False
+
+
+def _write(items):
+    """Запись пачки с лимитом комментов на пользователя; возвращает число записанных"""
+    limit, period = rate() or (None, 0)
+    existing = set(Post.objects.filter(pk__in={post_id for post_id, _, _ in items}).values_list('pk', flat=True))
+    users = set(User.objects.filter(pk__in={user_id for _, user_id, _ in items}).values_list('pk', flat=True))
+    recent = Counter()
+    if limit is not None:
+        since = timezone.now() - timedelta(seconds=period)
+        recent.update(dict(Comment.objects.filter(user_id__in={user_id for _, user_id, _ in items},
+                                                  create_time__gte=since)
+                           .order_by().values('user_id').annotate(n=Count('pk')).values_list('user_id', 'n')))
+    comments = []
+    for post_id, user_id, text in items:
+        if post_id not in existing or user_id not in users:  # пост или автора удалили, пока коммент ждал
+            continue
+        if limit is not None and recent[user_id] >= limit:
+            logger.warning(f'comment of user {user_id} to post {post_id} dropped: rate limit')
+            continue
+        recent[user_id] += 1
+        comments.append(Comment(post_id=post_id, user_id=user_id, comment_text=text))
+
+    counts = Counter(comment.post_id for comment in comments)
+    if comments:
+        with transaction.atomic():
+            Comment.objects.bulk_create(comments)
+            Post.objects.filter(pk__in=counts).update(
+                comment_count=F('comment_count') + Case(*[When(pk=pk, then=Value(n)) for pk, n in counts.items()],
+                                                        default=Value(0), output_field=IntegerField()))
+    for pk in counts:  # кэш поста сбрасывается один раз на пачку
+        invalidate_post(pk)
+    return len(comments)
+
+
+def _write_batch(items):
+    """Запись пачки. Если пачка не записалась из-за данных (IntegrityError, DataError), комменты
+    пишутся по одному и отбрасываются только ошибочные - один коммент не останавливает очередь.
+    Прочие ошибки базы (недоступна, заблокирована) пробрасываются, и пачка ждет следующего сброса"""
+    try:
+        return _write(items)
+    except (IntegrityError, DataError):
+        logger.exception(f'comment batch of {len(items)} failed, writing one by one')
+    written = 0
+    for post_id, user_id, text in items:
+        try:
+            written += _write([(post_id, user_id, text)])
+        except (IntegrityError, DataError):
+            logger.exception(f'comment of user {user_id} to post {post_id} dropped: write failed')
+    return written
+
+
+def flush(batch_size=None):
+    """Запись очереди пачками; одновременно очередь разбирает только одна задача"""
+    batch_size = batch_size or getattr(settings, 'COMMENTS_FLUSH_BATCH', 500)
+    if not cache.add(LOCK_KEY, 1, timeout=300):
+        return 0
+    written = 0
+    try:
+        while True:
+            head = cache.get(HEAD_KEY, 0)
+            items, last, waiting = _take(head, batch_size)
+            if last != head:
+                written += _write_batch(items)
+                cache.set(HEAD_KEY, last, timeout=None)
+                cache.delete_many([_item_key(n) for n in range(head + 1, last + 1)])
+            if waiting or last == head:
+                break
+    finally:
+        cache.delete(LOCK_KEY)
+    return written
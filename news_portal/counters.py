@@ -0,0 +1,61 @@
+# Денормализованные поля поста: число комментов (comment_count) и названия категорий через
+# запятую (category_labels). Лента и поиск выводят их из той же строки поста, без
+# prefetch_related('category') и подсчета комментов на каждый пост.
+# Поля обновляются сигналами (signals.py) атомарными UPDATE, а расхождения (массовые операции
+# в обход сигналов, правки базы вручную) исправляет команда reconcile_post_counters.
+from django.db import connection
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Post, PostCategory, Category, Comment
+
+LABELS_SEPARATOR = ', '
+
+
+def change_comment_count(post_id, delta):
+    posts = Post.objects.filter(pk=post_id)
+    if delta < 0:
+        posts = posts.filter(comment_count__gte=-delta)
+    posts.update(comment_count=F('comment_count') + delta)
+
+
+def _actual_comment_count():
+    return Coalesce(Subquery(Comment.objects.filter(post=OuterRef('pk')).order_by()
+                             .values('post').annotate(n=Count('pk')).values('n')), 0)
+
+
+def reconcile_comment_counts():
+    """Пересчет comment_count одним UPDATE только у постов с расхождением; возвращает их число"""
+    actual = _actual_comment_count()
+    return Post.objects.filter(~Q(comment_count=actual)).update(comment_count=actual)
+
+
+def _labels_sql():
+    # названия категорий поста по алфавиту; в sqlite порядок задает упорядоченный подзапрос
+    post, through, category = Post._meta.db_table, PostCategory._meta.db_table, Category._meta.db_table
+    source = (f'FROM {through} pc JOIN {category} c ON c.id = pc.category_id '
+              f'WHERE pc.post_id = {post}.id')
+    if connection.vendor == 'postgresql':
+        labels = f'SELECT STRING_AGG(c.category, %s ORDER BY c.category) {source}'
+    else:
+        labels = f'SELECT GROUP_CONCAT(name, %s) FROM (SELECT c.category AS name {source} ORDER BY c.category)'
+    max_length = Post._meta.get_field('category_labels').max_length
+    return f'COALESCE(SUBSTR(({labels}), 1, {max_length}), \'\')'
+
+
+def refresh_labels(post_ids=None, batch_size=900):
+    """Пересчет category_labels одним UPDATE на пачку постов (post_ids=None - все посты).
+    Меняются только строки с расхождением; возвращает их число"""
+    labels = _labels_sql()
+    sql = f'UPDATE {Post._meta.db_table} SET category_labels = {labels} WHERE category_labels <> {labels}'
+    params = [LABELS_SEPARATOR, LABELS_SEPARATOR]
+    with connection.cursor() as cursor:
+        if post_ids is None:
+            cursor.execute(sql, params)
+            return cursor.rowcount
+        post_ids, changed = list(post_ids), 0
+        for i in range(0, len(post_ids), batch_size):
+            batch = post_ids[i:i + batch_size]
+            cursor.execute(f"{sql} AND id IN ({', '.join(['%s'] * len(batch))})", params + batch)
+            changed += cursor.rowcount
+        return changed
@@ -0,0 +1,107 @@
+# Настройка соединений с базой и маршрутизация чтения.
+# 1) Каждое новое соединение с SQLite получает PRAGMA из settings.SQLITE_PRAGMAS: WAL (читатели
+#    не блокируются писателем - задачами Celery и планировщиком), synchronous=NORMAL, mmap,
+#    размер страничного кэша и ожидание блокировки вместо немедленного "database is locked".
+# 2) PrimaryReplicaRouter отправляет чтение запросов GET/HEAD/OPTIONS на псевдоним 'replica'
+#    (если он есть в DATABASES, см. djangoProject_News_Portal.db_config), запись и все остальное -
+#    в основную базу. Режим чтения включает ReadOnlyRoutingMiddleware; внутри транзакции основной
+#    базы и в течение REPLICA_PIN_SECONDS после изменяющего запроса клиента чтение идет из
+#    основной базы, чтобы пользователь сразу видел свои изменения при отставании реплики.
+#    Маршрутизация не зависит от СУБД: для PostgreSQL 'replica' - настройки реплики.
+# 3) stream_alias() - соединение для потоковых выборок рассылок серверным курсором (.iterator()):
+#    за внешним пулером серверные курсоры выключены, и рассылки читают через прямое соединение 'direct'.
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from djangoProject_News_Portal.db_config import READ_ALIAS, DIRECT_ALIAS
+
+PIN_COOKIE = 'db_primary_until'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_read_only = ContextVar('db_read_only', default=False)
+
+
+@receiver(connection_created)
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def read_alias():
+    """Псевдоним для чтения в текущем запросе или None - основная база"""
+    if not _read_only.get() or READ_ALIAS not in settings.DATABASES:
+        return None
+    if connections[DEFAULT_DB_ALIAS].in_atomic_block:  # транзакция должна видеть свои изменения
+        return None
+    return READ_ALIAS
+
+
+def stream_alias():
+    """Псевдоним для долгих потоковых выборок: прямое соединение мимо пулера, если оно настроено"""
+    return DIRECT_ALIAS if DIRECT_ALIAS in settings.DATABASES else DEFAULT_DB_ALIAS
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return read_alias()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):  # реплика содержит те же данные
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in (READ_ALIAS, DIRECT_ALIAS)
+
+
+class ReadOnlyRoutingMiddleware:
+    """Помечает безопасные запросы как только читающие (ставится в начало MIDDLEWARE)"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    @staticmethod
+    def is_read_only(request):
+        if request.method not in SAFE_METHODS:
+            return False
+        try:
+            return float(request.COOKIES.get(PIN_COOKIE, 0)) < time.time()
+        except ValueError:
+            return True
+
+    @staticmethod
+    def pin(request, response):  # после изменяющего запроса клиент читает из основной базы
+        seconds = getattr(settings, 'REPLICA_PIN_SECONDS', 5)
+        if request.method not in SAFE_METHODS and seconds and READ_ALIAS in settings.DATABASES:
+            response.set_cookie(PIN_COOKIE, str(time.time() + seconds), max_age=seconds, httponly=True,
+                                samesite='Lax')
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _read_only.set(self.is_read_only(request))
+        try:
+            return self.pin(request, self.get_response(request))
+        finally:
+            _read_only.reset(token)
+
+    async def __acall__(self, request):
+        token = _read_only.set(self.is_read_only(request))
+        try:
+            return self.pin(request, await self.get_response(request))
+        finally:
+            _read_only.reset(token)
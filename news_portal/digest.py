@@ -0,0 +1,50 @@
+# Потоковая выборка еженедельного дайджеста: пары (подписчик, его публикации) одним запросом.
+# Строки "подписчик - публикация" читаются итератором, упорядоченными по id подписчика и поста,
+# и группируются на лету - в памяти одновременно только публикации одного подписчика.
+from itertools import groupby
+
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+
+from .db import stream_alias
+from .models import UserSubcribes
+
+
+def iter_digests(since, after_subscriber_id=0, chunk_size=2000):
+    """Генератор (id, email, username, ((id поста, заголовок), ...)) для подписчиков, у которых
+    есть публикации в подписанных категориях, вышедшие после since. На PostgreSQL строки читаются
+    серверным курсором (за пулером - через прямое соединение, news_portal.db.stream_alias)"""
+    rows = (UserSubcribes.objects.using(stream_alias())
+            .filter(category__post__create_time__gte=since, subcribe_id__gt=after_subscriber_id)
+            .order_by('subcribe_id', 'category__post__id')
+            .values_list('subcribe_id', 'subcribe__email', 'subcribe__username',
+                         'category__post__id', 'category__post__title')
+            .iterator(chunk_size=chunk_size))
+    for subscriber_id, group_rows in groupby(rows, key=lambda row: row[0]):
+        posts, email, username = [], None, None
+        for _, email, username, post_pk, title in group_rows:
+            if not posts or posts[-1][0] != post_pk:  # пост из нескольких категорий подписчика
+                posts.append((post_pk, title))
+        yield subscriber_id, email, username, tuple(posts)
+
+
+class DigestRenderer:
+    """Рендер письма дайджеста. Список публикаций рендерится один раз на каждый различный набор
+    постов и переиспользуется для всех подписчиков с таким же набором"""
+    def __init__(self, max_cached=1024):
+        self.message = get_template('flatpages/mail/scheduler_message.html')
+        self.posts = get_template('flatpages/mail/scheduler_posts.html')
+        self.max_cached = max_cached
+        self._cache = {}
+        self.rendered = 0  # сколько раз действительно рендерился список публикаций
+
+    def render(self, username, posts):
+        key = tuple(pk for pk, _ in posts)
+        posts_html = self._cache.get(key)
+        if posts_html is None:
+            posts_html = mark_safe(self.posts.render({'post': posts}))
+            self.rendered += 1
+            if len(self._cache) >= self.max_cached:
+                self._cache.pop(next(iter(self._cache)))  # вытесняется самый старый набор
+            self._cache[key] = posts_html
+        return self.message.render({'username': username, 'posts_html': posts_html})
@@ -0,0 +1,80 @@
+# Персональная лента "мои категории": материализованная таблица FeedEntry (пользователь, пост, время).
+# Запись добавляется каждому подписчику, когда пост попадает в категорию (send_notify_to_subscribers
+# в tasks.py - тот же список подписчиков, что и для писем). При изменении подписок лента
+# пользователя перестраивается, все ленты сразу - командой backfill_feeds.
+# Лента читается по индексу (user, -create_time, -post) за время, пропорциональное размеру страницы.
+# Длина ленты ограничена FEED_MAX_LENGTH: перестроение сразу берет не больше этого числа постов,
+# а лишние старые записи после новых публикаций удаляет ежедневная задача trim_feeds.
+import heapq
+from itertools import groupby
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from .models import Post, PostCategory, UserSubcribes, FeedEntry
+
+
+def max_length():
+    return getattr(settings, 'FEED_MAX_LENGTH', 200)
+
+
+def push_post(post_id, create_time, user_ids, batch_size=1000):
+    """Добавление поста в ленты подписчиков (повторное добавление ничего не меняет)"""
+    FeedEntry.objects.bulk_create([FeedEntry(user_id=user_id, post_id=post_id, create_time=create_time)
+                                   for user_id in user_ids], batch_size=batch_size, ignore_conflicts=True)
+
+
+def posts_for(user):  # посты ленты пользователя, новые первыми
+    return (Post.objects.filter(feed_entries__user=user)
+            .order_by('-feed_entries__create_time', '-feed_entries__post_id'))
+
+
+def latest_posts(category_ids, limit):
+    """Последние limit постов каждой категории: {id категории: [(время, id поста), ...]} по убыванию"""
+    return {category_id: list(PostCategory.objects.filter(category_id=category_id)
+                              .order_by('-post__create_time', '-post_id')
+                              .values_list('post__create_time', 'post_id')[:limit])
+            for category_id in category_ids}
+
+
+def _merge(lists, limit):  # слияние убывающих списков категорий без повторов постов
+    seen, result = set(), []
+    for create_time, post_id in heapq.merge(*lists, reverse=True):
+        if post_id not in seen:
+            seen.add(post_id)
+            result.append((create_time, post_id))
+            if len(result) == limit:
+                break
+    return result
+
+
+def rebuild(user_ids, categories=None, batch_size=5000):
+    """Перестроение лент пользователей по их текущим подпискам. Лента собирается слиянием
+    последних постов каждой подписанной категории - так не нужно сортировать все посты категорий.
+    categories - заранее выбранный latest_posts (при перестроении лент пачками)"""
+    limit = max_length()
+    subscriptions = list(UserSubcribes.objects.filter(subcribe_id__in=user_ids)
+                         .order_by('subcribe_id').values_list('subcribe_id', 'category_id'))
+    if categories is None:
+        categories = latest_posts({category_id for _, category_id in subscriptions}, limit)
+    entries = []
+    for user_id, rows in groupby(subscriptions, key=lambda row: row[0]):
+        entries += [FeedEntry(user_id=user_id, post_id=post_id, create_time=create_time)
+                    for create_time, post_id in _merge([categories[c] for _, c in rows], limit)]
+    with transaction.atomic():
+        FeedEntry.objects.filter(user_id__in=user_ids).delete()
+        FeedEntry.objects.bulk_create(entries, batch_size=batch_size)
+    return len(entries)
+
+
+def trim(batch_size=900):
+    """Удаление записей сверх FEED_MAX_LENGTH (самых старых) во всех лентах"""
+    extra = list(FeedEntry.objects
+                 .annotate(position=Window(RowNumber(), partition_by=[F('user_id')],
+                                           order_by=[F('create_time').desc(), F('post_id').desc()]))
+                 .filter(position__gt=max_length()).values_list('pk', flat=True))
+    for i in range(0, len(extra), batch_size):
+        FeedEntry.objects.filter(pk__in=extra[i:i + batch_size]).delete()
+    return len(extra)
@@ -0,0 +1,72 @@
+# Поля модели Post для облегченных выборок ленты: сохраненное начало статьи (preview)
+# и текст статьи, который у длинных статей может храниться сжатым (content).
+import base64
+import zlib
+
+from django.conf import settings
+from django.db import models
+
+COMPRESSED_PREFIX = 'zlib:'  # метка сжатого значения в столбце
+
+
+def compress_min_length():
+    """Размер текста (байт UTF-8), начиная с которого он хранится сжатым; None - сжатие выключено"""
+    return getattr(settings, 'POST_CONTENT_COMPRESS_MIN_LENGTH', None)
+
+
+def compress(value):
+    return COMPRESSED_PREFIX + base64.b64encode(zlib.compress(value.encode(), 9)).decode('ascii')
+
+
+def decompress(value):
+    return zlib.decompress(base64.b64decode(value[len(COMPRESSED_PREFIX):])).decode()
+
+
+class CompressedTextField(models.TextField):
+    """TextField, который при POST_CONTENT_COMPRESS_MIN_LENGTH хранит длинные тексты сжатыми zlib
+    (base64 с префиксом zlib:), если так выходит короче. Чтение прозрачное: сжатые значения
+    распаковываются при загрузке из базы. Искать по содержимому сжатых текстов средствами
+    базы (LIKE, iregex, полнотекстовый индекс) нельзя."""
+
+    def from_db_value(self, value, expression, connection):
+        if value is not None and value.startswith(COMPRESSED_PREFIX):
+            return decompress(value)
+        return value
+
+    def get_db_prep_save(self, value, connection):
+        # сжимаются только записываемые значения, параметры фильтров (content=..., LIKE) - нет
+        value = super().get_db_prep_save(value, connection)
+        if value is None or hasattr(value, 'resolve_expression'):
+            return value
+        min_length = compress_min_length()
+        # текст, который сам начинается с метки, сжимается всегда - иначе его не отличить от сжатого
+        if value.startswith(COMPRESSED_PREFIX):
+            return compress(value)
+        if min_length is not None and len(value.encode()) >= min_length:
+            compressed = compress(value)
+            if len(compressed) < len(value.encode()):
+                return compressed
+        return value
+
+
+class PreviewField(models.CharField):
+    """Начало текстового поля source длиной max_length. Пересчитывается при каждом сохранении,
+    в том числе в bulk_create, поэтому ленте не нужно загружать сам текст"""
+
+    def __init__(self, *args, source='content', **kwargs):
+        self.source = source
+        kwargs.setdefault('editable', False)
+        kwargs.setdefault('blank', True)
+        kwargs.setdefault('default', '')
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        kwargs['source'] = self.source
+        return name, path, args, kwargs
+
+    def pre_save(self, model_instance, add):
+        # у объекта, загруженного с defer(source), текст не загружается ради превью
+        if self.source not in model_instance.get_deferred_fields():
+            setattr(model_instance, self.attname, (getattr(model_instance, self.source) or '')[:self.max_length])
+        return super().pre_save(model_instance, add)
@@ -1,5 +1,6 @@
 from django.forms import DateInput
 from django_filters import FilterSet, CharFilter, DateFilter
+from . import search
 
 
 
@@ -9,6 +10,20 @@ class PostFilter(FilterSet): # класс фильтра для поиска н
     search_date = DateFilter(field_name='create_time', lookup_expr='gte', # это поле фильтра для поиска статей, позже указанной даты
                  label='Дата, начиная с которой вышли посты', widget=DateInput(attrs={'type': 'date'}, format='%d%m%Y'))
 
+    def filter_queryset(self, queryset):
+        # при наличии полнотекстового индекса название и автор ищутся через него (с учетом
+        # словоформ и с сортировкой по релевантности), иначе - прежним iregex
+        title, author = self.form.cleaned_data.get('search_title'), self.form.cleaned_data.get('search_author')
+        if not (title or author) or not search.available():
+            return super().filter_queryset(queryset)
+        for name, value in self.form.cleaned_data.items():
+            if name not in ('search_title', 'search_author'):
+                queryset = self.filters[name].filter(queryset, value)
+        ids = search.search(title=title, author=author)
+        if not ids:
+            return queryset.none()
+        return queryset.filter(pk__in=ids).order_by(search.relevance(ids))
+
 
 
 
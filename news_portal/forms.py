@@ -1,15 +1,25 @@
 from django import forms
-from .models import Post, Author, Category
+from .models import Post, Author, Category, Comment
+from .choices import CachedCategoryIterator
 from django.core.exceptions import ValidationError
 
 
+class CategoryField(forms.ModelMultipleChoiceField): # выбор категорий, варианты берутся из кэша
+    iterator = CachedCategoryIterator
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('widget', forms.CheckboxSelectMultiple)
+        super().__init__(queryset=Category.objects.all(), **kwargs)
+
+
 class PostForm(forms.Form): #форма для отображения и редактирования постов
-    author = forms.ModelChoiceField(label='Автор', queryset=Author.objects.all())
+    # представления сужают выбор до автора поста или текущего пользователя
+    author = forms.ModelChoiceField(label='Автор', queryset=Author.objects.select_related('user'))
     postType=forms.ChoiceField(label='Тип публикации',choices=Post.post_type)
     create_time = forms.DateTimeField  (label='Дата создания публикации', required=False, disabled=True)
     title = forms.CharField(label='Заголовок публикации', max_length=50)
     content= forms.CharField(label='Содержание публикации', widget=forms.Textarea)
-    category = forms.ModelMultipleChoiceField(queryset=Category.objects.all(), widget=forms.CheckboxSelectMultiple)
+    category = CategoryField()
 
     def clean(self): # проверка не слишком ли короткое название
         check=super().clean()
@@ -19,16 +29,16 @@ class PostForm(forms.Form): #форма для отображения и ред
         return check
 
 class SubsribeForm(forms.Form): # форма для подписок на категории публикаций
-    category = forms.ModelMultipleChoiceField(queryset=Category.objects.all(), disabled=True,
-                      widget=forms.CheckboxSelectMultiple, label='Подписки пользователя')
+    category = CategoryField(disabled=True, label='Подписки пользователя')
 
 class PostCreateForm(forms.ModelForm): # специальная форма для создания поста,
                 # чтобы срабатывал сигнал m2m_changed
+    category = CategoryField(label='Категория публикации')
+
     class Meta:
         model = Post
         fields = ['title', 'author',
                   'postType','content','category']
-        widgets={'category': forms.CheckboxSelectMultiple}
 
     def clean(self):
         check=super().clean()
@@ -36,4 +46,8 @@ class PostCreateForm(forms.ModelForm): # специальная форма дл
         if len(title)<5:
             raise ValidationError({'title':'Слишком короткое название.'})
         return check
-    #
\ No newline at end of file
+    #
+class CommentForm(forms.ModelForm): # коммент к посту (API views.add_comment)
+    class Meta:
+        model = Comment
+        fields = ['comment_text']
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from news_portal import feed
+from news_portal.models import Category, FeedEntry, UserSubcribes
+
+
+class Command(BaseCommand):
+    help = ('Заполняет персональные ленты "мои категории" (FeedEntry) по текущим подпискам: каждому '
+            'подписчику - не больше FEED_MAX_LENGTH последних постов его категорий. '
+            'Ленты перестраиваются пачками пользователей, каждая пачка - в своей транзакции.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users-batch', type=int, default=1000, help='пользователей в пачке')
+
+    def handle(self, *args, **options):
+        batch_size = options['users_batch']
+        if batch_size < 1:
+            raise CommandError('Размер пачки должен быть положительным')
+
+        # ленты пользователей, у которых больше нет подписок
+        removed, _ = FeedEntry.objects.exclude(user_id__in=UserSubcribes.objects.values('subcribe_id')).delete()
+        # последние посты категорий выбираются один раз на все пачки
+        categories = feed.latest_posts(Category.objects.values_list('pk', flat=True), feed.max_length())
+        user_ids = list(UserSubcribes.objects.order_by('subcribe_id')
+                        .values_list('subcribe_id', flat=True).distinct())
+        created = 0
+        for i in range(0, len(user_ids), batch_size):
+            created += feed.rebuild(user_ids[i:i + batch_size], categories)
+            self.stdout.write(f'  ...{min(i + batch_size, len(user_ids))} из {len(user_ids)} пользователей')
+        self.stdout.write(self.style.SUCCESS(
+            f'Лент: {len(user_ids)}, записей: {created}, удалено записей без подписок: {removed}'))
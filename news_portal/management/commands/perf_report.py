@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from news_portal import profiling
+
+
+class Command(BaseCommand):
+    help = 'Показывает агрегированные замеры PerformanceBudgetMiddleware по именам url'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='обнулить замеры после вывода')
+
+    def handle(self, *args, **options):
+        if settings.CACHE_BACKEND == 'locmem':  # замеры воркеров остались в их процессах
+            raise CommandError('Замеры хранятся в кэше каждого процесса (CACHE_BACKEND=locmem): '
+                               'для perf_report нужен общий кэш, CACHE_BACKEND=redis')
+        report = profiling.report()
+        if not report:
+            self.stdout.write('Замеров нет (проверьте PERF_SAMPLE_RATE)')
+        for name, stats in report.items():
+            memory = f", память {stats['avg_memory_kb']:.0f} KB" if stats['avg_memory_kb'] is not None else ''
+            self.stdout.write(f"{name}: {stats['requests']} замеров, {stats['avg_time_ms']:.1f} мс, "
+                              f"SQL {stats['avg_queries']:.1f} запросов / {stats['avg_sql_ms']:.1f} мс{memory}")
+            for bound, count in stats['histogram']:
+                if count:
+                    label = f'<= {bound} мс' if bound is not None else f'> {profiling.TIME_BUCKETS[-1]} мс'
+                    self.stdout.write(f'    {label:>12}: {count}')
+        if options['reset']:
+            profiling.reset()
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from news_portal import post_cache
+
+
+class Command(BaseCommand):
+    help = 'Показывает счетчики попаданий и промахов кэша страницы поста'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='обнулить счетчики после вывода')
+
+    def handle(self, *args, **options):
+        stats = post_cache.stats()
+        self.stdout.write(f"hits={stats['hits']} misses={stats['misses']} hit_ratio={stats['hit_ratio']:.2%}")
+        if options['reset']:
+            post_cache.reset_stats()
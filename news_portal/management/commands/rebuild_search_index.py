@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from news_portal import search
+from news_portal.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Полностью перестраивает полнотекстовый индекс постов (FTS5 для SQLite, tsvector для PostgreSQL)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help='размер пачки при заполнении индекса')
+
+    def handle(self, *args, **options):
+        if search.backend_name() not in ('fts5', 'postgres'):
+            self.stdout.write(f'Полнотекстовый поиск для базы {connection.vendor} не поддерживается, '
+                              f'используется iregex')
+            return
+
+        with transaction.atomic():
+            search.drop_index()
+            search.create_index()
+            if search.backend_name() == 'postgres':
+                with connection.cursor() as cursor:
+                    cursor.execute(search.rebuild_sql())
+            else:
+                rows = (Post.objects.order_by('pk')
+                        .values_list('pk', 'title', 'author__user__username').iterator(options['batch_size']))
+                batch = []
+                for row in rows:
+                    batch.append(row)
+                    if len(batch) >= options['batch_size']:
+                        search.index_posts(batch)
+                        batch = []
+                search.index_posts(batch)
+        self.stdout.write(f'Индекс перестроен, постов: {Post.objects.count()}')
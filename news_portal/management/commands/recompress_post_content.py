@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from news_portal.fields import compress_min_length
+from news_portal.models import Post
+
+
+class Command(BaseCommand):
+    help = ('Переписывает текст и превью всех постов по текущей настройке POST_CONTENT_COMPRESS_MIN_LENGTH: '
+            'длинные статьи сжимаются, при выключенном сжатии - распаковываются. Заодно заполняет '
+            'превью постов, сохраненных до его появления. Посты обрабатываются пачками по id, '
+            'каждая пачка - в своей транзакции.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='постов в пачке')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('Размер пачки должен быть положительным')
+
+        last_pk, total = 0, 0
+        while True:
+            posts = list(Post.objects.filter(pk__gt=last_pk).order_by('pk').only('pk', 'content')[:batch_size])
+            if not posts:
+                break
+            for post in posts:
+                post.preview = Post._meta.get_field('preview').pre_save(post, add=False)
+            with transaction.atomic():
+                # значения content заново проходят через CompressedTextField.get_db_prep_save
+                Post.objects.bulk_update(posts, ['content', 'preview'])
+            last_pk, total = posts[-1].pk, total + len(posts)
+            self.stdout.write(f'  ...{total} постов')
+
+        mode = f'сжатие от {compress_min_length()} байт' if compress_min_length() is not None else 'без сжатия'
+        self.stdout.write(self.style.SUCCESS(f'Переписано постов: {total} ({mode})'))
@@ -0,0 +1,68 @@
+from datetime import datetime, timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
+
+from news_portal.models import Author
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает рейтинг всех авторов одним группирующим запросом и сохраняет его через bulk_update. '
+            'С ключом --changed пересчитываются только авторы, чьи посты или комменты изменились с прошлого запуска.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--changed', action='store_true',
+                            help='только авторы с изменениями после последнего запуска')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='размер пачки для bulk_update')
+
+    # файл, в котором хранится время последнего пересчета
+    @staticmethod
+    def state_file():
+        return Path(getattr(settings, 'RECOMPUTE_RATINGS_STATE_FILE',
+                            settings.BASE_DIR / 'recompute_ratings.state'))
+
+    def last_run(self):
+        try:
+            return datetime.fromisoformat(self.state_file().read_text().strip())
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('Размер пачки должен быть положительным')
+
+        started = datetime.now(timezone.utc)  # фиксируем время до расчета, чтобы не потерять параллельные изменения
+        authors = Author.objects.all()
+        since = self.last_run() if options['changed'] else None
+        if since is not None:
+            changed = (Q(post__update_time__gte=since) |  # посты автора
+                       Q(post__comment__update_time__gte=since) |  # комменты к постам автора
+                       Q(user__comment__update_time__gte=since))  # комменты самого автора
+            authors = authors.filter(pk__in=Author.objects.filter(changed).values('pk'))
+
+        # один запрос с подзапросами-агрегатами; из таблицы авторов берутся только нужные поля
+        authors = (authors.annotate(new_raiting=Author.rating_expression())
+                   .only('pk', 'raiting').order_by('pk'))
+
+        batch, updated = [], 0
+        with transaction.atomic():
+            for author in authors.iterator(chunk_size=batch_size):
+                if author.raiting != author.new_raiting:
+                    author.raiting = author.new_raiting
+                    batch.append(author)
+                if len(batch) >= batch_size:
+                    Author.objects.bulk_update(batch, ['raiting'])
+                    updated += len(batch)
+                    batch = []
+            if batch:
+                Author.objects.bulk_update(batch, ['raiting'])
+                updated += len(batch)
+
+        self.state_file().write_text(started.isoformat())
+        self.stdout.write(f'Обновлен рейтинг авторов: {updated}' +
+                          (f' (изменения с {since:%d.%m.%Y %H:%M:%S})' if since else ''))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from news_portal import counters
+
+
+class Command(BaseCommand):
+    help = ('Исправляет расхождения денормализованных полей поста (comment_count, category_labels) '
+            'с таблицами комментов и категорий. Каждое поле пересчитывается одним UPDATE '
+            'на всю таблицу постов, меняются только строки с расхождением.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            comments = counters.reconcile_comment_counts()
+            labels = counters.refresh_labels()
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено счетчиков комментов: {comments}, списков категорий: {labels}'))
@@ -12,39 +12,36 @@ from django_apscheduler.models import DjangoJobExecution
 logger = logging.getLogger(__name__)
 #_________________________________
 #--------- ДОП ИМПОРТЫ ---------------
-from news_portal.models import Post, Category
-from django.contrib.auth.models import User
-from django.template.loader import render_to_string
-from django.core.mail import EmailMultiAlternatives
+from news_portal.digest import iter_digests, DigestRenderer
+from django.core.mail import EmailMultiAlternatives, get_connection
 import datetime
 #____ КОНЕЦ ИМПОРТА _____________
 
-# наша задача по выводу текста на экран
-def my_job():
-    #  Your job processing logic here...
+# еженедельная рассылка списка публикаций подписчикам.
+# Все пары (подписчик, публикации) берутся одним потоковым запросом (без запроса на каждого
+# подписчика), список публикаций рендерится один раз на каждый различный набор постов,
+# письма уходят пачками через одно SMTP-соединение
+def my_job(batch_size=None):
     delta=datetime.datetime.now (datetime.timezone.utc)-datetime.timedelta(days=7)
-    posts=Post.objects.filter(create_time__gte=delta)
-    post_pk=Post.objects.filter(create_time__gte=delta).values_list('pk',flat=True)
-    categories=set(Category.objects.filter(post__in=posts))
-    user_pk=set(User.objects.filter(category__in=categories).values_list('pk',flat=True))
-
-    for user in User.objects.filter(pk__in=user_pk):
-        post_list = []  # список постов для еженедльной рассылки полдписчикам
-        current_post_list = []  # список для отслеживания добавляемых постов в post_list во избежание
-        # дублирования во время рассылки одному и тому же подписчику
-        for post in Post.objects.filter(pk__in=post_pk, category__in=categories, category__usersubcribes__subcribe=user):
-            if post not in current_post_list:
-                current_post_list.append(post)
-                post_list.append(post)
-
-        html=render_to_string('flatpages/mail/scheduler_message.html',
-                              {'username':user.username,'post':post_list})
-        msg=EmailMultiAlternatives(subject='Список публикаций за неделю подписчикам ',
-                                   body='',
-                                   from_email=settings.DEFAULT_FROM_EMAIL,
-                                   to=[f'{user.email}'])
-        msg.attach_alternative(html,'text/html')
-        msg.send()
+    batch_size = batch_size or getattr(settings, 'MAIL_CHUNK_SIZE', 500)
+    renderer = DigestRenderer()
+    connection = get_connection()
+    batch, sent = [], 0
+    with connection:  # соединение открывается один раз на всю рассылку
+        for _, email, username, posts in iter_digests(delta):
+            msg=EmailMultiAlternatives(subject='Список публикаций за неделю подписчикам ',
+                                       body='',
+                                       from_email=settings.DEFAULT_FROM_EMAIL,
+                                       to=[f'{email}'])
+            msg.attach_alternative(renderer.render(username, posts),'text/html')
+            batch.append(msg)
+            if len(batch) >= batch_size:
+                sent += connection.send_messages(batch) or 0
+                batch = []
+        if batch:
+            sent += connection.send_messages(batch) or 0
+    logger.info(f"my_job: sent {sent} mails, rendered {renderer.rendered} distinct digests")
+    return sent
 
 
 
@@ -1,12 +1,16 @@
 from random import randint as rint
 
 from django.db import models
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
 from django.core.validators import MinValueValidator
 from django.core.cache import cache
 from django.contrib.auth.models import User
 from datetime import datetime
 import datetime as dt
 from django.conf import settings
+from .fields import CompressedTextField, PreviewField
+from .votes import apply_vote
 
 from pprint import pprint
 
@@ -18,29 +22,24 @@ class Author(models.Model):
     def __str__(self):
         return self.user.username
 
-    def update_rating(self): #обновление рейтинга автора по трем критериям
-
-        # Расчет рейтинга постов автора
-        _raiting=Post.objects.filter(author_id=self.id).values('raiting')
-        post_raiting=0
-        for pst in _raiting:
-            post_raiting +=pst['raiting']
-        post_raiting *=3 # утроенное значение суммы рейтингов постов
-
-        # Расчет рейтинга комментов автора
-        _raiting = Comment.objects.filter(user_id=self.user.id).values('raiting')
-        comm_raiting=0
-        for cmt in _raiting:
-            comm_raiting +=cmt['raiting']
-
-        # Расчет суммы рейтингов комментов к статьям автора
-        _raiting = Comment.objects.filter(post__author=self).values('raiting')
-        comm_posts_raiting=0
-        for cmt_pst in _raiting:
-            comm_posts_raiting +=cmt_pst['raiting']
-
-        self.raiting=post_raiting+comm_raiting+comm_posts_raiting
-        self.save()
+    @staticmethod
+    def rating_expression(): # выражение для расчета рейтинга автора на стороне БД по трем критериям
+        # Утроенная сумма рейтингов постов автора
+        post_raiting = Subquery(Post.objects.filter(author_id=OuterRef('pk')).order_by()
+                                .values('author_id').annotate(s=Sum('raiting')).values('s'))
+        # Сумма рейтингов комментов автора
+        comm_raiting = Subquery(Comment.objects.filter(user_id=OuterRef('user_id')).order_by()
+                                .values('user_id').annotate(s=Sum('raiting')).values('s'))
+        # Сумма рейтингов комментов к статьям автора
+        comm_posts_raiting = Subquery(Comment.objects.filter(post__author_id=OuterRef('pk')).order_by()
+                                      .values('post__author_id').annotate(s=Sum('raiting')).values('s'))
+        return (Coalesce(post_raiting, 0) * 3 + Coalesce(comm_raiting, 0) +
+                Coalesce(comm_posts_raiting, 0))
+
+    def update_rating(self): #обновление рейтинга автора по трем критериям одним агрегирующим запросом
+        self.raiting = (Author.objects.filter(pk=self.pk).annotate(new_raiting=self.rating_expression())
+                        .values_list('new_raiting', flat=True).get())
+        self.save(update_fields=['raiting'])
 
 
 class Category(models.Model):
@@ -61,13 +60,55 @@ class Post(models.Model):
     create_time = models.DateTimeField(auto_now_add=datetime.now(tz=dt.timezone.utc))  # дата добавления поста
     category=models.ManyToManyField(Category, through='PostCategory', verbose_name='Категория публикации', related_name='post')
     title=models.CharField(max_length=50, verbose_name='Заголовок поста') #заголовок поста
-    content=models.TextField(verbose_name='Содержание поста') # содержание поста
+    content=CompressedTextField(verbose_name='Содержание поста') # содержание поста (длинные статьи можно хранить сжатыми)
+    preview=PreviewField(max_length=124, source='content') # начало статьи для ленты, которая не загружает content
     raiting=models.IntegerField(default=0) # рейтинг поста
+    update_time = models.DateTimeField(auto_now=True)  # дата последнего изменения поста
+    # денормализованные счетчики для ленты (news_portal.counters), обновляются сигналами
+    comment_count = models.PositiveIntegerField(default=0)  # число комментов
+    category_labels = models.CharField(max_length=255, blank=True, default='')  # категории через запятую
+
+    # поля, которые меняются только атомарными UPDATE, а не сохранением всего поста:
+    # счетчики (сигналы) и рейтинг (голоса, news_portal.votes)
+    denormalized_fields = ('comment_count', 'category_labels', 'raiting')
+
+    class Meta:
+        indexes = [
+            # лента и курсорная пагинация: ORDER BY create_time DESC, id DESC
+            models.Index(fields=['-create_time', '-id'], name='post_feed_idx'),
+            # лимит публикаций автора за сутки и выборки постов автора за период
+            models.Index(fields=['author', 'create_time'], name='post_author_time_idx'),
+        ]
 
     def __str__(self):
         return f'{self.content[:30:]}, {self.author.user.username} '
 
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_denormalized()
+        return instance
+
+    def remember_denormalized(self):  # значения счетчиков и рейтинга, известные базе
+        self._denormalized_loaded = {name: self.__dict__[name] for name in self.denormalized_fields
+                                     if name in self.__dict__}
+
+    def save(self, *args, **kwargs):
+        # сохранение уже существующего поста не перезаписывает счетчики и рейтинг значениями,
+        # прочитанными до появления новых комментов, категорий и голосов; поле, измененное явно
+        # (админка, shell), сохраняется
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            loaded = getattr(self, '_denormalized_loaded', {})
+            skip = {name for name in self.denormalized_fields
+                    if name not in loaded or loaded[name] == getattr(self, name)} | self.get_deferred_fields()
+            kwargs['update_fields'] = [f.name for f in self._meta.concrete_fields
+                                       if not f.primary_key and f.attname not in skip]
+        elif kwargs.get('update_fields') is not None and 'content' in kwargs['update_fields']:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'preview'}  # превью следует за текстом
+        super().save(*args, **kwargs)
+        self.remember_denormalized()
+
     # def save(self, *args, **kwargs):
     #     super().save(*args, **kwargs)  # обращение к родителю вызывается для того, чтобы при изменении поста сам объект сохраниолся
     #     # cache.delete(f'post-{self.pk}')  # после сохранения поста удаляем кэш
@@ -80,25 +121,26 @@ class Post(models.Model):
         self.create_time=datetime(y_,m_,d_,h,m,s)
         self.save()
 
-    # Увеличение и уменьшение рейтинга поста
+    # Увеличение и уменьшение рейтинга поста (атомарно, без перезаписи всех полей)
     def like(self):
-        self.raiting += 1
-        self.save()
+        apply_vote(self, 1)
     def dislike(self):
-        self.raiting -= 1
-        self.save()
+        apply_vote(self, -1)
 
     def get_id(self):
         return self.pk
 
-    def preview(self): # предварительный просмотр статьи
-        return f'{self.content[:124:]}......'
 
 
 class PostCategory(models.Model):
     post=models.ForeignKey(Post, on_delete=models.CASCADE)
     category=models.ForeignKey(Category, on_delete=models.CASCADE)
 
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['post', 'category'], name='uniq_post_category')]
+        # обратный проход "категория -> посты" (рассылки, фильтр по категории)
+        indexes = [models.Index(fields=['category', 'post'], name='postcat_category_post_idx')]
+
     def __str__(self):
         return self.category.category
 
@@ -108,15 +150,18 @@ class Comment(models.Model):
     user=models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
     comment_text=models.CharField(max_length=200)
     create_time = models.DateTimeField(auto_now_add=True)
+    update_time = models.DateTimeField(auto_now=True)  # дата последнего изменения коммента
     raiting=models.IntegerField(default=0)
 
+    class Meta:
+        # список комментов к посту в порядке создания
+        indexes = [models.Index(fields=['post', 'create_time'], name='comment_post_time_idx')]
+
     # Увеличение и уменьшение рейтинга комментариев
     def like(self):
-        self.raiting += 1
-        self.save()
+        apply_vote(self, 1)
     def dislike(self):
-        self.raiting -= 1
-        self.save()
+        apply_vote(self, -1)
 
 
 class Mail(models.Model): # модель для работы с почтой
@@ -129,12 +174,41 @@ class Mail(models.Model): # модель для работы с почтой
         return f'recepient_list={self.recepients}. Message={self.message}'
 
 
+class MailingCheckpoint(models.Model): # контрольная точка рассылки, чтобы продолжить ее после падения воркера
+    name=models.CharField(max_length=50, unique=True) # название рассылки
+    run=models.CharField(max_length=20) # идентификатор запуска (например, неделя '2024-W05')
+    window_start=models.DateTimeField() # начало периода, за который собираются публикации
+    last_subscriber_id=models.BigIntegerField(default=0) # последний подписчик, которому письмо уже ушло
+    finished=models.BooleanField(default=False)
+
+    def __str__(self):
+        return f'{self.name} {self.run}: {self.last_subscriber_id}'
+
+
 class UserSubcribes (models.Model): # класс, определяющий на какие категории публикаци подписаны пользователи
     subcribe=models.ForeignKey(User, on_delete=models.DO_NOTHING)
     category=models.ForeignKey(Category, on_delete=models.DO_NOTHING)
 
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['subcribe', 'category'], name='uniq_user_subscribe')]
+        # выборка подписчиков категории при рассылках
+        indexes = [models.Index(fields=['category', 'subcribe'], name='subscribe_category_user_idx')]
+
     def __str__(self):
         return self.subcribe.email
 
 
+class FeedEntry(models.Model): # запись персональной ленты "мои категории" (см. feed.py)
+    user=models.ForeignKey(User, on_delete=models.CASCADE, related_name='feed_entries')
+    post=models.ForeignKey(Post, on_delete=models.CASCADE, related_name='feed_entries')
+    create_time=models.DateTimeField() # копия времени публикации: лента читается по индексу без сортировки постов
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['user', 'post'], name='uniq_feed_entry')]
+        indexes = [models.Index(fields=['user', '-create_time', '-post'], name='feed_user_time_idx')]
+
+    def __str__(self):
+        return f'{self.user_id}: {self.post_id}'
+
+
 # Create your models here.
@@ -0,0 +1,143 @@
+# Курсорная (keyset) пагинация ленты постов по ключу (create_time, pk).
+# В отличие от стандартного Paginator не использует OFFSET и не выполняет COUNT(*):
+# страница выбирается условием "строго после/до последней показанной записи",
+# поэтому стоимость любой страницы одинакова и не зависит от ее глубины.
+import base64
+import json
+from datetime import datetime
+
+from django.conf import settings
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+from django.http import Http404
+
+
+def encode_cursor(obj, direction):  # непрозрачный токен курсора
+    raw = json.dumps({'t': obj.create_time.isoformat(), 'pk': obj.pk, 'd': direction})
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        data = json.loads(raw)
+        if data['d'] not in ('n', 'p'):
+            raise ValueError(data['d'])
+        return datetime.fromisoformat(data['t']), int(data['pk']), data['d']
+    except (ValueError, KeyError, TypeError) as e:
+        raise Http404(f'Некорректный курсор страницы: {e}')
+
+
+class KeysetPage:
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next, self._has_previous = has_next, has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self):
+        return encode_cursor(self.object_list[-1], 'n') if self._has_next else None
+
+    @property
+    def previous_cursor(self):
+        return encode_cursor(self.object_list[0], 'p') if self._has_previous else None
+
+
+class KeysetPaginator:
+    ordering = ('-create_time', '-pk')
+
+    def __init__(self, queryset, per_page):
+        self.queryset, self.per_page = queryset, per_page
+
+    def _query(self, cursor):  # срез queryset для страницы (с одной лишней строкой) и направление
+        qs = self.queryset
+        if not cursor:  # первая страница
+            return qs.order_by(*self.ordering)[:self.per_page + 1], None
+        create_time, pk, direction = decode_cursor(cursor)
+        if direction == 'n':  # следующая страница - более старые посты
+            return (qs.filter(Q(create_time__lt=create_time) | Q(create_time=create_time, pk__lt=pk))
+                    .order_by(*self.ordering)[:self.per_page + 1], direction)
+        # предыдущая страница - выбираем в обратном порядке и разворачиваем
+        return (qs.filter(Q(create_time__gt=create_time) | Q(create_time=create_time, pk__gt=pk))
+                .order_by('create_time', 'pk')[:self.per_page + 1], direction)
+
+    def _page(self, rows, direction):
+        more = len(rows) > self.per_page
+        if direction is None:
+            return KeysetPage(rows[:self.per_page], self, more, False)
+        if direction == 'n':
+            return KeysetPage(rows[:self.per_page], self, more, True)
+        return KeysetPage(rows[:self.per_page][::-1], self, True, more)
+
+    def page(self, cursor=None):
+        query, direction = self._query(cursor)
+        return self._page(list(query), direction)
+
+    async def apage(self, cursor=None):
+        query, direction = self._query(cursor)
+        return self._page([obj async for obj in query], direction)
+
+
+class KeysetPaginationMixin:  # миксин для ListView; по умолчанию остается обычная пагинация
+    keyset_pagination = None  # None - берется значение settings.KEYSET_PAGINATION
+    cursor_kwarg = 'cursor'
+
+    def use_keyset(self):
+        if self.keyset_pagination is not None:
+            return self.keyset_pagination
+        return (getattr(settings, 'KEYSET_PAGINATION', False) or
+                self.cursor_kwarg in self.request.GET)
+
+    def paginate_queryset(self, queryset, page_size):
+        if getattr(self, '_paginated', None) is not None:  # страница уже выбрана в apaginate_queryset
+            return self._paginated
+        if not self.use_keyset():
+            return super().paginate_queryset(queryset, page_size)
+        paginator = KeysetPaginator(queryset, page_size)
+        page = paginator.page(self.request.GET.get(self.cursor_kwarg))
+        return paginator, page, page.object_list, page.has_other_pages()
+
+    async def apaginate_queryset(self, queryset, page_size):
+        """Асинхронный вариант paginate_queryset для асинхронных представлений: COUNT и строки
+        страницы выбираются асинхронным ORM, результат запоминается для get_context_data"""
+        if self.use_keyset():
+            paginator = KeysetPaginator(queryset, page_size)
+            page = await paginator.apage(self.request.GET.get(self.cursor_kwarg))
+        else:
+            paginator = self.get_paginator(queryset, page_size, orphans=self.get_paginate_orphans(),
+                                           allow_empty_first_page=self.get_allow_empty())
+            paginator.count = await queryset.acount()  # count - cached_property, второго COUNT не будет
+            try:
+                page = paginator.page(self.page_number(paginator))
+            except InvalidPage as e:
+                raise Http404(f'Некорректная страница: {e}')
+            page.object_list = [obj async for obj in page.object_list]
+        self._paginated = paginator, page, page.object_list, page.has_other_pages()
+        return self._paginated
+
+    def page_number(self, paginator):  # номер страницы из url, как в MultipleObjectMixin.paginate_queryset
+        page = self.kwargs.get(self.page_kwarg) or self.request.GET.get(self.page_kwarg) or 1
+        try:
+            return paginator.num_pages if page == 'last' else int(page)
+        except ValueError:
+            raise Http404('Номер страницы должен быть числом или "last"')
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['keyset'] = self.use_keyset()
+        return context
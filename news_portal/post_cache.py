@@ -0,0 +1,110 @@
+# Версионный кэш страницы поста.
+# Все ключи поста содержат его текущую версию: post:<pk>:v<версия>:<часть>.
+# Увеличение версии одной операцией делает недействительными сразу пост, список его
+# комментов и список категорий; старые ключи просто доживают свой TTL.
+# Версия увеличивается сигналами (signals.py) и при атомарных обновлениях через QuerySet.update(),
+# внутри транзакции - еще раз после коммита.
+# Пост и версии хранятся в пространстве имен 'posts', счетчики попаданий - в кэше по умолчанию.
+import time
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db import transaction
+from django.utils.connection import ConnectionProxy
+
+posts_cache = ConnectionProxy(caches, 'posts')
+
+STATS_KEYS = {'hits': 'post_cache:hits', 'misses': 'post_cache:misses'}
+
+
+def _version_key(pk):
+    return f'post:{pk}:version'
+
+
+def post_version(pk):
+    version = posts_cache.get(_version_key(pk))
+    if version is None:
+        # версия начинается с метки времени, а не с 1, чтобы после вытеснения ключа версии
+        # не всплыли старые записи с той же версией
+        posts_cache.add(_version_key(pk), time.time_ns(), timeout=None)
+        version = posts_cache.get(_version_key(pk))
+    return version
+
+
+async def apost_version(pk):
+    version = await posts_cache.aget(_version_key(pk))
+    if version is None:
+        await posts_cache.aadd(_version_key(pk), time.time_ns(), timeout=None)
+        version = await posts_cache.aget(_version_key(pk))
+    return version
+
+
+def post_key(pk, part):
+    return f'post:{pk}:v{post_version(pk)}:{part}'
+
+
+def _bump_version(pk):
+    try:
+        posts_cache.incr(_version_key(pk))
+    except ValueError:  # версии еще нет - значит и кэшировать было нечего
+        posts_cache.add(_version_key(pk), time.time_ns(), timeout=None)
+
+
+def invalidate_post(pk):  # сброс всех закэшированных частей поста
+    _bump_version(pk)  # сразу - для чтений внутри той же транзакции
+    if transaction.get_connection().in_atomic_block:
+        # до коммита параллельный запрос видит старую строку и может закэшировать ее под новой
+        # версией - после коммита версия увеличивается еще раз
+        transaction.on_commit(partial(_bump_version, pk))
+
+
+def _count(name):
+    if not cache.add(STATS_KEYS[name], 1, timeout=None):
+        try:
+            cache.incr(STATS_KEYS[name])
+        except ValueError:
+            cache.set(STATS_KEYS[name], 1, timeout=None)
+
+
+def get_or_load(pk, part, loader, timeout=None):  # чтение части поста из кэша с подсчетом попаданий
+    key = post_key(pk, part)
+    value = posts_cache.get(key)
+    if value is not None:
+        _count('hits')
+        return value
+    _count('misses')
+    value = loader()
+    posts_cache.set(key, value, getattr(settings, 'POST_CACHE_TIMEOUT', 300) if timeout is None else timeout)
+    return value
+
+
+async def _acount(name):
+    if not await cache.aadd(STATS_KEYS[name], 1, timeout=None):
+        try:
+            await cache.aincr(STATS_KEYS[name])
+        except ValueError:
+            await cache.aset(STATS_KEYS[name], 1, timeout=None)
+
+
+async def aget_or_load(pk, part, loader, timeout=None):  # асинхронный вариант, loader - корутинная функция
+    key = f'post:{pk}:v{await apost_version(pk)}:{part}'
+    value = await posts_cache.aget(key)
+    if value is not None:
+        await _acount('hits')
+        return value
+    await _acount('misses')
+    value = await loader()
+    await posts_cache.aset(key, value, getattr(settings, 'POST_CACHE_TIMEOUT', 300) if timeout is None else timeout)
+    return value
+
+
+def stats():  # счетчики для мониторинга
+    values = cache.get_many(STATS_KEYS.values())
+    hits, misses = (values.get(STATS_KEYS[name], 0) for name in ('hits', 'misses'))
+    total = hits + misses
+    return {'hits': hits, 'misses': misses, 'hit_ratio': hits / total if total else 0.0}
+
+
+def reset_stats():
+    cache.delete_many(STATS_KEYS.values())
@@ -1,53 +1,242 @@
+import logging
+import random
+import threading
 import tracemalloc
 import time
+from bisect import bisect_left
+from contextlib import ExitStack
 from functools import wraps
-from django.db import connection, reset_queries
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.core.cache import cache
+from django.db import connections
 from django.conf import settings
+from django.urls import get_resolver
 
-def profile_view(func):
+logger = logging.getLogger('news_portal.performance')
+
+# границы корзин гистограммы времени ответа, мс (последняя корзина - все, что дольше)
+TIME_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+FIELDS = ('requests', 'time_ms', 'queries', 'sql_ms', 'memory_samples', 'memory_kb')
+
+
+class QueryCounter:  # подсчет SQL запросов через execute_wrapper, работает и при DEBUG = False
+    def __init__(self):
+        self.count = 0
+        self.time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.time += time.perf_counter() - start
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for conn in connections.all():
+            self._stack.enter_context(conn.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc):
+        self._stack.close()
+
+    # соединения у каждого потока свои, а под ASGI ORM работает в потоке sync_to_async:
+    # обертки ставятся и снимаются там же (запросы из потоков thread_sensitive=False не считаются)
+    async def __aenter__(self):
+        return await sync_to_async(self.__enter__)()
+
+    async def __aexit__(self, *exc):
+        await sync_to_async(self.__exit__)(*exc)
+
+
+_memory_lock = threading.Lock()  # tracemalloc глобален для процесса: память меряет один запрос за раз
+
+
+class Measurement:
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.peak_memory = None
+
+    def _start_tracing(self):
+        self._traced = (self.trace_memory and not tracemalloc.is_tracing() and
+                        _memory_lock.acquire(blocking=False))
+        if self._traced:
+            tracemalloc.start()
+
+    def _stop_tracing(self):
+        if self._traced:
+            self.peak_memory = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            _memory_lock.release()
+
+    def __enter__(self):
+        self._start_tracing()
+        self.queries = QueryCounter().__enter__()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self._start
+        self.queries.__exit__(*exc)
+        self._stop_tracing()
+
+    async def __aenter__(self):
+        self._start_tracing()
+        self.queries = await QueryCounter().__aenter__()
+        self._start = time.perf_counter()
+        return self
+
+    async def __aexit__(self, *exc):
+        self.elapsed = time.perf_counter() - self._start
+        await self.queries.__aexit__(*exc)
+        self._stop_tracing()
+
+
+def _incr(key, delta=1):
+    if not cache.add(key, delta, timeout=None):
+        try:
+            cache.incr(key, delta)
+        except ValueError:
+            cache.set(key, delta, timeout=None)
+
+
+def view_names(resolver=None, prefix=''):
+    """Имена url проекта (с пространствами имен) и 'unresolved' - фиксированный реестр агрегатов:
+    отдельного изменяемого списка имен в кэше нет, поэтому воркерам нечего перезаписывать друг у друга"""
+    resolver = resolver or get_resolver()
+    names = {prefix + key for key in resolver.reverse_dict if isinstance(key, str)}
+    for namespace, (_, sub_resolver) in resolver.namespace_dict.items():
+        names |= view_names(sub_resolver, f'{prefix}{namespace}:')
+    return names if prefix else names | {'unresolved'}
+
+
+def _keys(name):
+    return ([f'perf:{name}:{field}' for field in FIELDS] +
+            [f'perf:{name}:time:{i}' for i in range(len(TIME_BUCKETS) + 1)])
+
+
+def record(name, measurement):
+    """Добавление замера в агрегаты по имени url из view_names(). Агрегаты - счетчики в кэше default:
+    общие для воркеров с CACHE_BACKEND=redis (file теряет часть одновременных приращений), с locmem -
+    свои в каждом процессе, и perf_report их не видит"""
+    elapsed_ms = measurement.elapsed * 1000
+    _incr(f'perf:{name}:requests')
+    _incr(f'perf:{name}:time:{bisect_left(TIME_BUCKETS, elapsed_ms)}')
+    _incr(f'perf:{name}:time_ms', round(elapsed_ms))
+    _incr(f'perf:{name}:queries', measurement.queries.count)
+    _incr(f'perf:{name}:sql_ms', round(measurement.queries.time * 1000))
+    if measurement.peak_memory is not None:
+        _incr(f'perf:{name}:memory_samples')
+        _incr(f'perf:{name}:memory_kb', measurement.peak_memory // 1024)
+
+
+def report():
+    """Агрегаты по каждому имени url: число замеров, средние значения и гистограмма времени"""
+    result = {}
+    for name in sorted(view_names()):
+        values = cache.get_many(_keys(name))
+        get = lambda key: values.get(f'perf:{name}:{key}', 0)
+        requests = get('requests')
+        if not requests:
+            continue
+        result[name] = {
+            'requests': requests,
+            'avg_time_ms': get('time_ms') / requests,
+            'avg_queries': get('queries') / requests,
+            'avg_sql_ms': get('sql_ms') / requests,
+            'avg_memory_kb': get('memory_kb') / get('memory_samples') if get('memory_samples') else None,
+            'histogram': [(bound, get(f'time:{i}')) for i, bound in enumerate(TIME_BUCKETS + (None,))],
+        }
+    return result
+
+
+def reset():
+    cache.delete_many([key for name in view_names() for key in _keys(name)])
+
+
+def check_budget(name, measurement):  # предупреждение в лог при превышении бюджета представления
+    budget = getattr(settings, 'PERF_BUDGETS', {}).get(name)
+    if not budget:
+        return
+    elapsed_ms = measurement.elapsed * 1000
+    exceeded = []
+    if 'time_ms' in budget and elapsed_ms > budget['time_ms']:
+        exceeded.append(f"time {elapsed_ms:.1f} ms > {budget['time_ms']} ms")
+    if 'queries' in budget and measurement.queries.count > budget['queries']:
+        exceeded.append(f"queries {measurement.queries.count} > {budget['queries']}")
+    if 'memory_kb' in budget and measurement.peak_memory is not None \
+            and measurement.peak_memory // 1024 > budget['memory_kb']:
+        exceeded.append(f"memory {measurement.peak_memory // 1024} KB > {budget['memory_kb']} KB")
+    if exceeded:
+        logger.warning(f'Performance budget exceeded for {name}: {"; ".join(exceeded)}')
+
+
+class PerformanceBudgetMiddleware:
+    """Замер доли PERF_SAMPLE_RATE запросов: время, число и время SQL запросов и (при
+    PERF_TRACE_MEMORY) пиковая память. Результаты копятся по имени url, бюджеты из PERF_BUDGETS
+    проверяются для каждого замеренного запроса"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    @staticmethod
+    def sampled():
+        return random.random() < getattr(settings, 'PERF_SAMPLE_RATE', 0.0)
+
+    @staticmethod
+    def finish(request, measurement):
+        match = request.resolver_match  # url без имени - под 'unresolved', вне реестра view_names()
+        name = match.view_name if match is not None and match.url_name else 'unresolved'
+        record(name, measurement)
+        check_budget(name, measurement)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.sampled():
+            return self.get_response(request)
+        with Measurement(trace_memory=getattr(settings, 'PERF_TRACE_MEMORY', False)) as measurement:
+            response = self.get_response(request)
+        self.finish(request, measurement)
+        return response
+
+    async def __acall__(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+        async with Measurement(trace_memory=getattr(settings, 'PERF_TRACE_MEMORY', False)) as measurement:
+            response = await self.get_response(request)
+        await sync_to_async(self.finish)(request, measurement)  # счетчики в кэше - синхронные вызовы
+        return response
+
+
+def profile_view(func):  # разовое профилирование функции с выводом на экран (для отладки)
     @wraps(func)
     def wrapper(*args, **kwargs):
-        tracemalloc.start()
-        reset_queries()
-        start_time = time.time()
-        
-        result = func(*args, **kwargs)
-        
-        end_time = time.time()
-        elapsed_time = end_time - start_time
-        
-        current, peak = tracemalloc.get_traced_memory()
-        tracemalloc.stop()
-        
-        queries_count = len(connection.queries)
-        queries_time = sum(float(q['time']) for q in connection.queries)
-        
+        with Measurement(trace_memory=True) as measurement:
+            result = func(*args, **kwargs)
+
         print(f"\n{'='*60}")
         print(f"Профилирование: {func.__name__}")
         print(f"{'='*60}")
-        print(f"Время выполнения: {elapsed_time:.4f} сек")
-        print(f"Текущее использование памяти: {current / 1024 / 1024:.2f} MB")
-        print(f"Пиковое использование памяти: {peak / 1024 / 1024:.2f} MB")
-        print(f"Количество SQL запросов: {queries_count}")
-        print(f"Время выполнения SQL запросов: {queries_time:.4f} сек")
-        
-        if settings.DEBUG and queries_count > 0:
-            print(f"\nSQL запросы:")
-            for i, query in enumerate(connection.queries[:10], 1):
-                print(f"{i}. {query['sql'][:100]}... ({query['time']} сек)")
-            if queries_count > 10:
-                print(f"... и еще {queries_count - 10} запросов")
-        
+        print(f"Время выполнения: {measurement.elapsed:.4f} сек")
+        if measurement.peak_memory is not None:
+            print(f"Пиковое использование памяти: {measurement.peak_memory / 1024 / 1024:.2f} MB")
+        print(f"Количество SQL запросов: {measurement.queries.count}")
+        print(f"Время выполнения SQL запросов: {measurement.queries.time:.4f} сек")
         print(f"{'='*60}\n")
-        
+
         return result
     return wrapper
 
 def get_top_memory_stats():
     snapshot = tracemalloc.take_snapshot()
     top_stats = snapshot.statistics('lineno')
-    
+
     print("\nТоп 10 строк по использованию памяти:")
     for index, stat in enumerate(top_stats[:10], 1):
         print(f"{index}. {stat}")
-
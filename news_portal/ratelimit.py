@@ -0,0 +1,147 @@
+# Ограничение частоты запросов пользователя или IP-адреса (скользящее окно на счетчиках в кэше).
+# Лимиты задаются в settings.RATE_LIMITS строками вида "10/m" (запросов за секунду, минуту,
+# час, сутки). Каждое окно - один счетчик в кэше, увеличиваемый атомарным incr; число запросов
+# за последний период оценивается как текущее окно плюс доля предыдущего, пропорциональная
+# еще не прошедшей части периода. База данных не используется, счетчики хранятся
+# в пространстве имен кэша 'ratelimit'.
+# Применяется декоратором ratelimit (функции) или примесью RateLimitMixin (классы).
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.shortcuts import render
+from django.utils.connection import ConnectionProxy
+
+cache = ConnectionProxy(caches, 'ratelimit')  # счетчики всегда в общем кэше (без локального уровня)
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """'10/m' -> (10, 60)"""
+    try:
+        count, period = rate.split('/')
+        return int(count), PERIODS[period]
+    except (ValueError, KeyError):
+        raise ImproperlyConfigured(f'Неверный лимит {rate!r}: ожидается "число/s|m|h|d"')
+
+
+def get_rate(scope):
+    """Лимит scope из settings.RATE_LIMITS; None - не ограничивается"""
+    if not getattr(settings, 'RATE_LIMIT_ENABLED', True):
+        return None
+    rate = getattr(settings, 'RATE_LIMITS', {}).get(scope)
+    return parse_rate(rate) if rate else None
+
+
+def _keys(key, period, now):
+    window = int(now // period)
+    return f'rl:{key}:{period}:{window}', f'rl:{key}:{period}:{window - 1}'
+
+
+def _estimate(current, previous, period, now):
+    return current + previous * (period - now % period) / period
+
+
+def hit(key, limit, period):
+    """Учет запроса; True, если он укладывается в limit запросов за period секунд"""
+    now = time.time()
+    current_key, previous_key = _keys(key, period, now)
+    cache.add(current_key, 0, timeout=2 * period)
+    try:
+        current = cache.incr(current_key)
+    except ValueError:  # окно истекло между add и incr
+        cache.add(current_key, 1, timeout=2 * period)
+        current = 1
+    return _estimate(current, cache.get(previous_key, 0), period, now) <= limit
+
+
+async def ahit(key, limit, period):
+    now = time.time()
+    current_key, previous_key = _keys(key, period, now)
+    await cache.aadd(current_key, 0, timeout=2 * period)
+    try:
+        current = await cache.aincr(current_key)
+    except ValueError:
+        await cache.aadd(current_key, 1, timeout=2 * period)
+        current = 1
+    return _estimate(current, await cache.aget(previous_key, 0), period, now) <= limit
+
+
+def refund(key, limit, period):
+    """Возврат учтенного запроса, если действие не состоялось (ошибка формы, отказ по лимиту)"""
+    current_key, _ = _keys(key, period, time.time())
+    try:
+        cache.decr(current_key)
+    except ValueError:  # окно уже истекло - запрос в нем больше не учитывается
+        pass
+
+
+def peek(key, limit, period):
+    """Проверка без учета запроса: останется ли место еще для одного"""
+    now = time.time()
+    current_key, previous_key = _keys(key, period, now)
+    values = cache.get_many([current_key, previous_key])
+    return _estimate(values.get(current_key, 0) + 1, values.get(previous_key, 0), period, now) <= limit
+
+
+def client_key(request, by='user'):
+    """Ключ клиента: пользователь (для анонимных - IP-адрес) или всегда IP-адрес"""
+    user = getattr(request, 'user', None)
+    if by == 'user' and user is not None and user.is_authenticated:
+        return f'user:{user.pk}'
+    return f"ip:{request.META.get('REMOTE_ADDR', '')}"
+
+
+def limited_response(request):
+    return render(request, '429.html', status=429)
+
+
+def ratelimit(scope, by='user', methods=('GET', 'POST')):
+    """Декоратор представления-функции: сверх лимита scope отвечает 429"""
+    def decorator(view):
+        if iscoroutinefunction(view):
+            async def wrapper(request, *args, **kwargs):
+                rate = get_rate(scope)
+                if rate and request.method in methods and not await ahit(
+                        f'{scope}:{client_key(request, by)}', *rate):
+                    return limited_response(request)
+                return await view(request, *args, **kwargs)
+            markcoroutinefunction(wrapper)
+        else:
+            def wrapper(request, *args, **kwargs):
+                rate = get_rate(scope)
+                if rate and request.method in methods and not hit(f'{scope}:{client_key(request, by)}', *rate):
+                    return limited_response(request)
+                return view(request, *args, **kwargs)
+        return wraps(view)(wrapper)
+    return decorator
+
+
+class RateLimitMixin:
+    """Лимит для представления-класса. Ставится после LoginRequiredMixin, чтобы запросы
+    считались по пользователю (асинхронные представления проходят его через super)"""
+    rate_limit_scope = None
+    rate_limit_by = 'user'
+    rate_limit_methods = ('GET', 'POST')
+
+    def rate_limit_key(self, request):
+        return f'{self.rate_limit_scope}:{client_key(request, self.rate_limit_by)}'
+
+    def dispatch(self, request, *args, **kwargs):
+        rate = get_rate(self.rate_limit_scope)
+        if not rate or request.method not in self.rate_limit_methods:
+            return super().dispatch(request, *args, **kwargs)
+        if self.view_is_async:
+            return self._adispatch(rate, request, *args, **kwargs)
+        if not hit(self.rate_limit_key(request), *rate):
+            return limited_response(request)
+        return super().dispatch(request, *args, **kwargs)
+
+    async def _adispatch(self, rate, request, *args, **kwargs):
+        if not await ahit(self.rate_limit_key(request), *rate):
+            return limited_response(request)
+        return await super().dispatch(request, *args, **kwargs)
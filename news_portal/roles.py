@@ -0,0 +1,138 @@
+# Кэш групп и прав пользователя.
+# Группы и права загружаются одним запросом и хранятся в кэше (roles:<id пользователя>) между
+# запросами всех сессий пользователя, а в пределах запроса - на объекте пользователя.
+# RolesMiddleware кладет их в request.user_roles и заполняет кэш прав ModelBackend, поэтому
+# has_perm / permission_required тоже не ходят в базу.
+# Кэш сбрасывается сигналами m2m_changed на User.groups, User.user_permissions и
+# Group.permissions (signals.py).
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import cache
+from django.db.models import F, Value, CharField
+
+
+def _key(user_id):
+    return f'roles:{user_id}'
+
+
+class UserRoles:
+    def __init__(self, user, groups=(), permissions=()):
+        self.user = user
+        self.groups = frozenset(groups)
+        self.permissions = frozenset(permissions)  # в формате 'app_label.codename'
+
+    @property
+    def is_author(self):
+        return 'authors' in self.groups
+
+    def in_group(self, name):
+        return name in self.groups
+
+    def has_perm(self, perm):  # как User.has_perm: у активного суперпользователя есть все права
+        if not self.user.is_active:
+            return False
+        return self.user.is_superuser or perm in self.permissions
+
+
+def _roles_query(user):
+    # все колонки - аннотации, иначе Django ставит поля модели раньше выражений и порядок колонок
+    # частей UNION не совпадает
+    group_perms = (Group.objects.filter(user=user).order_by()
+                   .annotate(group_name=F('name'), app_label=F('permissions__content_type__app_label'),
+                             code=F('permissions__codename'))
+                   .values_list('group_name', 'app_label', 'code'))
+    user_perms = (Permission.objects.filter(user=user).order_by()
+                  .annotate(group_name=Value(None, output_field=CharField()), app_label=F('content_type__app_label'),
+                            code=F('codename'))
+                  .values_list('group_name', 'app_label', 'code'))
+    return group_perms.union(user_perms, all=True)
+
+
+def _collect(rows):
+    groups, permissions = set(), set()
+    for group, app_label, codename in rows:
+        if group is not None:
+            groups.add(group)
+        if codename is not None:
+            permissions.add(f'{app_label}.{codename}')
+    return groups, permissions
+
+
+def load_roles(user):
+    """Группы и права пользователя (свои и групп) одним запросом"""
+    return _collect(_roles_query(user))
+
+
+def get_roles(user):
+    roles = getattr(user, '_roles', None)
+    if roles is not None:
+        return roles
+    if not user.is_authenticated:
+        roles = UserRoles(user)
+    else:
+        cached = cache.get(_key(user.pk))
+        if cached is None:
+            cached = load_roles(user)
+            cache.set(_key(user.pk), cached, getattr(settings, 'ROLES_CACHE_TIMEOUT', 3600))
+        roles = UserRoles(user, *cached)
+    user._roles = roles
+    return roles
+
+
+async def aget_roles(user):
+    roles = getattr(user, '_roles', None)
+    if roles is not None:
+        return roles
+    if not user.is_authenticated:
+        roles = UserRoles(user)
+    else:
+        cached = await cache.aget(_key(user.pk))
+        if cached is None:
+            cached = _collect([row async for row in _roles_query(user)])
+            await cache.aset(_key(user.pk), cached, getattr(settings, 'ROLES_CACHE_TIMEOUT', 3600))
+        roles = UserRoles(user, *cached)
+    user._roles = roles
+    return roles
+
+
+def invalidate_roles(*user_ids):
+    cache.delete_many([_key(pk) for pk in user_ids])
+
+
+class RolesMiddleware:
+    """request.user_roles - группы и права текущего пользователя (ставится после AuthenticationMiddleware).
+    Работает и под ASGI без перехода в поток: пользователь берется через request.auser()"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    @staticmethod
+    def prime_perm_cache(user, roles):
+        if user.is_active and not user.is_superuser and not hasattr(user, '_perm_cache'):
+            # кэш ModelBackend.get_all_permissions: права уже известны, второй загрузки не будет
+            user._perm_cache = set(roles.permissions)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        user = request.user
+        if user.is_authenticated:
+            roles = get_roles(user)
+            self.prime_perm_cache(user, roles)
+            request.user_roles = roles
+        else:
+            request.user_roles = UserRoles(user)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        # ленивый request.user в асинхронном коде обратился бы к базе синхронно
+        request.user = user = await request.auser()
+        request.user_roles = roles = await aget_roles(user)
+        if user.is_authenticated:
+            self.prime_perm_cache(user, roles)
+        return await self.get_response(request)
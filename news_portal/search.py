@@ -0,0 +1,171 @@
+# Полнотекстовый поиск постов по заголовку и имени автора.
+# SQLite: виртуальная таблица FTS5 news_portal_post_fts (rowid = id поста), слова хранятся
+#   в виде основ, полученных легким русским стеммером stem_ru, ранжирование - bm25.
+# PostgreSQL: таблица news_portal_post_search с колонкой tsvector (конфигурация 'russian')
+#   и GIN-индексом, ранжирование - ts_rank.
+# Индекс обновляется сигналами post_save/post_delete поста (signals.py), полностью
+# перестраивается командой rebuild_search_index. Если индекса нет (или SEARCH_BACKEND = 'regex'),
+# PostFilter работает по-старому через iregex.
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = 'news_portal_post_fts'
+PG_TABLE = 'news_portal_post_search'
+
+_VOWELS = 'аеиоуыэюя'
+# окончания упорядочены по убыванию длины, отсекается самое длинное подходящее.
+# Короткие глагольные окончания (-ет, -ит, -л) не отсекаются: они чаще портят существительные
+# (полет, бюджет), а формы глаголов и так находятся поиском по префиксу основы
+_ENDINGS = sorted({
+    'ейшими', 'ующими', 'ающими', 'ившими', 'ывшими', 'ениями', 'ейшего', 'ейшему',
+    'иями', 'ями', 'ами', 'ого', 'его', 'ому', 'ему', 'ыми', 'ими', 'ение', 'ения', 'ений',
+    'ешь', 'ишь', 'ете', 'ите', 'ать', 'ять', 'ить', 'еть', 'уть', 'ала', 'яла',
+    'ила', 'ыла', 'ало', 'или', 'али', 'ует', 'уют', 'ией', 'иям', 'иях', 'ием',
+    'ый', 'ий', 'ой', 'ая', 'яя', 'ое', 'ее', 'ые', 'ие', 'ую', 'юю', 'ей', 'ых', 'их',
+    'ым', 'им', 'ом', 'ем', 'ах', 'ях', 'ов', 'ев', 'ам', 'ям', 'ия', 'ию', 'ии',
+    'а', 'я', 'о', 'е', 'ы', 'и', 'у', 'ю', 'ь', 'й',
+}, key=len, reverse=True)
+
+
+def stem_ru(word):  # легкий стеммер: отсекает возвратную частицу и одно окончание после первой гласной
+    word = word.lower().replace('ё', 'е')
+    rv = next((i + 1 for i, ch in enumerate(word) if ch in _VOWELS), None)
+    if rv is None:
+        return word
+    for suffix in ('ся', 'сь'):
+        if word.endswith(suffix) and len(word) - 2 >= rv:
+            word = word[:-2]
+            break
+    for ending in _ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= rv:
+            return word[:-len(ending)]
+    return word
+
+
+def tokens(text):
+    return [stem_ru(word) for word in re.findall(r'\w+', text or '')]
+
+
+def backend_name():
+    name = getattr(settings, 'SEARCH_BACKEND', 'auto')
+    if name == 'auto':
+        return {'sqlite': 'fts5', 'postgresql': 'postgres'}.get(connection.vendor, 'regex')
+    return name
+
+
+def _table():
+    return {'fts5': FTS_TABLE, 'postgres': PG_TABLE}.get(backend_name())
+
+
+_available = set()  # базы, в которых индекс уже найден (проверка через интроспекцию - лишний запрос)
+
+
+def available():  # индекс создан в текущей базе
+    table = _table()
+    key = (connection.settings_dict['NAME'], table)
+    if table is not None and key not in _available and table in connection.introspection.table_names():
+        _available.add(key)
+    return key in _available
+
+
+def create_index():
+    with connection.cursor() as cursor:
+        if backend_name() == 'fts5':
+            cursor.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+                           f"title, author, tokenize='unicode61 remove_diacritics 2', prefix='2 3')")
+        elif backend_name() == 'postgres':
+            cursor.execute(f'CREATE TABLE IF NOT EXISTS {PG_TABLE} ('
+                           f'post_id bigint PRIMARY KEY REFERENCES news_portal_post(id) ON DELETE CASCADE, '
+                           f'title tsvector NOT NULL, author tsvector NOT NULL)')
+            cursor.execute(f'CREATE INDEX IF NOT EXISTS {PG_TABLE}_title_gin ON {PG_TABLE} USING GIN (title)')
+            cursor.execute(f'CREATE INDEX IF NOT EXISTS {PG_TABLE}_author_gin ON {PG_TABLE} USING GIN (author)')
+
+
+def drop_index():
+    table = _table()
+    if table:
+        _available.discard((connection.settings_dict['NAME'], table))
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {table}')
+
+
+def index_posts(rows):  # rows: последовательность (id поста, заголовок, имя автора)
+    with connection.cursor() as cursor:
+        if backend_name() == 'fts5':
+            rows = [(pk, ' '.join(tokens(title)), ' '.join(tokens(author))) for pk, title, author in rows]
+            cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [(pk,) for pk, _, _ in rows])
+            cursor.executemany(f'INSERT INTO {FTS_TABLE} (rowid, title, author) VALUES (%s, %s, %s)', rows)
+        elif backend_name() == 'postgres':
+            cursor.executemany(
+                f"INSERT INTO {PG_TABLE} (post_id, title, author) "
+                f"VALUES (%s, to_tsvector('russian', %s), to_tsvector('simple', coalesce(%s, ''))) "
+                f"ON CONFLICT (post_id) DO UPDATE SET title = EXCLUDED.title, author = EXCLUDED.author",
+                list(rows))
+
+
+def rebuild_sql():  # PostgreSQL перестраивает индекс одним INSERT ... SELECT
+    return (f"INSERT INTO {PG_TABLE} (post_id, title, author) "
+            f"SELECT p.id, to_tsvector('russian', p.title), to_tsvector('simple', coalesce(u.username, '')) "
+            f"FROM news_portal_post p LEFT JOIN news_portal_author a ON a.id = p.author_id "
+            f"LEFT JOIN auth_user u ON u.id = a.user_id")
+
+
+def index_post(post):
+    if not available():
+        return
+    author = post.author.user.username if post.author_id else ''
+    index_posts([(post.pk, post.title, author)])
+
+
+def remove_post(pk):
+    table = _table()
+    if table is None or not available():
+        return
+    with connection.cursor() as cursor:
+        if table == FTS_TABLE:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [pk])
+        else:
+            cursor.execute(f'DELETE FROM {PG_TABLE} WHERE post_id = %s', [pk])
+
+
+def _fts_query(column, value):  # каждая основа ищется как префикс: "техн"* AND "нов"*
+    return f'{column} : (' + ' AND '.join(f'"{token}"*' for token in tokens(value)) + ')'
+
+
+def search(title=None, author=None, limit=None):
+    """Список id постов, подходящих под запрос, по убыванию релевантности"""
+    limit = limit or getattr(settings, 'SEARCH_MAX_RESULTS', 1000)
+    with connection.cursor() as cursor:
+        if backend_name() == 'fts5':
+            parts = [_fts_query(column, value) for column, value in (('title', title), ('author', author))
+                     if tokens(value)]
+            if not parts:
+                return []
+            # вес заголовка выше веса автора
+            cursor.execute(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+                           f'ORDER BY bm25({FTS_TABLE}, 10.0, 1.0) LIMIT %s', [' AND '.join(parts), limit])
+        else:
+            conditions, params = [], []
+            if title:
+                conditions.append("title @@ websearch_to_tsquery('russian', %s)")
+                params.append(title)
+            if author and tokens(author):  # имя автора ищется по префиксам слов без стемминга
+                conditions.append("author @@ to_tsquery('simple', %s)")
+                params.append(' & '.join(f'{word.lower()}:*' for word in re.findall(r'\w+', author)))
+            if not conditions:
+                return []
+            cursor.execute(f"SELECT post_id FROM {PG_TABLE} WHERE {' AND '.join(conditions)} "
+                           f"ORDER BY ts_rank(title, websearch_to_tsquery('russian', %s)) DESC LIMIT %s",
+                           params + [title or '', limit])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def relevance(ids):
+    """Выражение для сортировки постов в порядке ids. Одна функция вместо CASE на 1000 веток,
+    которую SQLite вычисляет для каждой строки заметно дольше самого поиска"""
+    if connection.vendor == 'postgresql':
+        return RawSQL('array_position(%s::bigint[], "news_portal_post"."id")', [list(ids)])
+    return RawSQL("""instr(%s, ',' || "news_portal_post"."id" || ',')""", [f",{','.join(map(str, ids))},"])
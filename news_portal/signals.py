@@ -1,6 +1,13 @@
-from django.db.models.signals import m2m_changed, post_save
+from django.db.models.signals import m2m_changed, post_save, post_delete, pre_delete, post_migrate
+from django.contrib.auth.models import User, Group
 from django.dispatch import receiver
-from .models import PostCategory, Post
+from .models import PostCategory, Post, Comment, Category
+from . import counters
+from .choices import invalidate_categories
+from .post_cache import invalidate_post
+from .roles import invalidate_roles
+from .user_cache import invalidate_user
+from . import search
 from .tasks import send_notify_to_subscribers, weekly_mailing
 from pprint import pprint
 
@@ -10,9 +17,133 @@ def notify_m2m_changed(sender, instance, action, **kwargs):
             # weekly_mailing.delay()
             send_notify_to_subscribers.delay(instance.id)
 
+# Денормализованные счетчики поста (counters.py): число комментов и названия категорий
+@receiver(signal=post_save, sender=Comment)
+def increment_comment_count(sender, instance, created, **kwargs):
+      if created:
+            counters.change_comment_count(instance.post_id, 1)
+
+@receiver(signal=post_delete, sender=Comment)
+def decrement_comment_count(sender, instance, **kwargs):
+      counters.change_comment_count(instance.post_id, -1)
+
+@receiver(signal=post_save, sender=PostCategory)
+@receiver(signal=post_delete, sender=PostCategory)
+def refresh_post_labels(sender, instance, **kwargs):
+      counters.refresh_labels([instance.post_id])
+
+@receiver(signal=m2m_changed, sender=PostCategory)
+def refresh_m2m_post_labels(sender, instance, action, reverse, pk_set, **kwargs):
+      if not reverse:  # post.category.add(...) / remove(...) / clear()
+            if action in ('post_add', 'post_remove', 'post_clear'):
+                  counters.refresh_labels([instance.pk])
+      elif action == 'pre_clear':  # category.post.clear(): посты запоминаются до удаления связей
+            instance._cleared_posts = list(instance.post.values_list('pk', flat=True))
+      elif action == 'post_clear':
+            counters.refresh_labels(instance.__dict__.pop('_cleared_posts', ()))
+      elif action in ('post_add', 'post_remove'):  # category.post.add(...) / remove(...)
+            counters.refresh_labels(pk_set or ())
+
+@receiver(signal=post_save, sender=Category)
+def refresh_category_labels(sender, instance, created, **kwargs):
+      if not created:  # переименование категории меняет подписи всех ее постов
+            post_ids = list(instance.post.values_list('pk', flat=True))
+            if counters.refresh_labels(post_ids):
+                  for pk in post_ids:
+                        invalidate_post(pk)
+
+# Сброс кэшированного списка категорий для форм (choices.py)
+@receiver(signal=post_save, sender=Category)
+@receiver(signal=post_delete, sender=Category)
+def invalidate_category_choices(sender, **kwargs):
+      invalidate_categories()
+
+# Сброс версионного кэша поста при любом изменении поста, его комментов или категорий
+@receiver(signal=post_save, sender=Post)
+@receiver(signal=post_delete, sender=Post)
+def invalidate_post_cache(sender, instance, **kwargs):
+      invalidate_post(instance.pk)
+
+@receiver(signal=post_save, sender=Comment)
+@receiver(signal=post_delete, sender=Comment)
+@receiver(signal=post_save, sender=PostCategory)
+@receiver(signal=post_delete, sender=PostCategory)
+def invalidate_related_post_cache(sender, instance, **kwargs):
+      invalidate_post(instance.post_id)
+
+@receiver(signal=m2m_changed, sender=PostCategory)
+def invalidate_post_categories_cache(sender, instance, action, reverse, pk_set, **kwargs):
+      if action not in ('post_add', 'post_remove', 'post_clear', 'pre_clear'):
+            return
+      if not reverse:  # post.category.add(...)
+            invalidate_post(instance.pk)
+      elif action == 'pre_clear':  # category.post.clear(): pk_set пуст, посты нужно запомнить заранее
+            for pk in instance.post.values_list('pk', flat=True):
+                  invalidate_post(pk)
+      else:  # category.post.add(...) / remove(...)
+            for pk in pk_set or ():
+                  invalidate_post(pk)
+
+# Синхронизация полнотекстового индекса постов
+@receiver(signal=post_save, sender=Post)
+def index_post(sender, instance, **kwargs):
+      search.index_post(instance)
+
+@receiver(signal=post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+      search.remove_post(instance.pk)
+
+@receiver(signal=post_migrate)
+def create_search_index(sender, using, **kwargs):
+      if sender.name == 'news_portal':
+            search.create_index()
+
 # @receiver(signal=post_save, sender=Post)
 # def update_post(sender, instance, action, **kwargs):
 #       if action == 'post_update':
 #             pprint(f'{instance.title} - {instance.pk}')
 #       if action == 'post_add':
-#             pprint(f'{instance.title} - {instance.pk}')
\ No newline at end of file
+#             pprint(f'{instance.title} - {instance.pk}')
+
+# Сброс кэша пользователя запроса (user_cache.py): смена пароля, активности, last_login при входе
+@receiver(signal=post_save, sender=User)
+@receiver(signal=post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
+
+# Сброс кэша групп и прав пользователей (roles.py) при изменении членства в группах и прав.
+# Кэш сбрасывается после изменения строк (post_*): сброшенный раньше, он успел бы заново заполниться
+# старыми группами запросом, пришедшим до удаления. pre_clear и pre_delete только запоминают
+# пользователей, которых после удаления связей уже не найти.
+_ROLES_USERS = '_roles_user_ids'
+
+@receiver(signal=m2m_changed, sender=User.groups.through)
+@receiver(signal=m2m_changed, sender=User.user_permissions.through)
+def invalidate_user_roles(sender, instance, action, reverse, pk_set, **kwargs):
+      if action == 'pre_clear' and reverse:  # group.user_set.clear(): pk_set пуст
+            setattr(instance, _ROLES_USERS, list(instance.user_set.values_list('pk', flat=True)))
+      elif action == 'post_clear' and reverse:
+            invalidate_roles(*instance.__dict__.pop(_ROLES_USERS, ()))
+      elif action in ('post_add', 'post_remove', 'post_clear'):
+            # user.groups.add(...) / clear() или group.user_set.add(...) / remove(...)
+            invalidate_roles(*((pk_set or ()) if reverse else (instance.pk,)))
+
+@receiver(signal=m2m_changed, sender=Group.permissions.through)
+def invalidate_group_roles(sender, instance, action, reverse, pk_set, **kwargs):
+      if action == 'pre_clear' and reverse:  # permission.group_set.clear()
+            setattr(instance, _ROLES_USERS,
+                    list(User.objects.filter(groups__permissions=instance).values_list('pk', flat=True).distinct()))
+      elif action == 'post_clear' and reverse:
+            invalidate_roles(*instance.__dict__.pop(_ROLES_USERS, ()))
+      elif action in ('post_add', 'post_remove', 'post_clear'):
+            # group.permissions.add(...) / clear() или permission.group_set.add(...) / remove(...)
+            groups = (pk_set or ()) if reverse else [instance.pk]
+            invalidate_roles(*User.objects.filter(groups__in=groups).values_list('pk', flat=True).distinct())
+
+@receiver(signal=pre_delete, sender=Group)
+def remember_deleted_group_users(sender, instance, **kwargs):
+      setattr(instance, _ROLES_USERS, list(instance.user_set.values_list('pk', flat=True)))
+
+@receiver(signal=post_delete, sender=Group)
+def invalidate_deleted_group_roles(sender, instance, **kwargs):
+      invalidate_roles(*instance.__dict__.pop(_ROLES_USERS, ()))
@@ -1,14 +1,18 @@
-from celery import shared_task
+from celery import shared_task, group, chain
 from django.conf import settings
-from django.template.loader import render_to_string
-from django.core.mail import EmailMultiAlternatives
-from .models import Post, Category, PostCategory, User, UserSubcribes, Mail, Comment
+from django.template.loader import render_to_string, get_template
+from django.core.mail import EmailMultiAlternatives, get_connection
+from .models import Post, Category, PostCategory, User, UserSubcribes, Mail, Comment, MailingCheckpoint
 import time
 from django.http import HttpResponse
 from datetime import datetime
 from datetime import timezone
 from datetime import timedelta
 
+from .votes import flush_votes as flush_buffered_votes
+from .digest import iter_digests, DigestRenderer
+from . import feed, comments
+
 import logging
 logger = logging.getLogger(__name__)
 
@@ -23,82 +27,146 @@ def hello_world():
     print("Hello world async")
 
 
+# Запись комментов из очереди (news_portal.comments) пачками
 @shared_task
-def test_comments(post_id, user_id):
-    time.sleep(10)
-    post_date = Post.objects.get(id=post_id).create_time
-    Comment.objects.create(user_id=user_id, comment_text=f'This is a comment created later than'
-                                                         f'{datetime.now(tz=timezone.utc)-post_date}',
-                           post_id=post_id)
+def flush_comments():
+    return comments.flush()
 
 
-# Функция отправки уведомлений о выходе новой статьи подписчикам категорий
+# Сброс накопленных в кэше голосов (лайков/дизлайков) в БД пачками
 @shared_task
-def send_notify_to_subscribers(instance_id):
+def flush_votes():
+    return {label: flush_buffered_votes(label) for label in ('news_portal.post', 'news_portal.comment')}
+
 
-    # Извлечение данных пользователей, подписанных на категории, к которым относится созданная публикация
-    post = (Post.objects.filter(pk=instance_id).prefetch_related('category').values(
-        'title', 'content', 'category__subscribers__id',
-        'category__subscribers__email', 'category__subscribers__username'))
-
-    # Формировние списка подисчиков через set во избежание дублирования
-    subcriber_list = set ([(item['category__subscribers__id'],
-                            item['category__subscribers__email'],
-                            item['category__subscribers__username'])
-                           for item in post])
-    logger.info(f'Subscribers: {subcriber_list}')
-    logger.info(f'post: {post}')
-    title, content = post[0]['title'], post[0]['content']
-    logger.info(f'title: {title}; content: {content}')
-
-    # Рассылка уведомления о выходе новой статьи подписчикам
-    for user_id, email, username in subcriber_list:
-        html = render_to_string('flatpages/mail/send_html_mail.html',
-                                {'post_title': title, 'username': username,
-                                 'post_content': content, 'post_pk': instance_id})
-        subject = f'Выход статьи с названием "{title}"'
-        msg = EmailMultiAlternatives(subject=subject,
-                                     body=html,
-                                     from_email=settings.DEFAULT_FROM_EMAIL,
-                                     to=[f'{email}'])
-        msg.attach_alternative(html, 'text/html')
-        msg.send()
-        Mail.objects.create(message=html, recepients_id=user_id, subject=subject)
-
-
-# Еженедельная рассылка уведомлений о последних публикациях за неделю
+# Удаление из персональных лент записей сверх FEED_MAX_LENGTH
 @shared_task
-def weekly_mailing():
-    delta=datetime.now (timezone.utc)-timedelta(days=7)
-    posts=(Post.objects.filter(create_time__gte=delta).prefetch_related('category').
-           values('pk', 'title', 'category__subscribers__email',
-                  'category__subscribers__username'))
-    for i in posts:
-        logger.info(i)
-
-    kwg=dict()
-    for post in posts:
-        email, username = post['category__subscribers__email'], post['category__subscribers__username']
-
-        # Ключ словаря представляет собой формат 'email/username'
-        key = f'{email}/{username}'
-        if key not in kwg:
-            kwg[key]=set()
-        kwg[key].add((post['pk'], post['title']))
-
-    for k, v in kwg.items():
-        logger.info(f'kwg[{k}]={v}')
-
-        # Присвоение данных пользователя из названия ключа словаря
-        email, username = k.split('/')
-        logger.info(f'{email}/{username}')
-
-        html=render_to_string('flatpages/mail/scheduler_message.html',
-                              {'username':username,'post':v})
-        msg=EmailMultiAlternatives(subject='Список публикаций за неделю для подписчиков ',
-                                   body='',
-                                   from_email=settings.DEFAULT_FROM_EMAIL,
-                                   to=[f'{email}'])
-        msg.attach_alternative(html,'text/html')
-        msg.send()
-    return 0
+def trim_feeds():
+    return feed.trim()
+
+
+# Функция отправки уведомлений о выходе новой статьи подписчикам категорий.
+# Подписчики делятся на пачки по MAIL_CHUNK_SIZE; пачки раскладываются на MAIL_FANOUT_PARALLELISM
+# цепочек, которые выполняются параллельно, а внутри цепочки - по очереди. Так рассылка по одной
+# публикации никогда не держит больше заданного числа SMTP-соединений одновременно.
+@shared_task
+def send_notify_to_subscribers(instance_id):
+    create_time = Post.objects.filter(pk=instance_id).values_list('create_time', flat=True).first()
+    if create_time is None:
+        return 0
+
+    # Подписчики категорий публикации без дублирования (пользователь может быть подписан на несколько)
+    subscriber_ids = list(UserSubcribes.objects.filter(category__post=instance_id)
+                          .order_by('subcribe_id').values_list('subcribe_id', flat=True).distinct())
+    chunk_size = getattr(settings, 'MAIL_CHUNK_SIZE', 500)
+    parallelism = max(1, getattr(settings, 'MAIL_FANOUT_PARALLELISM', 4))
+    chunks = [subscriber_ids[i:i + chunk_size] for i in range(0, len(subscriber_ids), chunk_size)]
+    logger.info(f'post {instance_id}: {len(subscriber_ids)} subscribers, {len(chunks)} chunks')
+    feed.push_post(instance_id, create_time, subscriber_ids)  # персональные ленты "мои категории"
+
+    if not chunks:
+        return 0
+    lanes = [chunks[i::parallelism] for i in range(min(parallelism, len(chunks)))]
+    group([chain([send_notify_chunk.si(instance_id, chunk) for chunk in lane]) for lane in lanes]).apply_async()
+    return len(subscriber_ids)
+
+
+# Отправка уведомлений одной пачке подписчиков через одно SMTP-соединение.
+# Письма отправляются по одному: Mail записываются для ушедших писем, а повтор задачи получает
+# только подписчиков, чьи письма не ушли. Исчерпав повторы, задача не падает, а пишет ошибку
+# в лог - иначе цепочка не отправила бы следующие пачки.
+@shared_task(bind=True, max_retries=3, default_retry_delay=60)
+def send_notify_chunk(self, instance_id, user_ids):
+    post = Post.objects.filter(pk=instance_id).values('title', 'content').first()
+    if post is None:
+        return 0
+    template = get_template('flatpages/mail/send_html_mail.html')
+    subject = f'Выход статьи с названием "{post['title']}"'
+
+    sent, failed, error = [], [], None
+    connection = get_connection()
+    connection.open()
+    try:
+        for user_id, email, username in User.objects.filter(pk__in=user_ids).values_list('pk', 'email', 'username'):
+            html = template.render({'post_title': post['title'], 'username': username,
+                                    'post_content': post['content'], 'post_pk': instance_id})
+            msg = EmailMultiAlternatives(subject=subject, body=html,
+                                         from_email=settings.DEFAULT_FROM_EMAIL, to=[email])
+            msg.attach_alternative(html, 'text/html')
+            try:
+                connection.send_messages([msg])
+            except Exception as exc:
+                failed.append(user_id)
+                error = exc
+            else:
+                sent.append(Mail(message=html, recepients_id=user_id, subject=subject))
+    finally:
+        connection.close()
+    Mail.objects.bulk_create(sent, batch_size=500)
+    if not failed:
+        return len(sent)
+
+    logger.error(f'post {instance_id}: {len(failed)} of {len(user_ids)} mails failed: {error}')
+    if self.request.retries < self.max_retries:
+        raise self.retry(args=(instance_id, failed), exc=error)
+    logger.error(f'post {instance_id}: gave up on {len(failed)} mails after {self.max_retries} retries')
+    return len(sent)
+
+
+# Еженедельная рассылка уведомлений о последних публикациях за неделю.
+# Дайджесты читаются потоком (digest.iter_digests), поэтому в памяти одновременно находятся
+# только посты одного подписчика и одна пачка писем.
+# После отправки каждой пачки сохраняется контрольная точка (MailingCheckpoint), и задача,
+# перезапущенная после падения воркера, продолжает со следующего подписчика.
+@shared_task(bind=True, acks_late=True, reject_on_worker_lost=True, max_retries=5, default_retry_delay=300)
+def weekly_mailing(self):
+    now = datetime.now(timezone.utc)
+    year, week, _ = now.isocalendar()
+    run = f'{year}-W{week:02d}'
+    checkpoint, _ = MailingCheckpoint.objects.get_or_create(
+        name='weekly_mailing', defaults={'run': run, 'window_start': now - timedelta(days=7)})
+    if checkpoint.run != run:  # новая неделя - начинаем с начала
+        checkpoint.run, checkpoint.window_start = run, now - timedelta(days=7)
+        checkpoint.last_subscriber_id, checkpoint.finished = 0, False
+        checkpoint.save()
+    elif checkpoint.finished:
+        logger.info(f'weekly_mailing {run} already finished')
+        return 0
+    logger.info(f'weekly_mailing {run}: start after subscriber {checkpoint.last_subscriber_id}')
+
+    renderer = DigestRenderer()
+    batch_size = getattr(settings, 'MAIL_CHUNK_SIZE', 500)
+    connection = get_connection()
+    batch, sent = [], 0
+
+    def flush(last_subscriber_id):
+        nonlocal sent
+        try:
+            connection.send_messages(batch)
+        except Exception as exc:  # письма пачки не ушли - повтор задачи с последней контрольной точки
+            logger.error(f'weekly_mailing {run}: batch failed: {exc}')
+            raise self.retry(exc=exc)
+        sent += len(batch)
+        MailingCheckpoint.objects.filter(pk=checkpoint.pk).update(last_subscriber_id=last_subscriber_id)
+        batch.clear()
+
+    try:
+        connection.open()  # одно SMTP-соединение на все пачки
+        for subscriber_id, email, username, posts in iter_digests(checkpoint.window_start,
+                                                                   checkpoint.last_subscriber_id):
+            msg = EmailMultiAlternatives(subject='Список публикаций за неделю для подписчиков ',
+                                         body='',
+                                         from_email=settings.DEFAULT_FROM_EMAIL,
+                                         to=[f'{email}'])
+            msg.attach_alternative(renderer.render(username, posts), 'text/html')
+            batch.append(msg)
+            if len(batch) >= batch_size:
+                flush(subscriber_id)
+        if batch:
+            flush(subscriber_id)
+    finally:
+        connection.close()
+
+    MailingCheckpoint.objects.filter(pk=checkpoint.pk).update(finished=True)
+    logger.info(f'weekly_mailing {run}: sent {sent} mails')
+    return sent
@@ -11,10 +11,12 @@ def current_date(value):
 
 @register.simple_tag(takes_context=True)
 def url_replace(context, **kwargs):
-   pprint(f'tag_context={context}\nkwargs={kwargs}')
    d = context['request'].GET.copy()
    for k, v in kwargs.items():
-       d[k] = v
+       if v is None:  # None удаляет параметр из адреса (например, page при переходе по курсору)
+           d.pop(k, None)
+       else:
+           d[k] = v
    return d.urlencode()
 
 @register.simple_tag
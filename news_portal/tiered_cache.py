@@ -0,0 +1,172 @@
+# Двухуровневый кэш: небольшой LRU в памяти процесса перед общим кэшем (Redis или файлы).
+# Чтение идет сначала из локального уровня, при промахе - из общего с копированием значения
+# в локальный на LOCAL.TIMEOUT секунд. Запись, удаление и incr идут в общий кэш, локальная копия
+# обновляется, а остальным процессам через Redis pub/sub уходит сообщение со списком ключей -
+# они удаляют свои копии. Если сообщение потерялось (или INVALIDATION_URL не задан), устаревшая
+# копия живет не дольше LOCAL.TIMEOUT. Конфигурацию собирает djangoProject_News_Portal.cache_config.
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+from django.core.cache.backends.base import BaseCache, DEFAULT_TIMEOUT
+from django.core.cache.backends.locmem import LocMemCache
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class Invalidation:
+    """Рассылка и прием сообщений о сброшенных ключах через канал Redis pub/sub"""
+    def __init__(self, url, channel, local):
+        self.url, self.channel, self.local = url, channel, local
+        self.sender = None
+        self._client = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def start(self):  # подключение и поток-слушатель; после fork процесса-воркера - заново
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            from redis import Redis
+            self._client = Redis.from_url(self.url)
+            self.sender = uuid.uuid4().hex
+            threading.Thread(target=self._listen, name=f'{self.channel}-listener', daemon=True).start()
+            self._pid = os.getpid()
+
+    def publish(self, keys, version=None):
+        """keys=None - сброс всего локального уровня"""
+        self.start()
+        try:
+            self._client.publish(self.channel, json.dumps([self.sender, keys, version]))
+        except Exception:  # общий кэш уже изменен, чужие копии доживут свой LOCAL.TIMEOUT
+            logger.warning('Не удалось разослать сброс ключей кэша %s', keys, exc_info=True)
+
+    def receive(self, data):
+        sender, keys, version = json.loads(data)
+        if sender == self.sender:
+            return
+        if keys is None:
+            self.local.clear()
+        else:
+            self.local.delete_many(keys, version=version)
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                self.local.clear()  # сообщения, пропущенные до (пере)подключения
+                for message in pubsub.listen():
+                    self.receive(message['data'])
+            except Exception:
+                logger.warning('Канал сброса кэша %s недоступен, переподключение', self.channel, exc_info=True)
+                time.sleep(1)
+
+
+class TwoTierCache(BaseCache):
+    """OPTIONS: SHARED - настройки общего кэша (как элемент CACHES), LOCAL - TIMEOUT, MAX_ENTRIES
+    и CULL_FREQUENCY локального LRU, INVALIDATION_URL - Redis для сообщений о сброшенных ключах"""
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        shared = options['SHARED']
+        self.shared = import_string(shared['BACKEND'])(shared.get('LOCATION', ''), shared)
+        local = options.get('LOCAL', {})
+        self.local_timeout = local.get('TIMEOUT', 30)
+        self.local = LocMemCache(f'two-tier:{location}', {
+            'TIMEOUT': self.local_timeout,
+            'OPTIONS': {'MAX_ENTRIES': local.get('MAX_ENTRIES', 1000), 'CULL_FREQUENCY': local.get('CULL_FREQUENCY', 3)},
+        })
+        url = options.get('INVALIDATION_URL')
+        self.invalidation = Invalidation(url, options.get('CHANNEL', f'cache-invalidation:{location}'),
+                                         self.local) if url else None
+
+    def _local_timeout(self, timeout):
+        if timeout is DEFAULT_TIMEOUT or timeout is None:
+            return self.local_timeout
+        return min(timeout, self.local_timeout)
+
+    def _publish(self, keys, version=None):
+        if self.invalidation:
+            self.invalidation.publish(keys, version)
+
+    def get(self, key, default=None, version=None):
+        value = self.local.get(key, _MISSING, version=version)
+        if value is _MISSING:
+            if self.invalidation:
+                self.invalidation.start()  # подписка до первой локальной копии
+            value = self.shared.get(key, _MISSING, version=version)
+            if value is _MISSING:
+                return default
+            self.local.set(key, value, self.local_timeout, version=version)
+        return value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        values = self.local.get_many(keys, version=version)
+        missing = [key for key in keys if key not in values]
+        if missing:
+            if self.invalidation:
+                self.invalidation.start()
+            loaded = self.shared.get_many(missing, version=version)
+            self.local.set_many(loaded, self.local_timeout, version=version)
+            values.update(loaded)
+        return values
+
+    def has_key(self, key, version=None):
+        return self.local.has_key(key, version=version) or self.shared.has_key(key, version=version)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout, version=version)
+        self.local.set(key, value, self._local_timeout(timeout), version=version)
+        self._publish([key], version)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        if not self.shared.add(key, value, timeout, version=version):
+            return False
+        self.local.set(key, value, self._local_timeout(timeout), version=version)
+        self._publish([key], version)
+        return True
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(data, timeout, version=version)
+        self.local.set_many(data, self._local_timeout(timeout), version=version)
+        self._publish(list(data), version)
+        return failed
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        deleted = self.shared.delete(key, version=version)
+        self.local.delete(key, version=version)
+        self._publish([key], version)
+        return deleted
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        self.shared.delete_many(keys, version=version)
+        self.local.delete_many(keys, version=version)
+        self._publish(keys, version)
+
+    def incr(self, key, delta=1, version=None):  # атомарность обеспечивает общий кэш
+        value = self.shared.incr(key, delta, version=version)
+        self.local.delete(key, version=version)
+        self._publish([key], version)
+        return value
+
+    def clear(self):
+        self.shared.clear()
+        self.local.clear()
+        self._publish(None)
+
+    def close(self, **kwargs):
+        self.shared.close(**kwargs)
@@ -3,19 +3,32 @@ from django.urls import path
 from django.views.decorators.cache import cache_page
 
 # Импортируем созданное нами представление
-from .views import (PostsList, PostDetail, PostFilterView, create_post, edit_post,
-                    delete_post, MailView, test)
+from django.conf import settings
+from .views import (PostsList, MyFeedList, PostDetail, PostFilterView, AsyncPostsList, AsyncMyFeedList,
+                    AsyncPostDetail, AsyncPostFilterView, create_post, edit_post, delete_post, add_comment, MailView, test)
 
-urlpatterns = [
-        path('', cache_page(0)(PostsList.as_view()), name='main_page'),
-        path('edit_subscribe/', PostsList.as_view(), name='edit_subscribe'),
-        path('<int:pk>/', PostDetail.as_view(), name='post_detail'),
-        path('search/', PostFilterView.as_view(), name='search_post'),
+
+def news_urlpatterns(async_views=False):
+    # под ASGI лента, пост и поиск обслуживаются асинхронными представлениями (settings.ASYNC_VIEWS)
+    posts_list, my_feed, post_detail, post_filter = (
+        (AsyncPostsList, AsyncMyFeedList, AsyncPostDetail, AsyncPostFilterView) if async_views
+        else (PostsList, MyFeedList, PostDetail, PostFilterView))
+    return [
+        # карточки постов кэшируются фрагментами в шаблоне, персональная часть страницы рендерится заново
+        path('', posts_list.as_view(), name='main_page'),
+        path('edit_subscribe/', posts_list.as_view(), name='edit_subscribe'),
+        path('my/', my_feed.as_view(), name='my_feed'),
+        path('<int:pk>/', post_detail.as_view(), name='post_detail'),
+        path('search/', post_filter.as_view(), name='search_post'),
         path('create/', create_post, name='create_post'),
         path('<int:pk>/edit/', edit_post, name='edit_post'),
         path('<int:pk>/delete/', delete_post, name='delete_post'),
+        path('<int:pk>/comments/', add_comment, name='add_comment'),
         path('mail/', MailView.as_view(), name='news_mail'),
 
         # тестовый URL для апробирования разных задач
         path('test/', test, name='test'),
         path('test/del', test, name='test_del')]  # удаление тестовых пользователей
+
+
+urlpatterns = news_urlpatterns(getattr(settings, 'ASYNC_VIEWS', False))
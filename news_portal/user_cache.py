@@ -0,0 +1,84 @@
+# Кэш пользователя запроса.
+# AuthenticationMiddleware на каждый запрос авторизованного пользователя выбирает его из базы
+# (ModelBackend.get_user). CachedAuthenticationMiddleware берет его из кэша (auth:user:<id>),
+# а проверка сессии остается прежней: хэш пароля в сессии сравнивается с хэшем пользователя,
+# поэтому смена пароля по-прежнему завершает остальные сессии. Кэш сбрасывается сигналами
+# post_save / post_delete на User (signals.py), в том числе при обновлении last_login при входе.
+# Включается AUTH_USER_CACHE: с locmem-кэшем сброс дошел бы только до одного воркера.
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, load_backend
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.utils.crypto import constant_time_compare
+from django.utils.functional import SimpleLazyObject
+
+
+def _key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def load_user(user_id, backend_path):
+    user = cache.get(_key(user_id))
+    if user is None:
+        user = load_backend(backend_path).get_user(user_id)
+        if user is not None:  # неактивных и удаленных пользователей бэкенд не возвращает
+            cache.set(_key(user_id), user, getattr(settings, 'AUTH_USER_CACHE_TIMEOUT', 300))
+    return user
+
+
+def invalidate_user(*user_ids):
+    cache.delete_many([_key(pk) for pk in user_ids])
+
+
+def get_user(request):
+    """django.contrib.auth.get_user с пользователем из кэша"""
+    if not getattr(settings, 'AUTH_USER_CACHE', False):
+        return auth.get_user(request)
+    try:
+        user_id = auth._get_user_session_key(request)
+        backend_path = request.session[BACKEND_SESSION_KEY]
+    except KeyError:
+        return AnonymousUser()
+    if backend_path not in settings.AUTHENTICATION_BACKENDS:
+        return AnonymousUser()
+    user = load_user(user_id, backend_path)
+    if user is None:
+        return AnonymousUser()
+    session_hash = request.session.get(HASH_SESSION_KEY)
+    session_auth_hash = user.get_session_auth_hash()
+    if session_hash and constant_time_compare(session_hash, session_auth_hash):
+        return user
+    # как в django.contrib.auth.get_user: хэш по старому SECRET_KEY из SECRET_KEY_FALLBACKS
+    # обновляется, иначе сессия завершается
+    if session_hash and any(constant_time_compare(session_hash, fallback)
+                            for fallback in user.get_session_auth_fallback_hash()):
+        request.session.cycle_key()
+        request.session[HASH_SESSION_KEY] = session_auth_hash
+        return user
+    request.session.flush()
+    return AnonymousUser()
+
+
+def _cached_user(request):
+    if not hasattr(request, '_cached_user'):
+        request._cached_user = get_user(request)
+    return request._cached_user
+
+
+async def _acached_user(request):
+    if not hasattr(request, '_acached_user'):
+        request._acached_user = await sync_to_async(get_user)(request)
+    return request._acached_user
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    """Замена AuthenticationMiddleware: request.user и request.auser() с пользователем из кэша"""
+    def process_request(self, request):
+        super().process_request(request)  # проверка SessionMiddleware
+        request.user = SimpleLazyObject(lambda: _cached_user(request))
+        request.auser = partial(_acached_user, request)
@@ -23,9 +23,12 @@ from django.views import View
 from django.views.generic import ListView, DetailView
 from .models import Post, Author, Comment, Category, Mail, PostCategory, UserSubcribes
 
-# фильтры и формы
+# фильтры, формы и пагинация
 from .filters import PostFilter
-from .forms import PostForm, PostCreateForm, SubsribeForm
+from .pagination import KeysetPaginationMixin
+from .ratelimit import (RateLimitMixin, get_rate, client_key, peek as ratelimit_peek, hit as ratelimit_hit,
+                        refund as ratelimit_refund)
+from .forms import PostForm, PostCreateForm, SubsribeForm, CommentForm
 
 # загрузка страниц и исключения
 from django.shortcuts import reverse, render, redirect
@@ -38,11 +41,17 @@ from allauth.socialaccount.models import EmailAddress
 
 from pprint import pprint
 from django.db import models
-from .tasks import test_sleep, hello_world, test_comments
-from django.http import HttpResponse, HttpResponseRedirect
+from .tasks import test_sleep, hello_world
+from django.http import HttpResponse, HttpResponseRedirect, Http404, JsonResponse
+from django.views.decorators.http import require_POST
+from asgiref.sync import sync_to_async
 
 # ------- КЭШ -------------
 from django.core.cache import cache
+from . import post_cache
+from . import search
+from . import feed
+from . import comments as comment_queue
 from django.views.decorators.cache import cache_page
 from redis import Redis
 import json
@@ -55,7 +64,9 @@ logger = logging.getLogger('django.server')
 #___________ КОНЕЦ ИМПОРТА КОМПОНЕНТОВ ______________#
 
 
-class PostsList(LoginRequiredMixin, ListView): #класс для показа общего списка всех публикаций
+class PostsList(LoginRequiredMixin, RateLimitMixin, KeysetPaginationMixin, ListView): #класс для показа общего списка всех публикаций
+    rate_limit_scope = 'subscribe'  # ограничиваются только изменения подписок
+    rate_limit_methods = ('POST',)
     model = Post
     template_name = 'flatpages/news.html'
     context_object_name = 'post'
@@ -63,7 +74,8 @@ class PostsList(LoginRequiredMixin, ListView): #класс для показа 
     edit_subscribe=None
 
     def get_queryset(self):
-        return Post.objects.select_related('author', 'author__user').prefetch_related('category').order_by('-create_time')
+        # текст статьи ленте не нужен: карточка выводит сохраненное превью
+        return Post.objects.select_related('author', 'author__user').defer('content').order_by('-create_time')
 
     def form(self):
         user_subscriptions = UserSubcribes.objects.filter(subcribe=self.request.user).select_related('category')
@@ -76,7 +88,8 @@ class PostsList(LoginRequiredMixin, ListView): #класс для показа 
     def get_context_data(self,**kwargs):
         context=super().get_context_data(**kwargs)
         context['form'] = self.form
-        context['is_not_author']= not self.request.user.groups.filter(name='authors').exists()
+        context['fragment_timeout'] = getattr(settings, 'FRAGMENT_CACHE_TIMEOUT', 600)
+        context['is_not_author']= not self.request.user_roles.is_author
 
         if self.request.path==reverse('edit_subscribe'):
             self.edit_subscribe=True
@@ -114,81 +127,150 @@ class PostsList(LoginRequiredMixin, ListView): #класс для показа 
                     UserSubcribes.objects.bulk_create([
                         UserSubcribes(subcribe=user, category=category) for category in subscriptions
                     ])
+                if subscriptions or del_subscriptions:
+                    feed.rebuild([user.pk])  # лента "мои категории" по новым подпискам
                 return redirect('main_page')
 
+class MyFeedList(PostsList): # лента "мои категории": посты подписанных категорий из таблицы FeedEntry
+    keyset_pagination = False  # длина ленты ограничена FEED_MAX_LENGTH, OFFSET остается дешевым
+
+    def get_queryset(self):
+        return feed.posts_for(self.request.user).select_related('author', 'author__user').defer('content')
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['my_feed'] = True
+        return context
+
 class PostDetail(LoginRequiredMixin,DetailView):
     model = Post
     template_name = 'flatpages/post.html'
     context_object_name = 'post'
-    queryset = Post.objects.select_related('author', 'author__user').prefetch_related('category')
+    queryset = Post.objects.select_related('author', 'author__user')
+
+    def comments(self):
+        return Comment.objects.filter(post_id=self.object.pk).select_related('user').order_by('create_time')
 
     def get_context_data(self, **kwargs):
         context=super().get_context_data(**kwargs)
-        # Категории уже загружены через prefetch_related, поэтому используем их напрямую
-        context['comm'] = Comment.objects.filter(post_id=self.kwargs['pk']).select_related('user')
-        
-        # Используем уже загруженные категории (prefetch_related)
-        post_categories = list(self.object.category.all())
-        form=PostForm(initial={'title': self.object.title,
-                               'content': self.object.content,
-                               'create_time': self.object.create_time,
-                               'author': self.object.author,
-                               'postType': self.object.postType,
-                               'category': post_categories})
-        form.fields['author'].disabled = True
-        form.fields['title'].disabled = True
-        form.fields['content'].disabled = True
-        form.fields['postType'].disabled = True
-        form.fields['category'].disabled = True
-        context['form'] = form
+        pk=self.object.pk
+        # Комменты и категории кэшируются отдельно от поста, но под общей версией поста
+        # (асинхронное представление выбирает их заранее и кладет в self.related)
+        context['comm'], context['categories'] = getattr(self, 'related', None) or (
+            post_cache.get_or_load(pk, 'comments', lambda: list(self.comments())),
+            post_cache.get_or_load(pk, 'categories', lambda: list(self.object.category.all())))
+        # пост выводится только для чтения прямо в шаблоне, без формы: форма загружала бы
+        # всех авторов и все категории ради выключенных полей
         context['id']=self.object.pk
-        # Оптимизация проверки группы авторов
-        context['is_author']=self.request.user.groups.filter(name='authors').exists()
+        context['is_author']=self.request.user_roles.is_author
         return context
 
     def get_object(self, queryset=None):
-        post=cache.get(f'post-{self.kwargs['pk']}', None)
-        if post is None:
-            if queryset is None:
-                queryset = self.get_queryset()
-            post = queryset.get(pk=self.kwargs['pk'])
-            cache.set(f'post-{self.kwargs['pk']}', post, 300)
-        return post
-
-class PostFilterView(LoginRequiredMixin, ListView): # класс для отображения фильтра поста на отдельной HTML странице 'search.html'
+        # пост берется из версионного кэша, который сбрасывается при любом изменении поста
+        if queryset is None:
+            queryset = self.get_queryset()
+        return post_cache.get_or_load(self.kwargs['pk'], 'detail', lambda: queryset.get(pk=self.kwargs['pk']))
+
+class PostFilterView(LoginRequiredMixin, RateLimitMixin, KeysetPaginationMixin, ListView): # класс для отображения фильтра поста на отдельной HTML странице 'search.html'
+    rate_limit_scope = 'search'
     model = Post
     template_name = 'flatpages/search.html'
     context_object_name = 'post'
     paginate_by =3
 
     def get_queryset(self):
-        queryset=super().get_queryset()
+        queryset=super().get_queryset().defer('content')
         self.filter = PostFilter(self.request.GET,queryset)
         return self.filter.qs
 
     def get_context_data(self,  **kwargs): #добавление в контекст фильтра
         context=super().get_context_data(**kwargs)
         context['filter']=self.filter
+        context['fragment_timeout'] = getattr(settings, 'FRAGMENT_CACHE_TIMEOUT', 600)
         return context
 
+# Асинхронные варианты ленты, страницы поста и поиска для работы под ASGI (settings.ASYNC_VIEWS).
+# Данные выбираются асинхронным ORM и асинхронными вызовами кэша, контекст собирается
+# методами синхронных представлений, а шаблон рендерится обработчиком ASGI (TemplateResponse).
+class AsyncLoginRequiredMixin(LoginRequiredMixin):
+    async def dispatch(self, request, *args, **kwargs):
+        request.user = await request.auser()  # без синхронного обращения к сессии и базе
+        if not request.user.is_authenticated:
+            return self.handle_no_permission()
+        return await super(LoginRequiredMixin, self).dispatch(request, *args, **kwargs)
+
+
+class AsyncListMixin:
+    async def get(self, request, *args, **kwargs):
+        self.object_list = await self.aget_queryset()
+        await self.apaginate_queryset(self.object_list, self.get_paginate_by(self.object_list))
+        return self.render_to_response(self.get_context_data())
+
+    async def aget_queryset(self):
+        return self.get_queryset()
+
+
+class AsyncPostsList(AsyncLoginRequiredMixin, AsyncListMixin, PostsList):
+    async def post(self, request, *args, **kwargs):  # редактирование подписок - редкая запись, в потоке
+        return await sync_to_async(super().post)(request, *args, **kwargs)
+
+
+class AsyncMyFeedList(AsyncPostsList, MyFeedList):
+    pass
+
+
+class AsyncPostDetail(AsyncLoginRequiredMixin, PostDetail):
+    async def get(self, request, *args, **kwargs):
+        pk = self.kwargs['pk']
+        try:
+            self.object = await post_cache.aget_or_load(pk, 'detail', lambda: self.get_queryset().aget(pk=pk))
+        except Post.DoesNotExist:
+            raise Http404('Пост не найден')
+        self.related = (
+            await post_cache.aget_or_load(pk, 'comments', lambda: self.alist(self.comments())),
+            await post_cache.aget_or_load(pk, 'categories', lambda: self.alist(self.object.category.all())))
+        return self.render_to_response(self.get_context_data(object=self.object))
+
+    @staticmethod
+    async def alist(queryset):
+        return [obj async for obj in queryset]
+
+
+class AsyncPostFilterView(AsyncLoginRequiredMixin, AsyncListMixin, PostFilterView):
+    async def aget_queryset(self):
+        # полнотекстовый поиск идет сырым SQL через курсор, у которого нет асинхронного API
+        return await sync_to_async(self.get_queryset)()
+
+
 @login_required
 @permission_required('news_portal.add_post', raise_exception=True)
 def create_post(request): # функция для создания и добавления новой публикации
-    delta=datetime.now(dt.timezone.utc)-dt.timedelta(days=1)
-    if Post.objects.filter(create_time__gte=delta, author__user=request.user).count()>3:
+    # лимит публикаций в сутки считается в кэше (ratelimit), без COUNT по постам. Публикация
+    # учитывается до сохранения (hit), чтобы параллельные отправки не прошли лимит вместе, а при
+    # ошибке формы возвращается (refund). Строгим лимит будет только с общим кэшем (redis, file):
+    # locmem у каждого воркера свой и очищается при перезапуске
+    rate, key = get_rate('create_post'), f'create_post:{client_key(request)}'
+    if rate and not ratelimit_peek(key, *rate):
         return render(request,'posts_limit.html')
 
+    # автором нового поста может быть только сам пользователь
+    authors = Author.objects.filter(user=request.user).select_related('user')
     form=PostCreateForm()
-    form.fields['author'].queryset=Author.objects.filter(user=request.user)
-    # принимающая значение True, если пользователь относится к группе авторов
+    form.fields['author'].queryset=authors
 
     if request.method=='POST':
+        if rate and not ratelimit_hit(key, *rate):
+            ratelimit_refund(key, *rate)  # отказ не расходует лимит
+            return render(request,'posts_limit.html')
         form=PostCreateForm(request.POST)
+        form.fields['author'].queryset=authors
         if form.is_valid():
             form.save()
             # post=form.save()
             # post_id, user_id = post.pk, request.user.id
             return render(request, 'flatpages/messages.html', {'state':'Новая публикация добавлена успешно!'})
+        if rate:
+            ratelimit_refund(key, *rate)
     return render(request, 'flatpages/edit.html', {'form':form, 'button':'Опубликовать'})
 
 @login_required
@@ -198,14 +280,13 @@ def edit_post(request, pk):
         # Оптимизация: используем select_related и prefetch_related для уменьшения запросов
         post = Post.objects.select_related('author', 'author__user').prefetch_related('category').get(pk=pk)
         if post.author.user==request.user:
-            # Оптимизация проверки группы авторов (одна проверка для всех случаев)
-            is_author= request.user.groups.filter(name='authors').exists()
+            is_author= request.user_roles.is_author
             
-            # Категории уже загружены через prefetch_related
+            # Категории уже загружены через prefetch_related, варианты категорий берутся из кэша
             post_categories = list(post.category.all())
-            # Загружаем все категории один раз
-            all_categories = Category.objects.all()
-            
+            # автор поста не меняется: выбор ограничен им одним
+            authors = Author.objects.filter(pk=post.author_id).select_related('user')
+
             form=PostForm(initial={'create_time':post.create_time,
                                    'author':post.author,
                                    'postType':post.postType,
@@ -214,12 +295,13 @@ def edit_post(request, pk):
                                    'category': post_categories})
             form.fields['postType'].disabled = True
             form.fields['author'].disabled = True
-            form.fields['category'].queryset = all_categories
+            form.fields['author'].queryset = authors
             form.fields['category'].disabled = True
             form.fields['category'].required = False
             
             if request.method=='POST':
                 form=PostForm(request.POST, post)
+                form.fields['author'].queryset = authors
                 form.fields['postType'].required = False
                 form.fields['author'].required = False
                 form.fields['create_time'].required = False
@@ -231,8 +313,13 @@ def edit_post(request, pk):
                                                              'postType':post.postType,
                                                              'create_time':post.create_time,
                                                              'title':form.cleaned_data['title'],
-                                                             'content':form.cleaned_data['content']})
-                        cache.delete(f'post-{pk}')
+                                                             'content':form.cleaned_data['content'],
+                                                             'preview':form.cleaned_data['content'][:Post._meta.get_field('preview').max_length],
+                                                             'update_time':datetime.now(dt.timezone.utc)})
+                        # update() не вызывает post_save: кэш и поисковый индекс обновляются здесь
+                        post_cache.invalidate_post(pk)
+                        post.title = form.cleaned_data['title']
+                        search.index_post(post)
                         state='Изменения успешно сохранены.'
                 except TypeError:
                     state = 'Возникла ошибка! Возможно причина в превышении лимита названия поста, попавшего в БД не через форму'
@@ -242,6 +329,25 @@ def edit_post(request, pk):
     except Exception as e:
         logger.error(f'main_ERROR = {e}')
 
+# API комментов: коммент ставится в очередь и записывается задачей flush_comments пачкой,
+# ответ 202 возвращается сразу, без записи в БД; без очереди (COMMENTS_QUEUED) коммент пишется сразу - 201
+@login_required
+@require_POST
+def add_comment(request, pk):
+    form = CommentForm(request.POST)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+    if not Post.objects.filter(pk=pk).exists():
+        raise Http404('Публикация не найдена')
+    if not comment_queue.allow(request.user.pk):
+        return JsonResponse({'error': 'Слишком много комментариев, попробуйте позже'}, status=429)
+    text = form.cleaned_data['comment_text']
+    if comment_queue.queued():
+        return JsonResponse({'queued': comment_queue.enqueue(pk, request.user.pk, text)}, status=202)
+    if not comment_queue.write(pk, request.user.pk, text):
+        return JsonResponse({'error': 'Слишком много комментариев, попробуйте позже'}, status=429)
+    return JsonResponse({'created': True}, status=201)
+
 @login_required
 @permission_required('news_portal.delete_post', raise_exception=True)
 def delete_post(request, pk):
@@ -0,0 +1,134 @@
+# Атомарное изменение рейтинга постов и комментов.
+# В обычном режиме каждый голос - это один UPDATE ... SET raiting = raiting + delta.
+# В буферизованном режиме (settings.VOTES_BUFFERED) голоса накапливаются в кэше
+# и сбрасываются в БД пачками задачей flush_votes, поэтому "вирусный" пост дает
+# одну запись в БД за интервал сброса вместо тысяч одиночных.
+# Буфер - только атомарные операции кэша (add, incr), без чтения-изменения-записи общих значений:
+#   votes:<label>:<pk>         - накопленная сумма голосов объекта;
+#   votes:<label>:<pk>:marker  - объект уже стоит в журнале ожидающих сброса (ставится через add);
+#   votes:<label>:slot:<n>     - журнал: номер выдает incr хвоста, задача сдвигает голову.
+# Нужен общий кэш с атомарным incr (redis), это проверяется в settings.
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.db.models.functions import Now
+
+from .post_cache import invalidate_post
+
+KEY_TIMEOUT = 86400  # сумма голосов живет сутки после последнего сброса
+MARKER_TIMEOUT = 3600  # маркер, потерянный вместе с номером журнала, не мешает регистрации дольше часа
+
+
+def _delta_key(label, pk):
+    return f'votes:{label}:{pk}'
+
+
+def _marker_key(label, pk):
+    return f'votes:{label}:{pk}:marker'
+
+
+def _journal_key(label, name):  # head, tail, gap, lock
+    return f'votes:{label}:{name}'
+
+
+def _slot_key(label, number):
+    return f'votes:{label}:slot:{number}'
+
+
+def _buffer(label, pk, delta):
+    key = _delta_key(label, pk)
+    while True:
+        cache.add(key, 0, timeout=KEY_TIMEOUT)
+        try:
+            cache.incr(key, delta)
+            break
+        except ValueError:  # ключ истек между add и incr
+            continue
+    # регистрация после incr: голос, пришедший после снятия маркера задачей, снова ставит объект в журнал
+    if cache.add(_marker_key(label, pk), 1, timeout=MARKER_TIMEOUT):
+        tail = _journal_key(label, 'tail')
+        cache.add(tail, 0, timeout=None)
+        cache.set(_slot_key(label, cache.incr(tail)), pk, timeout=KEY_TIMEOUT)
+
+
+def apply_vote(instance, delta):
+    model = type(instance)
+    if getattr(settings, 'VOTES_BUFFERED', False):
+        _buffer(model._meta.label_lower, instance.pk, delta)
+    else:
+        model.objects.filter(pk=instance.pk).update(raiting=F('raiting') + delta, update_time=Now())
+        invalidate_post(getattr(instance, 'post_id', instance.pk))  # у коммента сбрасывается кэш его поста
+    instance.raiting += delta  # значение в памяти обновляется без повторного чтения из БД
+    if hasattr(instance, 'remember_denormalized'):  # голос в памяти - не явная правка рейтинга для save()
+        instance._denormalized_loaded['raiting'] = instance.raiting
+
+
+def _take(label):
+    """Объекты из журнала. Номер выдан, а объект еще не записан - журнал читается до него,
+    а если пропуск остался с прошлого сброса (запрос упал между incr и set) - номер пропускается"""
+    head = cache.get(_journal_key(label, 'head'), 0)
+    numbers = range(head + 1, cache.get(_journal_key(label, 'tail'), 0) + 1)
+    found = cache.get_many([_slot_key(label, n) for n in numbers])
+    pks, last = set(), head
+    for number in numbers:
+        pk = found.get(_slot_key(label, number))
+        if pk is None:
+            if cache.get(_journal_key(label, 'gap')) != number:
+                cache.set(_journal_key(label, 'gap'), number, timeout=None)
+                break
+        else:
+            pks.add(pk)
+        last = number
+    cache.set(_journal_key(label, 'head'), last, timeout=None)
+    cache.delete_many([_slot_key(label, n) for n in range(head + 1, last + 1)])
+    return pks
+
+
+def flush_votes(label, batch_size=None):  # сброс накопленных голосов модели label в БД
+    batch_size = batch_size or getattr(settings, 'VOTES_FLUSH_BATCH', 500)
+    model = apps.get_model(label)
+    lock = _journal_key(label, 'lock')
+    if not cache.add(lock, 1, timeout=300):  # журнал разбирает одна задача
+        return 0
+    try:
+        deltas = {}
+        for pk in _take(label):
+            # маркер снимается до чтения суммы: голоса, пришедшие дальше, снова регистрируют объект
+            cache.delete(_marker_key(label, pk))
+            key = _delta_key(label, pk)
+            delta = cache.get(key)
+            if delta:
+                # вычитаем прочитанное значение, а не удаляем ключ, чтобы не потерять голоса,
+                # пришедшие между чтением и сбросом
+                cache.incr(key, -delta)
+                cache.touch(key, KEY_TIMEOUT)
+                deltas[pk] = delta
+    finally:
+        cache.delete(lock)
+
+    pks = list(deltas)
+    for i in range(0, len(pks), batch_size):
+        chunk = pks[i:i + batch_size]
+        try:
+            with transaction.atomic():
+                model.objects.filter(pk__in=chunk).update(
+                    raiting=F('raiting') + Case(*[When(pk=pk, then=Value(deltas[pk])) for pk in chunk],
+                                                default=Value(0), output_field=IntegerField()),
+                    update_time=Now())
+        except Exception:
+            for pk in pks[i:]:  # несброшенные голоса возвращаются в буфер до следующего сброса
+                _buffer(label, pk, deltas[pk])
+            raise
+        _invalidate(label, chunk)
+    return len(pks)
+
+
+def _invalidate(label, pks):  # UPDATE через QuerySet не вызывает post_save, кэш поста сбрасывается вручную
+    if label == 'news_portal.post':
+        post_ids = pks
+    else:
+        post_ids = set(apps.get_model(label).objects.filter(pk__in=pks).values_list('post_id', flat=True))
+    for pk in post_ids:
+        invalidate_post(pk)
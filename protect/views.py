@@ -8,7 +8,7 @@ class IndexView(LoginRequiredMixin, TemplateView):
 
     def get_context_data(self, **kwargs):
         context=super().get_context_data(**kwargs)
-        context['is_author']=self.request.user.groups.filter(name='authors').exists()
+        context['is_author']=self.request.user_roles.is_author
         return context
 
     def test(self, request, *args, **kwargs):
@@ -0,0 +1,26 @@
+# Кэш id известных групп (common, authors) на уровне процесса.
+# Группы создаются один раз и почти не меняются, поэтому искать их по имени на каждой
+# регистрации не нужно; при сохранении или удалении любой группы кэш сбрасывается.
+from django.contrib.auth.models import Group
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+_group_ids = {}
+
+
+def group_id(name):
+    """id группы по имени (Group.DoesNotExist, если группы нет)"""
+    pk = _group_ids.get(name)
+    if pk is None:
+        pk = _group_ids[name] = Group.objects.values_list('pk', flat=True).get(name=name)
+    return pk
+
+
+def add_to_group(user, name):  # через user.groups, чтобы сработал m2m_changed (сброс кэша прав)
+    user.groups.add(group_id(name))
+
+
+@receiver(signal=post_save, sender=Group)
+@receiver(signal=post_delete, sender=Group)
+def reset_group_ids(sender, **kwargs):
+    _group_ids.clear()
@@ -0,0 +1,141 @@
+import csv
+import json
+import time
+from itertools import islice
+from pathlib import Path
+
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.contrib.auth.models import User, Group
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models.functions import Lower
+
+from news_portal.models import Author
+from sign.groups import group_id
+
+TRUE_VALUES = {'1', 'true', 'yes', 'да'}
+FIELDS = ('username', 'email', 'first_name', 'last_name')
+
+
+class Command(BaseCommand):
+    help = ('Массовое создание пользователей из CSV или JSONL файла (поля username, email, first_name, '
+            'last_name, password, author). Пользователи, группы и авторы создаются через bulk_create '
+            'пачками, каждая пачка - в своей транзакции. Существующие username и email (без учета '
+            'регистра) пропускаются, как и строки без username или с недопустимыми значениями полей.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='файл .csv или .jsonl')
+        parser.add_argument('--format', choices=('csv', 'jsonl'),
+                            help='формат файла (по умолчанию - по расширению)')
+        parser.add_argument('--batch-size', type=int, default=5000, help='пользователей в пачке')
+        parser.add_argument('--group', action='append', dest='groups',
+                            help='группа для всех пользователей (можно несколько), по умолчанию common')
+
+    @staticmethod
+    def read_rows(path, fmt):
+        with open(path, encoding='utf-8', newline='') as file:
+            if fmt == 'csv':
+                yield from csv.DictReader(file)
+            else:
+                for line in file:
+                    if line.strip():
+                        yield json.loads(line)
+
+    @staticmethod
+    def valid(row):
+        """Строка пригодна для импорта: username задан, значения - строки, проходящие валидаторы полей User
+        (username_validator, max_length, формат email)"""
+        if not isinstance(row, dict) or not row.get('username'):
+            return False
+        for name in FIELDS:
+            value = row.get(name) or ''
+            if not isinstance(value, str):
+                return False
+            if not value:
+                continue
+            try:
+                User._meta.get_field(name).run_validators(value)
+            except ValidationError:
+                return False
+        return True
+
+    def password(self, value):
+        # готовый хэш Django берется как есть; хэширование открытого пароля - самая дорогая часть
+        # импорта (сотни миллисекунд на пароль), без пароля вход возможен только через сброс пароля
+        if not value:
+            return self.unusable_password
+        try:
+            identify_hasher(value)
+            return value
+        except ValueError:
+            return make_password(value)
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        if not path.exists():
+            raise CommandError(f'Файл {path} не найден')
+        fmt = options['format'] or path.suffix.lstrip('.').lower()
+        if fmt not in ('csv', 'jsonl'):
+            raise CommandError('Укажите --format csv или --format jsonl')
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('Размер пачки должен быть положительным')
+        try:
+            groups = [group_id(name) for name in options['groups'] or ['common']]
+        except Group.DoesNotExist:
+            raise CommandError("Группы не найдены: создайте common (или укажите --group)")
+        all_authors = 'authors' in (options['groups'] or ())  # участник группы authors - всегда автор
+        authors_group = None  # ищется, только когда в файле встретится автор
+
+        started = time.perf_counter()
+        self.unusable_password = make_password(None)  # случайная часть генерируется один раз на импорт
+        rows = self.read_rows(path, fmt)
+        created = skipped = invalid = authors = 0
+        seen_usernames, seen_emails = set(), set()  # дубли внутри самого файла
+        while batch := list(islice(rows, batch_size)):
+            valid = [row for row in batch if self.valid(row)]
+            invalid += len(batch) - len(valid)
+            batch = valid
+            usernames = {row['username'] for row in batch}
+            emails = {row['email'].lower() for row in batch if row.get('email')}
+            existing_usernames = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+            # email сравнивается без учета регистра: Foo@x.com в базе - тот же адрес, что foo@x.com в файле
+            existing_emails = set(User.objects.annotate(email_lower=Lower('email'))
+                                  .filter(email_lower__in=emails).values_list('email_lower', flat=True))
+            users, author_flags = [], []
+            for row in batch:
+                username, email = row['username'], (row.get('email') or '').lower()
+                if (username in existing_usernames or username in seen_usernames or
+                        email and (email in existing_emails or email in seen_emails)):
+                    skipped += 1
+                    continue
+                seen_usernames.add(username)
+                seen_emails.add(email)
+                users.append(User(username=username, email=row.get('email') or '',
+                                  first_name=row.get('first_name') or '', last_name=row.get('last_name') or '',
+                                  password=self.password(row.get('password'))))
+                author_flags.append(all_authors or str(row.get('author', '')).strip().lower() in TRUE_VALUES)
+
+            if authors_group is None and not all_authors and any(author_flags):
+                try:
+                    authors_group = group_id('authors')
+                except Group.DoesNotExist:
+                    raise CommandError(f'Группа authors не найдена (создано пользователей: {created}): создайте '
+                                       f'ее и повторите импорт, уже созданные пользователи будут пропущены')
+            with transaction.atomic():
+                users = User.objects.bulk_create(users)
+                memberships = [User.groups.through(user_id=user.pk, group_id=pk) for user in users for pk in groups]
+                memberships += [User.groups.through(user_id=user.pk, group_id=authors_group)
+                                for user, is_author in zip(users, author_flags)
+                                if is_author and not all_authors]
+                User.groups.through.objects.bulk_create(memberships)
+                new_authors = Author.objects.bulk_create([Author(user_id=user.pk) for user, is_author
+                                                          in zip(users, author_flags) if is_author])
+            created += len(users)
+            authors += len(new_authors)
+            self.stdout.write(f'  ...создано {created}, пропущено {skipped}, с ошибками {invalid}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано пользователей: {created} (из них авторов: {authors}), пропущено: {skipped}, '
+            f'с ошибками: {invalid}, за {time.perf_counter() - started:.1f} сек'))
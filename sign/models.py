@@ -1,9 +1,11 @@
 from allauth.account.forms import SignupForm
 from allauth.socialaccount.forms import SignupForm as SocialSignupForm
 from django.contrib.auth.forms import UserCreationForm
-from django.contrib.auth.models import User, Group
+from django.contrib.auth.models import User
 from django import forms
 
+from .groups import add_to_group
+
 
 class BaseRegisterForm(UserCreationForm):
     email = forms.EmailField(label="Email")
@@ -12,8 +14,7 @@ class BaseRegisterForm(UserCreationForm):
 
     def save(self, *args, **kwargs):
         user = super(BaseRegisterForm, self).save(*args, **kwargs)
-        common_group = Group.objects.get(name="common")
-        common_group.user_set.add(user)
+        add_to_group(user, "common")
         return user
 
     class Meta:
@@ -29,14 +30,12 @@ class BaseRegisterForm(UserCreationForm):
 class CommonSignupForm(SignupForm):
     def save(self, request):
         user = super(CommonSignupForm, self).save(request)
-        common_group = Group.objects.get(name="common")
-        common_group.user_set.add(user)
+        add_to_group(user, "common")
         return user
 
 
 class SocialCommonSignupForm(SocialSignupForm):
     def save(self, request):
         user = super(SocialCommonSignupForm, self).save(request)
-        common_group = Group.objects.get(name="common")
-        common_group.user_set.add(user)
+        add_to_group(user, "common")
         return user
@@ -2,13 +2,15 @@ from django.urls import path
 from django.urls import reverse
 from django.contrib.auth.views import LoginView, LogoutView
 from .views import BaseRegisterView, AddToAuthorsGroup
+from news_portal.ratelimit import ratelimit
 
 
 # по причине наличия allauth адреса приложения 'sign' 'login' и 'signup'
 # явдяются бесполезными. И поэтому для них условно применен шаблон index.html
 urlpatterns = [
     path('login/',  #бесполезный url
-         LoginView.as_view(template_name='sign/login.html'), name='login'),
+         ratelimit('login', by='ip', methods=('POST',))(LoginView.as_view(template_name='sign/login.html')),
+         name='login'),
     path('logout/',
          LogoutView.as_view(template_name='sign/logout.html'),name='logout'),
     path('signup/',  # бесполезный url
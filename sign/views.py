@@ -1,6 +1,7 @@
-from django.contrib.auth.models import User, Group
+from django.contrib.auth.models import User
 from django.views.generic.edit import CreateView
 from .models import BaseRegisterForm
+from .groups import add_to_group
 from django.shortcuts import redirect
 from django.contrib.auth.decorators import login_required
 from news_portal.models import Author
@@ -14,10 +15,8 @@ class BaseRegisterView(CreateView):
 
 @login_required
 def AddToAuthorsGroup(request):  # добавление пользователя в группу с правами автора
-    if not request.user.groups.filter(name='authors').exists():
-        authors_group = Group.objects.get(name='authors')
-        user = request.user
-        authors_group.user_set.add(user)
+    if not request.user_roles.is_author:
+        add_to_group(request.user, 'authors')
 
         # добавление пользователя как автора в модель Authors
         Author.objects.create(user=request.user)
@@ -0,0 +1,76 @@
+from djangoProject_News_Portal.cache_config import clear_all
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.urls import path, include, resolve, reverse
+from djangoProject_News_Portal import urls as project_urls
+from news_portal import post_cache
+from news_portal.models import Post, Author, Category, Comment, PostCategory
+from news_portal.urls import news_urlpatterns
+
+# urlconf, в котором лента, пост и поиск - асинхронные представления (как под ASGI)
+urlpatterns = [path('news/', include(news_urlpatterns(async_views=True)))] + project_urls.urlpatterns
+
+
+@override_settings(ROOT_URLCONF='tests.async_views_tests')
+class AsyncViewsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='testuser', password='testpass123')
+        author = Author.objects.create(user=User.objects.create_user(username='authoruser', password='x'))
+        category = Category.objects.create(category='Технологии')
+        cls.posts = [Post.objects.create(author=author, title=f'Пост номер {i}', content='текст')
+                     for i in range(15)]
+        PostCategory.objects.create(post=cls.posts[0], category=category)
+        Comment.objects.create(post=cls.posts[0], user=cls.user, comment_text='Первый коммент')
+
+    def setUp(self):
+        clear_all()
+
+    def test_views_are_async(self):
+        for name, args in (('main_page', ()), ('post_detail', (self.posts[0].pk,)), ('search_post', ())):
+            self.assertTrue(resolve(reverse(name, args=args)).func.view_class.view_is_async, name)
+
+    async def test_login_required(self):
+        response = await self.async_client.get(reverse('main_page'))
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('/accounts/login/', response.url)
+
+    async def test_posts_list(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('main_page'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['post']), 10)
+        self.assertEqual(response.context['paginator'].count, 15)
+        self.assertTrue(response.context['is_not_author'])
+        self.assertContains(response, 'Пост номер 14')
+
+        response = await self.async_client.get(reverse('main_page'), {'page': 2})
+        self.assertEqual(len(response.context['post']), 5)
+        response = await self.async_client.get(reverse('main_page'), {'page': 3})
+        self.assertEqual(response.status_code, 404)
+
+    async def test_keyset_pagination(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('main_page'), {'cursor': ''})
+        page = response.context['page_obj']
+        response = await self.async_client.get(reverse('main_page'), {'cursor': page.next_cursor})
+        self.assertEqual([post.pk for post in response.context['post']], [p.pk for p in self.posts[4::-1]])
+
+    async def test_post_detail_cached(self):
+        await self.async_client.aforce_login(self.user)
+        url = reverse('post_detail', args=[self.posts[0].pk])
+        response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([c.comment_text for c in response.context['comm']], ['Первый коммент'])
+        self.assertEqual([c.category for c in response.context['categories']], ['Технологии'])
+        await self.async_client.get(url)
+        self.assertEqual(post_cache.stats(), {'hits': 3, 'misses': 3, 'hit_ratio': 0.5})
+
+        response = await self.async_client.get(reverse('post_detail', args=[10 ** 6]))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_search(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('search_post'), {'search_title': 'номер 3'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([post.pk for post in response.context['post']], [self.posts[3].pk])
@@ -0,0 +1,132 @@
+from unittest import mock
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, TestCase
+from django.contrib.auth.models import User
+from django.urls import reverse
+from djangoProject_News_Portal.cache_config import atomic_cache_flag, build_caches, clear_all
+from news_portal import post_cache, ratelimit
+from news_portal.models import Post, Author
+from news_portal.tiered_cache import TwoTierCache
+
+NAMESPACES = {'default': {'TIMEOUT': 300, 'MAX_ENTRIES': 100},
+              'posts': {'TIMEOUT': 60, 'MAX_ENTRIES': 50, 'CULL_FREQUENCY': 4, 'LOCAL': {'TIMEOUT': 5}}}
+
+
+def worker(name, shared_location='shared-tests'):
+    """Кэш одного воркера: свой локальный уровень, общий LocMem вместо Redis"""
+    return TwoTierCache(name, {'OPTIONS': {
+        'SHARED': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': shared_location},
+        'LOCAL': {'TIMEOUT': 30, 'MAX_ENTRIES': 3}, 'INVALIDATION_URL': 'redis://test'}})
+
+
+def connect(*workers):
+    """Канал сброса в памяти вместо Redis pub/sub: сообщение получают все воркеры"""
+    for i, cache in enumerate(workers):
+        cache.invalidation.start = lambda: None
+        cache.invalidation.sender = f'worker-{i}'
+        cache.invalidation._client = mock.Mock(publish=lambda channel, data: [
+            other.invalidation.receive(data) for other in workers])
+
+
+class CacheConfigTests(SimpleTestCase):
+    def test_namespaces(self):
+        config = build_caches(NAMESPACES, 'file', '/tmp/cache')
+        self.assertEqual(config['posts']['LOCATION'], '/tmp/cache/posts')
+        self.assertEqual(config['posts']['OPTIONS'], {'MAX_ENTRIES': 50, 'CULL_FREQUENCY': 4})
+        self.assertEqual(config['default']['KEY_PREFIX'], 'default')
+
+        config = build_caches(NAMESPACES, 'redis', 'redis://localhost:6379/1', two_tier=True,
+                              invalidation_url='redis://localhost:6379/1')
+        self.assertEqual(config['default']['BACKEND'], 'django.core.cache.backends.redis.RedisCache')
+        self.assertNotIn('OPTIONS', config['default'])
+        self.assertEqual(config['posts']['BACKEND'], 'news_portal.tiered_cache.TwoTierCache')
+        self.assertEqual(config['posts']['OPTIONS']['SHARED']['TIMEOUT'], 60)
+        self.assertEqual(config['posts']['OPTIONS']['CHANNEL'], 'cache-invalidation:posts')
+        # у locmem локальный уровень не нужен
+        self.assertEqual(build_caches(NAMESPACES, two_tier=True)['posts']['BACKEND'],
+                         'django.core.cache.backends.locmem.LocMemCache')
+
+    def test_atomic_cache_flag(self):  # очереди комментов и голосов - только с redis
+        self.assertTrue(atomic_cache_flag('COMMENTS_QUEUED', 'redis', default=True, env={}))
+        self.assertFalse(atomic_cache_flag('COMMENTS_QUEUED', 'file', default=True, env={}))
+        self.assertFalse(atomic_cache_flag('COMMENTS_QUEUED', 'locmem', default=True, env={}))
+        self.assertFalse(atomic_cache_flag('VOTES_BUFFERED', 'redis', env={}))
+        self.assertTrue(atomic_cache_flag('VOTES_BUFFERED', 'redis', env={'VOTES_BUFFERED': '1'}))
+        for backend in ('file', 'locmem'):
+            with self.assertRaises(ImproperlyConfigured):
+                atomic_cache_flag('COMMENTS_QUEUED', backend, default=True, env={'COMMENTS_QUEUED': '1'})
+
+    def test_namespaces_isolated(self):
+        clear_all()
+        caches['default'].set('key', 'default')
+        caches['posts'].set('key', 'posts')
+        self.assertEqual((caches['default'].get('key'), caches['posts'].get('key')), ('default', 'posts'))
+        clear_all()
+        self.assertIsNone(caches['posts'].get('key'))
+
+
+class TwoTierCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.first, self.second = worker('worker-a'), worker('worker-b')
+        connect(self.first, self.second)
+        self.addCleanup(self.first.clear)
+
+    def test_local_tier(self):
+        self.first.set('post', 'v1')
+        self.assertEqual(self.second.get('post'), 'v1')
+        self.second.shared.set('post', 'в обход')  # локальная копия отвечает без общего кэша
+        self.assertEqual(self.second.get('post'), 'v1')
+        self.assertEqual(self.second.get_many(['post', 'none']), {'post': 'v1'})
+        self.assertIsNone(self.second.get('none'))
+
+        for key in ('a', 'b', 'c'):  # LRU на 3 ключа вытесняет давно не читавшиеся
+            self.second.local.set(key, key)
+        self.assertFalse(self.second.local.has_key('post'))
+        self.assertEqual(self.second.get('post'), 'в обход')
+
+    def test_cross_worker_invalidation(self):
+        self.first.set('post', 'v1')
+        self.second.get('post')
+        self.first.set('post', 'v2')
+        self.assertEqual(self.second.get('post'), 'v2')
+
+        self.first.add('version', 1)
+        self.assertEqual(self.second.get('version'), 1)
+        self.assertEqual(self.first.incr('version'), 2)
+        self.assertEqual(self.second.get('version'), 2)
+
+        self.first.delete('post')
+        self.assertIsNone(self.second.get('post'))
+        self.second.get('version')
+        self.first.clear()
+        self.assertIsNone(self.second.get('version'))
+
+    def test_without_invalidation(self):
+        cache = TwoTierCache('worker-c', {'OPTIONS': {
+            'SHARED': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'shared-c'},
+            'LOCAL': {'TIMEOUT': 10}}})
+        self.addCleanup(cache.clear)
+        self.assertIsNone(cache.invalidation)
+        cache.set('key', 1, timeout=2)
+        self.assertEqual(cache.local.get('key'), 1)
+        with mock.patch('django.core.cache.backends.locmem.time.time', return_value=10 ** 10):
+            self.assertIsNone(cache.get('key'))
+
+
+class NamespaceUsageTests(TestCase):
+    def setUp(self):
+        clear_all()
+
+    def test_post_cache_and_ratelimit_namespaces(self):
+        author = Author.objects.create(user=User.objects.create_user(username='authoruser', password='x'))
+        post = Post.objects.create(author=author, title='Пост в кэше', content='текст')
+        self.client.force_login(author.user)
+        self.client.get(reverse('post_detail', args=[post.pk]))
+        self.assertIsNotNone(caches['posts'].get(post_cache.post_key(post.pk, 'detail')))
+        self.assertIsNone(caches['default'].get(post_cache.post_key(post.pk, 'detail')))
+        self.assertEqual(post_cache.stats()['misses'], 3)
+
+        ratelimit.hit('k', 5, 60)
+        self.assertEqual(sum(caches['ratelimit'].get_many(ratelimit._keys('k', 60, ratelimit.time.time())).values()),
+                         1)
@@ -0,0 +1,66 @@
+from djangoProject_News_Portal.cache_config import clear_all
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth.models import User, Permission
+from django.urls import reverse
+from news_portal.models import Post, Author, Category, PostCategory
+
+
+class FormChoicesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='testuser', password='testpass123')
+        cls.user.user_permissions.add(Permission.objects.get(codename='add_post'))
+        cls.author = Author.objects.create(user=cls.user)
+        cls.tech = Category.objects.create(category='Технологии')
+        cls.post = Post.objects.create(author=cls.author, title='Пост для чтения', content='текст поста')
+        PostCategory.objects.create(post=cls.post, category=cls.tech)
+
+    def setUp(self):
+        clear_all()
+        self.client.force_login(self.user)
+
+    def count_queries(self, url):
+        clear_all()
+        self.client.force_login(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_detail_without_form(self):
+        url = reverse('post_detail', args=[self.post.pk])
+        response = self.client.get(url)
+        self.assertNotIn('form', response.context)
+        self.assertContains(response, 'Категории: Технологии')
+        self.assertContains(response, 'текст поста')
+
+        before = self.count_queries(url)
+        for i in range(20):
+            Author.objects.create(user=User.objects.create_user(username=f'author{i}', password='x'))
+            Category.objects.create(category=f'Категория {i}')
+        self.assertEqual(self.count_queries(url), before)  # не зависит от числа авторов и категорий
+
+    def test_category_choices_cached(self):
+        self.client.get(reverse('main_page'))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('main_page'))
+        self.assertFalse([q['sql'] for q in queries.captured_queries
+                          if q['sql'].startswith('SELECT') and 'FROM "news_portal_category"' in q['sql']])
+        self.assertContains(response, 'Технологии')
+
+        Category.objects.create(category='Наука')  # сигнал сбрасывает кэш вариантов
+        self.assertContains(self.client.get(reverse('main_page')), 'Наука')
+        self.tech.delete()
+        self.assertNotContains(self.client.get(reverse('main_page')), 'Технологии')
+
+    def test_create_post_author_choices(self):
+        other = Author.objects.create(user=User.objects.create_user(username='other', password='x'))
+        response = self.client.get(reverse('create_post'))
+        self.assertEqual(list(response.context['form'].fields['author'].queryset), [self.author])
+        response = self.client.post(reverse('create_post'), {'title': 'Чужой пост', 'author': other.pk,
+                                                             'postType': 'NS', 'content': 'текст',
+                                                             'category': [self.tech.pk]})
+        self.assertIn('author', response.context['form'].errors)
+        self.assertFalse(Post.objects.filter(title='Чужой пост').exists())
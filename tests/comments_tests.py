@@ -0,0 +1,128 @@
+from unittest import mock
+from django.core.cache import cache
+from djangoProject_News_Portal.cache_config import clear_all
+from django.db import IntegrityError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth.models import User
+from django.urls import reverse
+from djangoProject_News_Portal.celery import app
+from news_portal import comments, post_cache
+from news_portal.models import Post, Author, Comment
+from news_portal.tasks import flush_comments
+
+
+@override_settings(RATE_LIMITS={'comment': '3/m'}, COMMENTS_FLUSH_BATCH=4, COMMENTS_QUEUED=True)
+class CommentQueueTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='testuser', password='testpass123')
+        cls.other = User.objects.create_user(username='other', password='x')
+        author = Author.objects.create(user=User.objects.create_user(username='authoruser', password='x'))
+        cls.post = Post.objects.create(author=author, title='Пост с комментами', content='текст')
+        cls.second = Post.objects.create(author=author, title='Второй пост', content='текст')
+
+    def setUp(self):
+        clear_all()
+        app.conf.task_always_eager = True
+        self.addCleanup(setattr, app.conf, 'task_always_eager', False)
+
+    def post_comment(self, text, post=None):
+        return self.client.post(reverse('add_comment', args=[(post or self.post).pk]), {'comment_text': text})
+
+    def test_api_queues_without_writing(self):
+        self.client.force_login(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post_comment('Первый коммент')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json(), {'queued': 1})
+        self.assertFalse([q['sql'] for q in queries.captured_queries if q['sql'].startswith(('INSERT', 'UPDATE'))
+                          and 'news_portal_comment' in q['sql']])
+        self.assertEqual(Comment.objects.count(), 0)
+        self.assertEqual(comments.pending(), 1)
+
+        self.assertEqual(self.post_comment('').status_code, 400)
+        self.assertEqual(self.client.post(reverse('add_comment', args=[10 ** 6]),
+                                          {'comment_text': 'коммент'}).status_code, 404)
+        self.assertEqual(self.client.get(reverse('add_comment', args=[self.post.pk])).status_code, 405)
+        for i in range(2):
+            self.assertEqual(self.post_comment(f'Коммент {i}').status_code, 202)
+        self.assertEqual(self.post_comment('Лишний коммент').status_code, 429)
+
+    def test_flush_in_batches(self):
+        for i in range(6):
+            comments.enqueue(self.post.pk if i % 2 else self.second.pk, self.user.pk if i < 3 else self.other.pk,
+                             f'Коммент {i}')
+        with mock.patch('news_portal.comments.invalidate_post', wraps=post_cache.invalidate_post) as invalidate, \
+                CaptureQueriesContext(connection) as queries:
+            self.assertEqual(flush_comments.delay().get(), 6)
+        inserts = [q for q in queries.captured_queries if q['sql'].startswith('INSERT')]
+        self.assertEqual(len(inserts), 2)  # пачки по COMMENTS_FLUSH_BATCH
+        self.assertEqual(invalidate.call_count, 4)  # по разу на пост в каждой пачке
+        self.assertEqual(Comment.objects.filter(post=self.post).count(), 3)
+        self.assertEqual(Post.objects.get(pk=self.post.pk).comment_count, 3)
+        self.assertEqual(Post.objects.get(pk=self.second.pk).comment_count, 3)
+        self.assertEqual(comments.pending(), 0)
+        self.assertEqual(comments.flush(), 0)
+
+    def test_rate_limit_and_deleted_posts(self):
+        Comment.objects.create(post=self.post, user=self.user, comment_text='Уже записан')
+        for i in range(4):
+            comments.enqueue(self.post.pk, self.user.pk, f'Коммент {i}')
+        comments.enqueue(self.second.pk, self.other.pk, 'К удаленному посту')
+        Post.objects.filter(pk=self.second.pk).delete()
+        self.assertEqual(comments.flush(), 2)  # лимит 3 за окно, один коммент уже в базе
+        self.assertEqual(list(Comment.objects.order_by('pk').values_list('comment_text', flat=True)),
+                         ['Уже записан', 'Коммент 0', 'Коммент 1'])
+
+    def test_deleted_user(self):
+        comments.enqueue(self.post.pk, self.other.pk, 'От удаленного пользователя')
+        comments.enqueue(self.post.pk, self.user.pk, 'Коммент')
+        User.objects.filter(pk=self.other.pk).delete()
+        self.assertEqual(comments.flush(), 1)
+        self.assertEqual(comments.pending(), 0)
+        self.assertEqual(list(Comment.objects.values_list('comment_text', flat=True)), ['Коммент'])
+
+    def test_bad_item_does_not_block_queue(self):
+        for i in range(3):
+            comments.enqueue(self.post.pk, self.user.pk, f'Коммент {i}')
+        write = comments._write
+
+        def failing(items):
+            if any(text == 'Коммент 1' for _, _, text in items):
+                raise IntegrityError('FOREIGN KEY constraint failed')
+            return write(items)
+
+        with mock.patch('news_portal.comments._write', side_effect=failing), self.assertLogs('news_portal.comments'):
+            self.assertEqual(comments.flush(), 2)
+        self.assertEqual(comments.pending(), 0)
+        self.assertEqual(Comment.objects.count(), 2)
+
+    def test_unfinished_enqueue(self):
+        comments.enqueue(self.post.pk, self.user.pk, 'Первый')
+        cache.incr(comments.TAIL_KEY)  # номер выдан, но коммент еще не в кэше
+        comments.enqueue(self.post.pk, self.user.pk, 'Третий')
+        self.assertEqual(comments.flush(), 1)  # ждет пропущенный номер до следующего сброса
+        self.assertEqual(comments.pending(), 2)
+        self.assertEqual(comments.flush(), 1)  # пропуск не заполнился - номер пропускается
+        self.assertEqual(comments.pending(), 0)
+        self.assertEqual(Post.objects.get(pk=self.post.pk).comment_count, 2)
+
+
+class DirectCommentTests(TestCase):
+    """Без общего кэша (COMMENTS_QUEUED=False) коммент пишется сразу"""
+    def setUp(self):
+        clear_all()
+
+    @override_settings(COMMENTS_QUEUED=False, RATE_LIMITS={'comment': '1/m'})
+    def test_written_immediately(self):
+        user = User.objects.create_user(username='testuser', password='x')
+        post = Post.objects.create(author=Author.objects.create(user=user), title='Пост', content='текст')
+        self.client.force_login(user)
+        response = self.client.post(reverse('add_comment', args=[post.pk]), {'comment_text': 'Коммент'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(list(Comment.objects.values_list('comment_text', flat=True)), ['Коммент'])
+        self.assertEqual(Post.objects.get(pk=post.pk).comment_count, 1)
+        self.assertEqual(comments.pending(), 0)
+        self.assertEqual(self.client.post(reverse('add_comment', args=[post.pk]),
+                                          {'comment_text': 'Еще'}).status_code, 429)
@@ -0,0 +1,79 @@
+from io import StringIO
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth.models import User
+from django.urls import reverse
+from news_portal.fields import COMPRESSED_PREFIX
+from news_portal.models import Post, Author
+
+LONG_TEXT = 'Длинная статья о новостях науки и технологий. ' * 200
+
+
+class ContentStorageTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='testuser', password='testpass123')
+        cls.author = Author.objects.create(user=User.objects.create_user(username='authoruser', password='x'))
+
+    def stored_content(self, pk):  # значение столбца без распаковки
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT content FROM {Post._meta.db_table} WHERE id = %s', [pk])
+            return cursor.fetchone()[0]
+
+    def test_preview_saved(self):
+        post = Post.objects.create(author=self.author, title='Пост с превью', content=LONG_TEXT)
+        self.assertEqual(Post.objects.get(pk=post.pk).preview, LONG_TEXT[:124])
+        bulk = Post.objects.bulk_create([Post(author=self.author, title='Пачка', content='короткий текст')])
+        self.assertEqual(Post.objects.get(pk=bulk[0].pk).preview, 'короткий текст')
+
+        post = Post.objects.defer('content').get(pk=post.pk)
+        post.title = 'Новый заголовок'
+        with CaptureQueriesContext(connection) as queries:
+            post.save()
+        # текст ради превью не загружается и не перезаписывается
+        self.assertFalse([q['sql'] for q in queries.captured_queries if '"content"' in q['sql']])
+        self.assertEqual(Post.objects.get(pk=post.pk).preview, LONG_TEXT[:124])
+
+        post.content = 'Новый текст'
+        post.save(update_fields=['content'])
+        self.assertEqual(Post.objects.get(pk=post.pk).preview, 'Новый текст')
+
+    def test_list_views_defer_content(self):
+        Post.objects.create(author=self.author, title='Пост с превью', content=LONG_TEXT)
+        self.client.force_login(self.user)
+        for url in (reverse('main_page'), reverse('search_post')):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertContains(response, 'Длинная статья о но…')
+            post_queries = [q['sql'] for q in queries.captured_queries if 'FROM "news_portal_post"' in q['sql']
+                            and 'COUNT(' not in q['sql']]
+            self.assertTrue(post_queries)
+            self.assertFalse([sql for sql in post_queries if '"news_portal_post"."content"' in sql], url)
+
+    @override_settings(POST_CONTENT_COMPRESS_MIN_LENGTH=1024)
+    def test_compressed_content(self):
+        long = Post.objects.create(author=self.author, title='Длинный пост', content=LONG_TEXT)
+        short = Post.objects.create(author=self.author, title='Короткий пост', content='короткий текст')
+        tricky = Post.objects.create(author=self.author, title='Текст с меткой', content=COMPRESSED_PREFIX + 'текст')
+        self.assertTrue(self.stored_content(long.pk).startswith(COMPRESSED_PREFIX))
+        self.assertLess(len(self.stored_content(long.pk)), len(LONG_TEXT.encode()) / 5)
+        self.assertEqual(self.stored_content(short.pk), 'короткий текст')
+        for post, text in ((long, LONG_TEXT), (short, 'короткий текст'), (tricky, COMPRESSED_PREFIX + 'текст')):
+            self.assertEqual(Post.objects.get(pk=post.pk).content, text)
+        self.assertEqual(Post.objects.filter(pk=long.pk).values_list('content', flat=True).get(), LONG_TEXT)
+
+        Post.objects.filter(pk=short.pk).update(content=LONG_TEXT)  # update() тоже сжимает
+        self.assertTrue(self.stored_content(short.pk).startswith(COMPRESSED_PREFIX))
+
+    def test_recompress_command(self):
+        post = Post.objects.create(author=self.author, title='Длинный пост', content=LONG_TEXT)
+        Post.objects.filter(pk=post.pk).update(preview='')  # пост, сохраненный до появления превью
+        with override_settings(POST_CONTENT_COMPRESS_MIN_LENGTH=1024):
+            call_command('recompress_post_content', stdout=StringIO())
+        self.assertTrue(self.stored_content(post.pk).startswith(COMPRESSED_PREFIX))
+        self.assertEqual(Post.objects.get(pk=post.pk).preview, LONG_TEXT[:124])
+
+        call_command('recompress_post_content', stdout=StringIO())
+        self.assertEqual(self.stored_content(post.pk), LONG_TEXT)
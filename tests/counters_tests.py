@@ -0,0 +1,84 @@
+from io import StringIO
+from unittest import mock
+from django.core.management import call_command
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.contrib.auth.models import User
+from django.urls import reverse
+from news_portal.models import Post, Author, Category, Comment, PostCategory
+
+
+class PostCountersTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='testuser', password='testpass123')
+        cls.author = Author.objects.create(user=User.objects.create_user(username='authoruser', password='x'))
+        cls.tech = Category.objects.create(category='Технологии')
+        cls.science = Category.objects.create(category='Наука')
+        cls.post = Post.objects.create(author=cls.author, title='Пост с комментами', content='текст')
+
+    def counters(self):
+        post = Post.objects.get(pk=self.post.pk)
+        return post.comment_count, post.category_labels
+
+    def test_comment_count(self):
+        comments = [Comment.objects.create(post=self.post, user=self.user, comment_text=f'Коммент {i}')
+                    for i in range(3)]
+        self.assertEqual(self.counters(), (3, ''))
+        comments[0].comment_text = 'Исправленный коммент'
+        comments[0].save()
+        comments[1].delete()
+        self.assertEqual(self.counters(), (2, ''))
+
+        # сохранение поста, прочитанного до новых комментов, не затирает счетчик
+        self.post.title = 'Новый заголовок'
+        self.post.save()
+        self.assertEqual(self.counters(), (2, ''))
+
+    def test_category_labels(self):
+        PostCategory.objects.create(post=self.post, category=self.tech)
+        self.assertEqual(self.counters(), (0, 'Технологии'))
+        with mock.patch('news_portal.signals.send_notify_to_subscribers'):
+            self.post.category.add(self.science)
+        self.assertEqual(self.counters(), (0, 'Наука, Технологии'))
+
+        self.tech.category = 'Авто'
+        self.tech.save()
+        self.assertEqual(self.counters(), (0, 'Авто, Наука'))
+
+        self.science.post.clear()
+        self.assertEqual(self.counters(), (0, 'Авто'))
+        PostCategory.objects.filter(post=self.post).get().delete()
+        self.assertEqual(self.counters(), (0, ''))
+
+    def test_reconcile_command(self):
+        PostCategory.objects.create(post=self.post, category=self.tech)
+        Comment.objects.create(post=self.post, user=self.user, comment_text='Коммент')
+        # массовые операции в обход сигналов
+        Comment.objects.bulk_create([Comment(post=self.post, user=self.user, comment_text='Пачка')] * 2)
+        PostCategory.objects.bulk_create([PostCategory(post=self.post, category=self.science)])
+        other = Post.objects.create(author=self.author, title='Второй пост', content='текст')
+        Post.objects.filter(pk=other.pk).update(comment_count=5, category_labels='Лишнее')
+
+        out = StringIO()
+        call_command('reconcile_post_counters', stdout=out)
+        self.assertIn('комментов: 2, списков категорий: 2', out.getvalue())
+        self.assertEqual(self.counters(), (3, 'Наука, Технологии'))
+        self.assertEqual(Post.objects.filter(pk=other.pk).values_list('comment_count', 'category_labels').get(),
+                         (0, ''))
+
+        call_command('reconcile_post_counters', stdout=out)
+        self.assertIn('комментов: 0, списков категорий: 0', out.getvalue())
+
+    def test_feed_single_query(self):
+        PostCategory.objects.create(post=self.post, category=self.tech)
+        Comment.objects.create(post=self.post, user=self.user, comment_text='Коммент')
+        self.client.force_login(self.user)
+        self.client.get(reverse('main_page'))  # прогрев сессии и кэша ролей
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('main_page'))
+        self.assertContains(response, '<p style="margin-left: 15px">Технологии</p>')
+        post_queries = [q['sql'] for q in queries.captured_queries if 'news_portal_postcategory' in q['sql']
+                        or 'news_portal_comment' in q['sql']]
+        self.assertEqual(post_queries, [])
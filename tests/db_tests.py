@@ -0,0 +1,80 @@
+from unittest import mock
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from djangoProject_News_Portal.db_config import databases_from_env
+from news_portal import db
+from news_portal.models import Post
+
+REPLICA = {'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': 'db'},
+           'replica': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': 'db'}}
+
+
+class DatabaseConfigTests(SimpleTestCase):
+    def test_sqlite_by_default(self):
+        databases = databases_from_env({}, 'db.sqlite3')
+        self.assertEqual(databases, {'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': 'db.sqlite3',
+                                                 'CONN_MAX_AGE': 60, 'CONN_HEALTH_CHECKS': True}})
+
+    def test_postgres_with_pooler(self):
+        env = {'DB_ENGINE': 'postgres', 'DB_NAME': 'news', 'DB_HOST': 'pgbouncer', 'DB_PORT': '6432',
+               'DB_POOLER': '1', 'DB_DIRECT_HOST': 'postgres', 'DB_CONN_MAX_AGE': 'none',
+               'DB_READ_REPLICA': '1', 'DB_REPLICA_HOST': 'replica'}
+        databases = databases_from_env(env)
+        default, direct = databases['default'], databases['direct']
+        self.assertEqual((default['HOST'], default['PORT'], default['CONN_MAX_AGE']), ('pgbouncer', '6432', None))
+        self.assertTrue(default['DISABLE_SERVER_SIDE_CURSORS'])  # через пулер серверные курсоры не работают
+        self.assertEqual((direct['HOST'], direct['PORT'], direct['CONN_MAX_AGE']), ('postgres', '5432', 0))
+        self.assertFalse(direct['DISABLE_SERVER_SIDE_CURSORS'])
+        self.assertEqual(databases['replica']['HOST'], 'replica')
+        self.assertEqual(direct['TEST'], {'MIRROR': 'default'})
+        self.assertNotIn('direct', databases_from_env(dict(env, DB_POOLER='0')))
+
+    def test_stream_alias(self):
+        self.assertEqual(db.stream_alias(), 'default')
+        with override_settings(DATABASES=dict(REPLICA, direct=REPLICA['default'])):
+            self.assertEqual(db.stream_alias(), 'direct')
+            self.assertFalse(db.PrimaryReplicaRouter().allow_migrate('direct', 'news_portal'))
+
+
+class SqlitePragmasTests(TestCase):
+    def test_pragmas_on_new_connection(self):
+        with connection.cursor() as cursor:
+            values = {name: cursor.execute(f'PRAGMA {name}').fetchone()[0]
+                      for name in ('synchronous', 'cache_size', 'busy_timeout')}
+        self.assertEqual(values, {'synchronous': 1, 'cache_size': -65536, 'busy_timeout': 5000})
+
+
+class ReadReplicaRoutingTests(SimpleTestCase):
+    def route(self, method='get', **extra):
+        """Псевдоним, на который роутер отправил бы чтение внутри представления"""
+        routed = []
+
+        def view(request):
+            routed.append(db.PrimaryReplicaRouter().db_for_read(Post))
+            return HttpResponse()
+        response = db.ReadOnlyRoutingMiddleware(view)(getattr(RequestFactory(), method)('/news/', **extra))
+        return routed[0], response
+
+    @override_settings(DATABASES={'default': REPLICA['default']})
+    def test_without_replica(self):
+        self.assertIsNone(self.route()[0])
+        self.assertNotIn(db.PIN_COOKIE, self.route('post')[1].cookies)
+
+    @override_settings(DATABASES=REPLICA)
+    def test_reads_of_safe_requests_go_to_replica(self):
+        self.assertEqual(self.route()[0], 'replica')
+        self.assertIsNone(db.read_alias())  # вне запроса - основная база
+        self.assertEqual(db.PrimaryReplicaRouter().db_for_write(Post), 'default')
+        self.assertFalse(db.PrimaryReplicaRouter().allow_migrate('replica', 'news_portal'))
+
+    @override_settings(DATABASES=REPLICA)
+    def test_writes_and_transactions_use_primary(self):
+        routed, response = self.route('post')
+        self.assertIsNone(routed)
+        pin = response.cookies[db.PIN_COOKIE].value
+        self.assertIsNone(self.route(HTTP_COOKIE=f'{db.PIN_COOKIE}={pin}')[0])  # свои изменения - из основной
+        self.assertEqual(self.route(HTTP_COOKIE=f'{db.PIN_COOKIE}=0')[0], 'replica')
+
+        with mock.patch.object(connection, 'in_atomic_block', True):  # транзакция видит свои изменения
+            self.assertIsNone(self.route()[0])
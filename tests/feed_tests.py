@@ -0,0 +1,71 @@
+from datetime import timedelta
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.urls import reverse
+from djangoProject_News_Portal.celery import app
+from news_portal import feed
+from news_portal.models import Post, Author, Category, PostCategory, UserSubcribes, FeedEntry
+from news_portal.tasks import send_notify_to_subscribers
+
+
+class FeedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = Author.objects.create(user=User.objects.create_user(username='authoruser', password='x'))
+        cls.tech = Category.objects.create(category='Технологии')
+        cls.science = Category.objects.create(category='Наука')
+        cls.sport = Category.objects.create(category='Спорт')
+        cls.user = User.objects.create_user(username='testuser', email='test@test.com', password='testpass123')
+        cls.other = User.objects.create_user(username='other', email='other@test.com', password='x')
+        UserSubcribes.objects.create(subcribe=cls.user, category=cls.tech)
+        UserSubcribes.objects.create(subcribe=cls.user, category=cls.science)
+        UserSubcribes.objects.create(subcribe=cls.other, category=cls.sport)
+        cls.posts = []
+        for i, categories in enumerate([[cls.tech], [cls.science], [cls.tech, cls.science], [cls.sport], [cls.tech]]):
+            post = Post.objects.create(author=cls.author, title=f'Пост {i}', content='текст')
+            Post.objects.filter(pk=post.pk).update(create_time=post.create_time + timedelta(minutes=i))
+            for category in categories:
+                PostCategory.objects.create(post=post, category=category)
+            cls.posts.append(post)
+
+    def setUp(self):
+        app.conf.task_always_eager = True  # подзадачи выполняются сразу, без брокера
+        self.addCleanup(setattr, app.conf, 'task_always_eager', False)
+
+    def feed_ids(self, user):
+        return list(feed.posts_for(user).values_list('pk', flat=True))
+
+    def test_fan_out_on_publication(self):
+        for post in self.posts:
+            send_notify_to_subscribers(post.pk)
+        send_notify_to_subscribers(self.posts[2].pk)  # повторная рассылка не дублирует записи
+        self.assertEqual(self.feed_ids(self.user), [self.posts[i].pk for i in (4, 2, 1, 0)])
+        self.assertEqual(self.feed_ids(self.other), [self.posts[3].pk])
+
+    @override_settings(FEED_MAX_LENGTH=2)
+    def test_backfill_and_trim(self):
+        call_command('backfill_feeds', stdout=StringIO())
+        self.assertEqual(self.feed_ids(self.user), [self.posts[4].pk, self.posts[2].pk])
+        self.assertEqual(self.feed_ids(self.other), [self.posts[3].pk])
+
+        post = Post.objects.create(author=self.author, title='Новый пост', content='текст')
+        Post.objects.filter(pk=post.pk).update(create_time=post.create_time + timedelta(hours=1))
+        PostCategory.objects.create(post=post, category=self.science)
+        send_notify_to_subscribers(post.pk)
+        self.assertEqual(FeedEntry.objects.filter(user=self.user).count(), 3)
+        self.assertEqual(feed.trim(), 1)
+        self.assertEqual(self.feed_ids(self.user), [post.pk, self.posts[4].pk])
+
+    def test_feed_page_and_subscription_changes(self):
+        feed.rebuild([self.user.pk])
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('my_feed'))
+        self.assertEqual([p.pk for p in response.context['post']], [self.posts[i].pk for i in (4, 2, 1, 0)])
+        self.assertTrue(response.context['my_feed'])
+
+        # отписка от "Технологий" и подписка на "Спорт" перестраивают ленту
+        self.client.post(reverse('edit_subscribe'), {'subscribe': 'Принять изменения',
+                                                     'category': [self.science.pk, self.sport.pk]})
+        self.assertEqual(self.feed_ids(self.user), [self.posts[i].pk for i in (3, 2, 1)])
@@ -1,12 +1,18 @@
+import os
+import statistics
+import tempfile
 import tracemalloc
 import time
-from django.test import TestCase, Client, override_settings
+from django.test import SimpleTestCase, TestCase, Client, override_settings
 from django.contrib.auth.models import User, Group
 from django.urls import reverse
-from django.db import connection, reset_queries
+from django.db import connection, connections, reset_queries
+from django.db.backends.signals import connection_created
+from django.db.utils import load_backend
 from django.conf import settings
 from news_portal.models import Post, Author, Category, PostCategory
 from datetime import datetime, timedelta, timezone
+from djangoProject_News_Portal.db_config import env_database
 
 @override_settings(DEBUG=True)
 class LoadTests(TestCase):
@@ -188,3 +194,61 @@ class LoadTests(TestCase):
         success_count = sum(1 for code in responses if code == 200)
         self.assertGreaterEqual(success_count, 25, f"Слишком мало успешных запросов: {success_count}/30")
 
+
+
+class ConnectionPoolingLoadTests(SimpleTestCase):
+    """Постоянные соединения (CONN_MAX_AGE) против нового соединения на каждый запрос.
+    PostgreSQL здесь заменяет файл SQLite: установка соединения с сервером (TCP, авторизация)
+    имитируется задержкой CONNECT_LATENCY в get_new_connection. Цикл запроса - тот же, что у Django:
+    close_old_connections в начале и в конце запроса (сигналы request_started / request_finished)"""
+    REQUESTS = 200
+    CONNECT_LATENCY = 0.002  # сек., установка соединения с PostgreSQL по локальной сети
+
+    def run_requests(self, conn_max_age):
+        settings_dict = env_database({'DB_NAME': os.path.join(self.tmpdir, 'standin.sqlite3'),
+                                      'DB_CONN_MAX_AGE': str(conn_max_age)})
+        wrapper = load_backend(settings_dict['ENGINE']).DatabaseWrapper(
+            connections.configure_settings({'default': settings_dict})['default'], 'standin')
+        opened = []
+
+        def count(sender, connection, **kwargs):
+            if connection is wrapper:
+                opened.append(connection)
+        connect = wrapper.get_new_connection
+
+        def slow_connect(conn_params):
+            time.sleep(self.CONNECT_LATENCY)
+            return connect(conn_params)
+        wrapper.get_new_connection = slow_connect
+        connection_created.connect(count)
+        try:
+            latencies = []
+            for _ in range(self.REQUESTS):
+                start = time.perf_counter()
+                wrapper.close_if_unusable_or_obsolete()  # request_started
+                with wrapper.cursor() as cursor:
+                    cursor.execute('SELECT 1')
+                wrapper.close_if_unusable_or_obsolete()  # request_finished
+                latencies.append(time.perf_counter() - start)
+        finally:
+            connection_created.disconnect(count)
+            wrapper.close()
+        return len(opened), statistics.mean(latencies), statistics.quantiles(latencies, n=100)[98]
+
+    def test_connection_churn_and_latency(self):
+        with tempfile.TemporaryDirectory() as self.tmpdir:
+            results = {'без пула (CONN_MAX_AGE=0)': self.run_requests(0),
+                       'постоянные соединения (CONN_MAX_AGE=60)': self.run_requests(60)}
+
+        print(f"\n{'='*60}")
+        print(f"Нагрузочный тест: соединения с базой ({self.REQUESTS} запросов)")
+        print(f"{'='*60}")
+        for name, (opened, mean, p99) in results.items():
+            print(f"{name}: соединений открыто {opened}, "
+                  f"среднее {mean * 1000:.2f} мс, p99 {p99 * 1000:.2f} мс")
+        print(f"{'='*60}\n")
+
+        (churn_off, mean_off, _), (churn_on, mean_on, _) = results.values()
+        self.assertEqual(churn_off, self.REQUESTS)
+        self.assertEqual(churn_on, 1)
+        self.assertLess(mean_on, mean_off)
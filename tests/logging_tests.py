@@ -0,0 +1,115 @@
+import json
+import logging
+import queue
+import sys
+import tempfile
+from pathlib import Path
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase
+from djangoProject_News_Portal.log_config import (AsyncQueueHandler, BatchedRotatingFileHandler,
+                                                  BatchedWatchedFileHandler, BatchingQueueListener,
+                                                  JsonFormatter, file_handler)
+
+
+def make_record(msg='Пост %s', args=(1,), exc_info=None, **extra):
+    return logging.makeLogRecord({'name': 'news_portal', 'levelno': logging.ERROR, 'levelname': 'ERROR',
+                                  'msg': msg, 'args': args, 'exc_info': exc_info, **extra})
+
+
+class JsonFormatterTests(SimpleTestCase):
+    def test_fields_and_extra(self):
+        data = json.loads(JsonFormatter().format(make_record(post_id=7)))
+        self.assertEqual((data['level'], data['logger'], data['message']), ('ERROR', 'news_portal', 'Пост 1'))
+        self.assertEqual(data['post_id'], 7)
+        self.assertNotIn('args', data)
+
+    def test_exception(self):
+        try:
+            1 / 0
+        except ZeroDivisionError:
+            record = make_record(exc_info=sys.exc_info())
+        self.assertIn('ZeroDivisionError', json.loads(JsonFormatter().format(record))['exc_info'])
+
+
+class QueueLoggingTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name) / 'app.log'
+
+    def file_handler(self, **kwargs):
+        handler = BatchedRotatingFileHandler(self.path, encoding='utf-8', **kwargs)
+        handler.setFormatter(logging.Formatter('{message}', style='{'))
+        self.addCleanup(handler.close)
+        return handler
+
+    def test_listener_writes_records_in_order(self):
+        records = queue.Queue()
+        listener = BatchingQueueListener(records, self.file_handler())
+        handler = AsyncQueueHandler(records)
+        args = [1]
+        handler.handle(make_record('Список %s', (args,)))
+        args.append(2)  # сообщение сформировано в момент вызова, а не в потоке-слушателе
+        for i in range(100):
+            handler.handle(make_record(args=(i,)))
+        listener.stop()
+        listener.stop()  # повторная остановка (atexit) не падает
+        lines = self.path.read_text(encoding='utf-8').splitlines()
+        self.assertEqual(lines, ['Список [1]'] + [f'Пост {i}' for i in range(100)])
+
+    def test_traceback_formatted_before_queue(self):
+        records = queue.Queue()
+        try:
+            raise ValueError('сломано')
+        except ValueError:
+            AsyncQueueHandler(records).handle(make_record(exc_info=sys.exc_info()))
+        record = records.get_nowait()
+        self.assertIsNone(record.exc_info)
+        self.assertIn('ValueError: сломано', record.exc_text)
+
+    def test_rotation_by_size(self):
+        handler = self.file_handler(maxBytes=200, backupCount=2)
+        for i in range(50):
+            handler.handle(make_record(args=(i,)))
+        handler.flush_batch()
+        self.assertTrue(Path(f'{self.path}.1').exists())
+        self.assertFalse(Path(f'{self.path}.3').exists())
+        self.assertLessEqual(self.path.stat().st_size, 200)
+
+    def test_watched_file_reopened_after_logrotate(self):
+        handler = BatchedWatchedFileHandler(self.path, encoding='utf-8')
+        self.addCleanup(handler.close)
+        handler.handle(make_record(args=(1,)))
+        handler.flush_batch()
+        self.path.rename(f'{self.path}.1')  # так файл переименовывает logrotate
+        handler.handle(make_record(args=(2,)))
+        handler.flush_batch()
+        self.assertEqual(Path(f'{self.path}.1').read_text(encoding='utf-8'), 'Пост 1\n')
+        self.assertEqual(self.path.read_text(encoding='utf-8'), 'Пост 2\n')
+
+    def test_restart_after_fork(self):
+        records = queue.Queue()
+        listener = BatchingQueueListener(records, self.file_handler())
+        listener.stop()
+        handler = AsyncQueueHandler(records)
+        handler.handle(make_record(args=(1,)))  # запись родителя, еще не записанная в файл
+        records.mutex.acquire()  # блокировку держал поток родителя в момент fork
+        listener._restart_in_child()
+        handler.handle(make_record(args=(2,)))
+        listener.stop()
+        self.assertEqual(self.path.read_text(encoding='utf-8'), 'Пост 2\n')
+
+    def test_file_handler(self):
+        self.assertEqual(file_handler('a.log', 'general')['class'],
+                         'djangoProject_News_Portal.log_config.BatchedWatchedFileHandler')
+        size = file_handler('a.log', 'general', 'internal', maxBytes=100, backupCount=2)
+        self.assertEqual((size['class'].rsplit('.', 1)[1], size['maxBytes']), ('BatchedRotatingFileHandler', 100))
+        timed = file_handler('a.log', 'general', 'internal', when='midnight', backupCount=2)
+        self.assertEqual(timed['class'].rsplit('.', 1)[1], 'BatchedTimedRotatingFileHandler')
+        with self.assertRaises(ImproperlyConfigured):
+            file_handler('a.log', 'general', 'daily')
+
+    def test_settings_use_queue(self):
+        for name in ('django.request', 'django.security', 'django'):
+            handlers = logging.getLogger(name).handlers
+            self.assertTrue(any(isinstance(handler, AsyncQueueHandler) for handler in handlers), name)
@@ -0,0 +1,136 @@
+from unittest import mock
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from djangoProject_News_Portal.celery import app
+from news_portal.models import Post, Author, Category, PostCategory, UserSubcribes, Mail, MailingCheckpoint
+from news_portal.tasks import send_notify_to_subscribers, weekly_mailing
+from news_portal.digest import DigestRenderer
+from news_portal.management.commands.runapscheduler import my_job
+
+
+class NotifySubscribersTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = Author.objects.create(user=User.objects.create_user(username='authoruser', password='x'))
+        cls.category1 = Category.objects.create(category='Технологии')
+        cls.category2 = Category.objects.create(category='Наука')
+        cls.post = Post.objects.create(author=author, title='Тестовый пост', content='текст')
+        PostCategory.objects.create(post=cls.post, category=cls.category1)
+        PostCategory.objects.create(post=cls.post, category=cls.category2)
+        for i in range(7):
+            user = User.objects.create_user(username=f'user{i}', email=f'user{i}@test.com', password='x')
+            UserSubcribes.objects.create(subcribe=user, category=cls.category1)
+            if i % 2:
+                UserSubcribes.objects.create(subcribe=user, category=cls.category2)
+
+    def setUp(self):
+        app.conf.task_always_eager = True  # подзадачи выполняются сразу, без брокера
+        self.addCleanup(setattr, app.conf, 'task_always_eager', False)
+
+    @override_settings(MAIL_CHUNK_SIZE=2, MAIL_FANOUT_PARALLELISM=2)
+    def test_fan_out_in_chunks(self):
+        # пост, подписчики, записи лент + (пост, пользователи, bulk_create) на пачку
+        with self.assertNumQueries(3 + 4 * 3):
+            self.assertEqual(send_notify_to_subscribers(self.post.pk), 7)
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), [f'user{i}@test.com' for i in range(7)])
+        self.assertEqual(Mail.objects.count(), 7)
+        for message in mail.outbox:  # письмо персональное
+            self.assertIn(message.to[0].split('@')[0], message.body)
+
+    def flaky_smtp(self, failures):
+        """send_messages, который падает на адресах из failures (адрес -> сколько раз)"""
+        send = EmailBackend.send_messages
+
+        def send_messages(backend, messages):
+            address = messages[0].to[0]
+            if failures.get(address):
+                failures[address] -= 1
+                raise ConnectionError('SMTP упал')
+            return send(backend, messages)
+        return mock.patch.object(EmailBackend, 'send_messages', autospec=True, side_effect=send_messages)
+
+    @override_settings(MAIL_CHUNK_SIZE=3, MAIL_FANOUT_PARALLELISM=1)
+    def test_retry_sends_only_rest(self):
+        with self.flaky_smtp({'user1@test.com': 1}), self.assertLogs('news_portal.tasks', 'ERROR'):
+            send_notify_to_subscribers(self.post.pk)
+        addresses = sorted(m.to[0] for m in mail.outbox)
+        self.assertEqual(addresses, [f'user{i}@test.com' for i in range(7)])  # без повторных писем
+        self.assertEqual(Mail.objects.count(), 7)
+
+    @override_settings(MAIL_CHUNK_SIZE=3, MAIL_FANOUT_PARALLELISM=1)
+    def test_failed_chunk_does_not_stop_lane(self):
+        with self.flaky_smtp({'user1@test.com': 10}), self.assertLogs('news_portal.tasks', 'ERROR') as logs:
+            send_notify_to_subscribers(self.post.pk)
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), [f'user{i}@test.com' for i in range(7) if i != 1])
+        self.assertEqual(Mail.objects.count(), 6)
+        self.assertTrue(any('gave up on 1 mails' in line for line in logs.output))
+
+
+class WeeklyMailingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = Author.objects.create(user=User.objects.create_user(username='authoruser', password='x'))
+        cls.category1 = Category.objects.create(category='Технологии')
+        cls.category2 = Category.objects.create(category='Наука')
+        cls.post = Post.objects.create(author=author, title='Пост в двух категориях', content='текст')
+        PostCategory.objects.create(post=cls.post, category=cls.category1)
+        PostCategory.objects.create(post=cls.post, category=cls.category2)
+        cls.users = []
+        for i in range(5):
+            user = User.objects.create_user(username=f'user/{i}', email=f'user{i}@test.com', password='x')
+            UserSubcribes.objects.create(subcribe=user, category=cls.category1)
+            UserSubcribes.objects.create(subcribe=user, category=cls.category2)
+            cls.users.append(user)
+
+    @override_settings(MAIL_CHUNK_SIZE=2)
+    def test_one_mail_per_subscriber(self):
+        self.assertEqual(weekly_mailing(), 5)
+        self.assertEqual(len(mail.outbox), 5)
+        html = mail.outbox[0].alternatives[0][0]
+        self.assertEqual(html.count('Пост в двух категориях'), 1)
+        self.assertIn('user/0', html)
+        self.assertTrue(MailingCheckpoint.objects.get(name='weekly_mailing').finished)
+        # повторный запуск на той же неделе ничего не отправляет
+        self.assertEqual(weekly_mailing(), 0)
+
+    @override_settings(MAIL_CHUNK_SIZE=2)
+    def test_resume_from_checkpoint(self):
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages',
+                        side_effect=[2, ConnectionError('SMTP упал')]):
+            with self.assertRaises(ConnectionError):
+                weekly_mailing()  # при прямом вызове retry пробрасывает исходную ошибку
+        checkpoint = MailingCheckpoint.objects.get(name='weekly_mailing')
+        self.assertEqual(checkpoint.last_subscriber_id, self.users[1].pk)
+
+        self.assertEqual(weekly_mailing(), 3)
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), [f'user{i}@test.com' for i in (2, 3, 4)])
+
+
+class SchedulerDigestTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = Author.objects.create(user=User.objects.create_user(username='authoruser', password='x'))
+        tech, science = Category.objects.create(category='Технологии'), Category.objects.create(category='Наука')
+        PostCategory.objects.create(post=Post.objects.create(author=author, title='Пост про технологии',
+                                                             content='текст'), category=tech)
+        PostCategory.objects.create(post=Post.objects.create(author=author, title='Пост про науку',
+                                                             content='текст'), category=science)
+        for i in range(6):
+            user = User.objects.create_user(username=f'user{i}', email=f'user{i}@test.com', password='x')
+            UserSubcribes.objects.create(subcribe=user, category=tech)
+            if i % 2:
+                UserSubcribes.objects.create(subcribe=user, category=science)
+
+    def test_digest_rendered_once_per_post_set(self):
+        with mock.patch('news_portal.digest.DigestRenderer.render', autospec=True,
+                        side_effect=DigestRenderer.render) as render, \
+                self.assertNumQueries(1):
+            self.assertEqual(my_job(batch_size=4), 6)
+        self.assertEqual(render.call_args_list[0].args[0].rendered, 2)  # два различных набора постов
+        self.assertEqual(len(mail.outbox), 6)
+        for msg in mail.outbox:
+            html = msg.alternatives[0][0]
+            self.assertEqual(html.count('Пост про технологии'), 1)
+            self.assertEqual('Пост про науку' in html, int(msg.to[0][4]) % 2 == 1)
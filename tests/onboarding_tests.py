@@ -0,0 +1,96 @@
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+from django.core.management import call_command, CommandError
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth.models import User, Group
+from news_portal.models import Author
+from sign.groups import group_id, reset_group_ids
+from sign.models import BaseRegisterForm
+
+
+class GroupIdCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.common = Group.objects.create(name='common')
+
+    def setUp(self):
+        reset_group_ids(Group)  # id групп, созданных в откаченных транзакциях других тестов
+
+    def test_signup_does_not_look_up_group(self):
+        group_id('common')
+        form = BaseRegisterForm(data={'username': 'newuser', 'first_name': 'Имя', 'last_name': 'Фамилия',
+                                      'email': 'new@test.com', 'password1': 'Sl0zhnyi-parol',
+                                      'password2': 'Sl0zhnyi-parol'})
+        self.assertTrue(form.is_valid(), form.errors)
+        with CaptureQueriesContext(connection) as ctx:
+            user = form.save()
+        self.assertFalse([q for q in ctx.captured_queries if 'FROM "auth_group"' in q['sql']])
+        self.assertEqual(list(user.groups.all()), [self.common])
+
+    def test_reset_on_group_changes(self):
+        self.assertEqual(group_id('common'), self.common.pk)
+        self.common.delete()
+        recreated = Group.objects.create(name='common')
+        self.assertEqual(group_id('common'), recreated.pk)
+
+
+class BulkOnboardUsersTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.common = Group.objects.create(name='common')
+        cls.authors = Group.objects.create(name='authors')
+        User.objects.create_user(username='existing', email='taken@test.com', password='x')
+
+    def run_command(self, name, content, *args):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / name
+            path.write_text(content, encoding='utf-8')
+            call_command('bulk_onboard_users', str(path), *args, stdout=StringIO())
+
+    def test_csv_import(self):
+        rows = ['username,email,first_name,last_name,author']
+        rows += [f'user{i},user{i}@test.com,Имя,Фамилия,{int(i % 3 == 0)}' for i in range(10)]
+        rows += ['existing,other@test.com,,,0', 'dup,TAKEN@test.com,,,0', 'user1,again@test.com,,,0']
+        self.run_command('users.csv', '\n'.join(rows), '--batch-size', '4')
+
+        self.assertEqual(User.objects.filter(username__startswith='user').count(), 10)
+        self.assertFalse(User.objects.filter(username='dup').exists())
+        self.assertEqual(self.common.user_set.count(), 10)
+        self.assertEqual(set(Author.objects.values_list('user__username', flat=True)),
+                         {'user0', 'user3', 'user6', 'user9'})
+        self.assertEqual(self.authors.user_set.count(), 4)
+        self.assertFalse(User.objects.get(username='user1').has_usable_password())
+
+    def test_jsonl_import_with_password(self):
+        lines = [json.dumps({'username': 'jsonuser', 'email': 'json@test.com', 'password': 'secret123'})]
+        self.run_command('users.jsonl', '\n'.join(lines), '--group', 'authors')
+        user = User.objects.get(username='jsonuser')
+        self.assertTrue(user.check_password('secret123'))
+        self.assertEqual(list(user.groups.all()), [self.authors])
+        self.assertTrue(Author.objects.filter(user=user).exists())  # группа authors - это и запись автора
+
+    def test_existing_email_in_other_case(self):
+        User.objects.create_user(username='foo', email='Foo@Test.com', password='x')
+        self.run_command('users.csv', 'username,email\nnewfoo,foo@test.com\nbar,bar@test.com')
+        self.assertFalse(User.objects.filter(username='newfoo').exists())
+        self.assertTrue(User.objects.filter(username='bar').exists())
+
+    def test_invalid_rows_are_skipped(self):
+        lines = [json.dumps(row) for row in (
+            {'email': 'nousername@test.com'}, {'username': ''}, {'username': 'bad name'},
+            {'username': 'x' * 151}, {'username': 'bademail', 'email': 'not-an-email'},
+            {'username': 42}, {'username': 'good', 'email': 'good@test.com'})]
+        self.run_command('users.jsonl', '\n'.join(lines))
+        self.assertEqual(set(User.objects.values_list('username', flat=True)), {'existing', 'good'})
+
+    def test_authors_group_only_when_needed(self):
+        self.authors.delete()
+        self.run_command('users.csv', 'username,author\nreader,0')
+        self.assertTrue(User.objects.filter(username='reader').exists())
+        with self.assertRaises(CommandError):
+            self.run_command('users.csv', 'username,author\nwriter,1')
+        self.assertFalse(User.objects.filter(username='writer').exists())
@@ -0,0 +1,55 @@
+from datetime import datetime, timedelta, timezone
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.http import Http404
+from django.urls import reverse
+from news_portal.models import Post, Author
+from news_portal.pagination import KeysetPaginator
+
+
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='testuser', password='testpass123')
+        cls.author = Author.objects.create(user=cls.user)
+        base = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        for i in range(25):
+            Post.objects.create(author=cls.author, title=f'Тестовый пост {i}', content='текст')
+        # у части постов одинаковое время создания, чтобы проверить разрешение по pk
+        for i, post in enumerate(Post.objects.order_by('pk')):
+            Post.objects.filter(pk=post.pk).update(create_time=base + timedelta(hours=i // 3))
+        cls.expected = list(Post.objects.order_by('-create_time', '-pk').values_list('pk', flat=True))
+
+    def test_walk_forward_and_back(self):
+        paginator = KeysetPaginator(Post.objects.all(), 10)
+        page = paginator.page()
+        seen, pages = [], [page]
+        while True:
+            seen += [p.pk for p in page]
+            if not page.has_next():
+                break
+            page = paginator.page(page.next_cursor)
+            pages.append(page)
+        self.assertEqual(seen, self.expected)
+        self.assertEqual([len(p) for p in pages], [10, 10, 5])
+
+        back = paginator.page(pages[2].previous_cursor)
+        self.assertEqual([p.pk for p in back], [p.pk for p in pages[1]])
+        first = paginator.page(back.previous_cursor)
+        self.assertEqual([p.pk for p in first], self.expected[:10])
+        self.assertFalse(first.has_previous())
+
+    def test_bad_cursor(self):
+        with self.assertRaises(Http404):
+            KeysetPaginator(Post.objects.all(), 10).page('мусор')
+
+    @override_settings(KEYSET_PAGINATION=True)
+    def test_posts_list_keyset(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('main_page'))
+        self.assertEqual(response.status_code, 200)
+        page = response.context['page_obj']
+        self.assertEqual([p.pk for p in page], self.expected[:10])
+        response = self.client.get(reverse('search_post'), {'cursor': page.next_cursor})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([p.pk for p in response.context['page_obj']], self.expected[10:13])
@@ -0,0 +1,66 @@
+from io import StringIO
+from asgiref.sync import sync_to_async
+from djangoProject_News_Portal.cache_config import clear_all
+from django.core.management import call_command, CommandError
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.urls import reverse
+from news_portal import profiling
+from news_portal.models import Post, Author
+
+
+class PerformanceBudgetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='testuser', password='testpass123')
+        author = Author.objects.create(user=cls.user)
+        cls.post = Post.objects.create(author=author, title='Тестовый пост', content='текст')
+
+    def setUp(self):
+        clear_all()
+        self.client.force_login(self.user)
+
+    @override_settings(PERF_SAMPLE_RATE=1.0, PERF_TRACE_MEMORY=True)
+    def test_requests_are_aggregated_per_url_name(self):
+        for _ in range(3):
+            self.client.get(reverse('main_page'))
+        self.client.get(reverse('post_detail', args=[self.post.pk]))
+        report = profiling.report()
+        self.assertEqual(report['main_page']['requests'], 3)
+        self.assertEqual(report['post_detail']['requests'], 1)
+        self.assertGreater(report['main_page']['avg_queries'], 0)
+        self.assertIsNotNone(report['main_page']['avg_memory_kb'])
+        self.assertEqual(sum(count for _, count in report['main_page']['histogram']), 3)
+
+        out = StringIO()
+        with override_settings(CACHE_BACKEND='redis'):  # команда читает замеры из общего кэша
+            call_command('perf_report', reset=True, stdout=out)
+        self.assertIn('main_page: 3', out.getvalue())
+        self.assertEqual(profiling.report(), {})
+
+    @override_settings(PERF_SAMPLE_RATE=0.0)
+    def test_not_sampled(self):
+        self.client.get(reverse('main_page'))
+        self.assertEqual(profiling.report(), {})
+
+    @override_settings(PERF_SAMPLE_RATE=1.0, PERF_BUDGETS={'main_page': {'queries': 1}})
+    def test_budget_warning(self):
+        with self.assertLogs('news_portal.performance', 'WARNING') as logs:
+            self.client.get(reverse('main_page'))
+        self.assertIn('main_page', logs.output[0])
+
+    def test_report_requires_shared_cache(self):
+        with self.assertRaises(CommandError):
+            call_command('perf_report', stdout=StringIO())
+
+    def test_view_names(self):
+        names = profiling.view_names()
+        self.assertTrue({'main_page', 'post_detail', 'admin:index', 'unresolved'} <= names)
+
+    @override_settings(PERF_SAMPLE_RATE=1.0, ROOT_URLCONF='tests.async_views_tests')
+    async def test_async_view_queries_counted(self):
+        await self.async_client.aforce_login(self.user)
+        await self.async_client.get(reverse('main_page'))  # асинхронное представление под ASGI
+        report = await sync_to_async(profiling.report)()
+        self.assertEqual(report['main_page']['requests'], 1)
+        self.assertGreater(report['main_page']['avg_queries'], 0)
@@ -0,0 +1,85 @@
+from unittest import mock
+from djangoProject_News_Portal.cache_config import clear_all
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth.models import User
+from django.urls import reverse
+from news_portal import post_cache
+from news_portal.models import Post, Author, Category, Comment, PostCategory
+
+
+class PostCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='testuser', password='testpass123')
+        cls.author = Author.objects.create(user=cls.user)
+        cls.category1 = Category.objects.create(category='Технологии')
+        cls.category2 = Category.objects.create(category='Наука')
+        cls.post = Post.objects.create(author=cls.author, title='Тестовый пост', content='текст')
+        PostCategory.objects.create(post=cls.post, category=cls.category1)
+
+    def setUp(self):
+        clear_all()
+        self.client.force_login(self.user)
+
+    def detail(self):
+        return self.client.get(reverse('post_detail', args=[self.post.pk])).context
+
+    def test_hits_and_misses(self):
+        self.detail()
+        self.assertEqual(post_cache.stats()['misses'], 3)  # пост, комменты, категории
+        with CaptureQueriesContext(connection) as ctx:
+            self.detail()
+        tables = ' '.join(q['sql'] for q in ctx.captured_queries)
+        self.assertNotIn('"news_portal_post"', tables)
+        self.assertNotIn('"news_portal_comment"', tables)
+        self.assertEqual(post_cache.stats()['hits'], 3)
+
+    def test_invalidation_on_writes(self):
+        self.detail()
+        self.post.like()
+        self.assertEqual(self.detail()['post'].raiting, 1)
+
+        Comment.objects.create(post=self.post, user=self.user, comment_text='коммент')
+        self.assertEqual(len(self.detail()['comm']), 1)
+
+        with mock.patch('news_portal.signals.send_notify_to_subscribers'):  # без брокера celery
+            self.post.category.add(self.category2)
+        self.assertEqual(len(self.detail()['categories']), 2)
+        self.category2.post.remove(self.post)
+        self.assertEqual(len(self.detail()['categories']), 1)
+
+        Post.objects.get(pk=self.post.pk).save()  # например, правка из админки
+        self.assertEqual(post_cache.stats()['misses'], 15)
+
+    def test_invalidated_again_after_commit(self):
+        stale = self.detail()['post']
+        with self.captureOnCommitCallbacks(execute=True):
+            Post.objects.filter(pk=self.post.pk).update(title='Новый заголовок')
+            post_cache.invalidate_post(self.post.pk)
+            # параллельный запрос до коммита видит старую строку и кэширует ее под новой версией
+            post_cache.posts_cache.set(post_cache.post_key(self.post.pk, 'detail'), stale)
+        self.assertEqual(self.detail()['post'].title, 'Новый заголовок')
+
+
+class FeedFragmentCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='testuser', password='testpass123')
+        cls.author = Author.objects.create(user=cls.user)
+        cls.post = Post.objects.create(author=cls.author, title='Тестовый пост', content='старый текст')
+
+    def setUp(self):
+        clear_all()
+        self.client.force_login(self.user)
+
+    def test_card_is_cached_until_post_changes(self):
+        self.assertContains(self.client.get(reverse('main_page')), 'старый текст')
+        # изменение в обход ORM-сохранения: время изменения прежнее, карточка берется из кэша
+        Post.objects.filter(pk=self.post.pk).update(content='новый текст')
+        self.assertContains(self.client.get(reverse('main_page')), 'старый текст')
+
+        post = Post.objects.get(pk=self.post.pk)
+        post.save()  # обновляет update_time
+        self.assertContains(self.client.get(reverse('main_page')), 'новый текст')
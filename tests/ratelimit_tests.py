@@ -0,0 +1,109 @@
+from unittest import mock
+from djangoProject_News_Portal.cache_config import clear_all
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth.models import User, Permission
+from django.urls import reverse
+from news_portal import ratelimit
+from news_portal.forms import PostCreateForm
+from news_portal.models import Post, Author, Category
+
+
+class SlidingWindowTests(TestCase):
+    def setUp(self):
+        clear_all()
+
+    def test_parse_rate(self):
+        self.assertEqual(ratelimit.parse_rate('10/m'), (10, 60))
+        self.assertEqual(ratelimit.parse_rate('4/d'), (4, 86400))
+        with self.assertRaises(ImproperlyConfigured):
+            ratelimit.parse_rate('10 в минуту')
+
+    def test_sliding_window(self):
+        with mock.patch('news_portal.ratelimit.time.time', return_value=6000.0), self.assertNumQueries(0):
+            self.assertTrue(ratelimit.peek('k', 3, 60))
+            self.assertEqual([ratelimit.hit('k', 3, 60) for _ in range(4)], [True, True, True, False])
+            self.assertFalse(ratelimit.peek('k', 3, 60))
+        # середина следующего окна: половина из 4 запросов прошлого окна еще учитывается
+        with mock.patch('news_portal.ratelimit.time.time', return_value=6090.0):
+            self.assertEqual([ratelimit.hit('k', 3, 60) for _ in range(2)], [True, False])
+        # через окно прошлые запросы уже не учитываются
+        with mock.patch('news_portal.ratelimit.time.time', return_value=6180.0):
+            self.assertTrue(ratelimit.hit('k', 1, 60))
+            self.assertTrue(ratelimit.hit('other', 1, 60))
+
+
+@override_settings(RATE_LIMITS={'create_post': '2/d', 'search': '2/m', 'subscribe': '1/m', 'login': '2/m'})
+class RateLimitedViewsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='testuser', password='testpass123')
+        cls.user.user_permissions.add(Permission.objects.get(codename='add_post'))
+        cls.author = Author.objects.create(user=cls.user)
+        cls.category = Category.objects.create(category='Технологии')
+
+    def setUp(self):
+        clear_all()
+        self.client.force_login(self.user)
+
+    def test_create_post_limit_without_count_query(self):
+        data = {'title': 'Новый пост', 'author': self.author.pk, 'postType': 'NS', 'content': 'текст',
+                'category': [self.category.pk]}
+        with mock.patch('news_portal.signals.send_notify_to_subscribers'):
+            self.client.post(reverse('create_post'), dict(data, title='Пост'))  # ошибка формы не учитывается
+            for _ in range(2):
+                with CaptureQueriesContext(connection) as queries:
+                    self.client.post(reverse('create_post'), data)
+                self.assertFalse([q['sql'] for q in queries.captured_queries if 'COUNT(' in q['sql']])
+        self.assertEqual(Post.objects.count(), 2)
+        response = self.client.get(reverse('create_post'))
+        self.assertTemplateUsed(response, 'posts_limit.html')
+
+    def test_search_and_subscribe_limits(self):
+        statuses = [self.client.get(reverse('search_post')).status_code for _ in range(3)]
+        self.assertEqual(statuses, [200, 200, 429])
+        self.assertEqual(self.client.get(reverse('main_page')).status_code, 200)  # лента не ограничена
+
+        data = {'subscribe': 'Принять изменения', 'category': [self.category.pk]}
+        self.assertEqual(self.client.post(reverse('edit_subscribe'), data).status_code, 302)
+        self.assertEqual(self.client.post(reverse('edit_subscribe'), data).status_code, 429)
+
+    @override_settings(ROOT_URLCONF='tests.async_views_tests')
+    async def test_async_search_limit(self):
+        await self.async_client.aforce_login(self.user)
+        statuses = [(await self.async_client.get(reverse('search_post'))).status_code for _ in range(3)]
+        self.assertEqual(statuses, [200, 200, 429])
+
+    def test_login_limited_by_ip(self):
+        self.client.logout()
+        data = {'login': 'testuser', 'password': 'неверный'}
+        statuses = [self.client.post(reverse('account_login'), data).status_code for _ in range(3)]
+        self.assertEqual(statuses[-1], 429)
+        other_ip = self.client.post(reverse('account_login'), data, REMOTE_ADDR='10.0.0.2')
+        self.assertNotEqual(other_ip.status_code, 429)
+
+    @override_settings(RATE_LIMIT_ENABLED=False)
+    def test_disabled(self):
+        statuses = [self.client.get(reverse('search_post')).status_code for _ in range(3)]
+        self.assertEqual(statuses, [200, 200, 200])
+
+    def test_parallel_create_post(self):
+        """Отправка, пришедшая, пока первая еще сохраняется, не проходит лимит вместе с ней"""
+        data = {'title': 'Новый пост', 'author': self.author.pk, 'postType': 'NS', 'content': 'текст',
+                'category': [self.category.pk]}
+        is_valid, parallel = PostCreateForm.is_valid, []
+
+        def is_valid_with_parallel_post(form):
+            if not parallel:  # одна параллельная отправка, пока первая проверяет форму
+                parallel.append(None)
+                parallel[0] = self.client.post(reverse('create_post'), data)
+            return is_valid(form)
+
+        with mock.patch('news_portal.signals.send_notify_to_subscribers'):
+            self.client.post(reverse('create_post'), data)  # остается место для одной публикации
+            with mock.patch.object(PostCreateForm, 'is_valid', is_valid_with_parallel_post):
+                self.client.post(reverse('create_post'), data)
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertTemplateUsed(parallel[0], 'posts_limit.html')
@@ -0,0 +1,57 @@
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from news_portal.models import Post, Author, Comment
+from io import StringIO
+import tempfile
+import os
+
+
+class RatingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author_user = User.objects.create_user(username='authoruser', password='testpass123')
+        cls.reader = User.objects.create_user(username='reader', password='testpass123')
+        cls.author = Author.objects.create(user=cls.author_user)
+        cls.reader_author = Author.objects.create(user=cls.reader)
+
+        cls.post1 = Post.objects.create(author=cls.author, title='Пост 1', content='текст', raiting=2)
+        cls.post2 = Post.objects.create(author=cls.author, title='Пост 2', content='текст', raiting=-1)
+        Comment.objects.create(post=cls.post1, user=cls.reader, comment_text='к', raiting=4)
+        Comment.objects.create(post=cls.post2, user=cls.author_user, comment_text='к', raiting=5)
+
+    def setUp(self):
+        fd, self.state_file = tempfile.mkstemp()
+        os.close(fd)
+        os.remove(self.state_file)
+        self.addCleanup(lambda: os.path.exists(self.state_file) and os.remove(self.state_file))
+
+    def test_update_rating(self):
+        # (2-1)*3 + 5 (свой коммент) + (4+5) (комменты к постам)
+        self.author.update_rating()
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.raiting, 17)
+
+    def test_update_rating_without_posts(self):
+        self.reader_author.update_rating()
+        self.reader_author.refresh_from_db()
+        self.assertEqual(self.reader_author.raiting, 4)
+
+    def test_recompute_ratings_command(self):
+        with override_settings(RECOMPUTE_RATINGS_STATE_FILE=self.state_file):
+            call_command('recompute_ratings', stdout=StringIO())
+            self.author.refresh_from_db()
+            self.reader_author.refresh_from_db()
+            self.assertEqual((self.author.raiting, self.reader_author.raiting), (17, 4))
+
+            # без изменений после последнего запуска пересчитывать нечего
+            Author.objects.update(raiting=0)
+            out = StringIO()
+            call_command('recompute_ratings', changed=True, stdout=out)
+            self.assertIn('Обновлен рейтинг авторов: 0', out.getvalue())
+
+            Comment.objects.create(post=self.post1, user=self.reader, comment_text='к', raiting=1)
+            call_command('recompute_ratings', changed=True, stdout=StringIO())
+            self.author.refresh_from_db()
+            self.reader_author.refresh_from_db()
+            self.assertEqual((self.author.raiting, self.reader_author.raiting), (18, 5))
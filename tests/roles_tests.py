@@ -0,0 +1,103 @@
+from djangoProject_News_Portal.cache_config import clear_all
+from django.db import connection
+from django.db.models.signals import m2m_changed, pre_delete
+import time
+from unittest import mock
+from django.conf import settings
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth.models import User, Group, Permission
+from django.urls import reverse
+from news_portal.roles import get_roles
+
+
+class UserRolesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.group = Group.objects.create(name='authors')
+        cls.group.permissions.add(Permission.objects.get(codename='add_post'))
+        cls.user = User.objects.create_user(username='testuser', password='testpass123')
+        cls.user.user_permissions.add(Permission.objects.get(codename='view_post'))
+
+    def setUp(self):
+        clear_all()
+
+    def roles(self):
+        return get_roles(User.objects.get(pk=self.user.pk))  # новый объект - без кэша на уровне запроса
+
+    def test_loaded_with_one_query_and_cached(self):
+        self.user.groups.add(self.group)
+        user = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(1):
+            roles = get_roles(user)
+        self.assertTrue(roles.is_author)
+        self.assertEqual(roles.permissions, {'news_portal.add_post', 'news_portal.view_post'})
+        self.assertTrue(roles.has_perm('news_portal.add_post'))
+        self.assertFalse(roles.has_perm('news_portal.delete_post'))
+        user = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(0):
+            get_roles(user)
+
+    def test_invalidation_on_group_changes(self):
+        self.assertFalse(self.roles().is_author)
+        self.group.user_set.add(self.user)  # обратная сторона m2m
+        self.assertTrue(self.roles().is_author)
+        self.user.groups.clear()
+        self.assertFalse(self.roles().is_author)
+        self.user.groups.add(self.group)
+        self.group.permissions.add(Permission.objects.get(codename='delete_post'))
+        self.assertIn('news_portal.delete_post', self.roles().permissions)
+        self.group.delete()
+        self.assertEqual(self.roles().groups, frozenset())
+
+    def test_locmem_cache_is_short(self):
+        # группа добавлена в другом воркере: сигнал сбросил только его locmem-кэш
+        self.assertFalse(self.roles().is_author)
+        User.groups.through.objects.create(user=self.user, group=self.group)
+        self.assertFalse(self.roles().is_author)
+        self.assertLessEqual(settings.ROLES_CACHE_TIMEOUT, 5)
+        now = time.time() + settings.ROLES_CACHE_TIMEOUT + 1
+        with mock.patch('django.core.cache.backends.locmem.time.time', return_value=now):
+            self.assertTrue(self.roles().is_author)
+
+    def test_request_during_clear_does_not_recache(self):
+        """Запрос между сбросом кэша и удалением строк не оставляет в кэше старые группы"""
+        def request_before_delete(action, **kwargs):
+            if action == 'pre_clear':
+                self.roles()
+
+        def request_before_group_delete(**kwargs):
+            self.roles()
+
+        self.user.groups.add(self.group)
+        self.group.permissions.add(Permission.objects.get(codename='delete_post'))
+        for through in (User.groups.through, Group.permissions.through):
+            m2m_changed.connect(request_before_delete, sender=through)
+            self.addCleanup(m2m_changed.disconnect, request_before_delete, sender=through)
+        Permission.objects.get(codename='delete_post').group_set.clear()
+        self.assertNotIn('news_portal.delete_post', self.roles().permissions)
+        self.group.user_set.clear()
+        self.assertFalse(self.roles().is_author)
+        self.user.groups.add(self.group)
+        self.user.groups.clear()
+        self.assertFalse(self.roles().is_author)
+
+        self.user.groups.add(self.group)
+        pre_delete.connect(request_before_group_delete, sender=Group)
+        self.addCleanup(pre_delete.disconnect, request_before_group_delete, sender=Group)
+        self.group.delete()
+        self.assertEqual(self.roles().groups, frozenset())
+
+    def test_no_group_queries_on_pages(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse('main_page'))
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('main_page'))
+        self.assertTrue(response.context['is_not_author'])
+        sql = ' '.join(q['sql'] for q in ctx.captured_queries)
+        self.assertNotIn('"auth_group"', sql)
+        self.assertNotIn('"auth_permission"', sql)
+
+        self.client.get(reverse('add_to_authors'))
+        response = self.client.get(reverse('main_page'))
+        self.assertFalse(response.context['is_not_author'])
@@ -0,0 +1,64 @@
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User, Permission
+from django.urls import reverse
+from news_portal import search
+from news_portal.models import Post, Author
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='testuser', password='testpass123')
+        cls.author = Author.objects.create(user=cls.user, )
+        cls.other = Author.objects.create(user=User.objects.create_user(username='иванов', password='x'))
+        cls.news = Post.objects.create(author=cls.author, title='Новые технологии в науке', content='текст')
+        cls.science = Post.objects.create(author=cls.other, title='Научная технология', content='текст')
+        cls.sport = Post.objects.create(author=cls.other, title='Спортивные новости', content='текст')
+
+    def titles(self, **params):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('search_post'), params)
+        return [post.title for post in response.context['filter'].qs]
+
+    def test_stemming(self):
+        self.assertEqual(search.stem_ru('технологии'), search.stem_ru('технология'))
+        self.assertEqual(search.stem_ru('новости'), search.stem_ru('новость'))
+
+    def test_word_forms(self):
+        self.assertCountEqual(self.titles(search_title='технологиями'),
+                              ['Новые технологии в науке', 'Научная технология'])
+        self.assertEqual(self.titles(search_title='новость'), ['Спортивные новости'])
+
+    def test_author_and_title(self):
+        self.assertEqual(self.titles(search_title='технология', search_author='иванов'), ['Научная технология'])
+        self.assertEqual(self.titles(search_title='спорт', search_author='testuser'), [])
+
+    def test_index_follows_writes(self):
+        post = Post.objects.create(author=self.author, title='Космические полеты', content='текст')
+        self.assertEqual(self.titles(search_title='космос'), [])
+        self.assertEqual(self.titles(search_title='космический'), ['Космические полеты'])
+        post.title = 'Морские полеты'
+        post.save()
+        self.assertEqual(self.titles(search_title='космический'), [])
+        post.delete()
+        self.assertEqual(self.titles(search_title='полет'), [])
+
+    def test_edit_post_reindexes(self):  # edit_post пишет через update() без post_save
+        self.user.user_permissions.add(Permission.objects.get(codename='change_post'))
+        self.client.force_login(self.user)
+        response = self.client.post(reverse('edit_post', args=[self.news.pk]),
+                                    {'title': 'Космические полеты', 'content': 'новый текст'})
+        self.assertContains(response, 'Изменения успешно сохранены.')
+        self.assertEqual(self.titles(search_title='космический'), ['Космические полеты'])
+        self.assertEqual(self.titles(search_title='технологиями'), ['Научная технология'])
+
+    def test_rebuild(self):
+        search.drop_index()
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.titles(search_title='спортивный'), ['Спортивные новости'])
+
+    @override_settings(SEARCH_BACKEND='regex')
+    def test_regex_fallback(self):
+        self.assertEqual(self.titles(search_title='^Спорт'), ['Спортивные новости'])
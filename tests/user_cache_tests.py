@@ -0,0 +1,52 @@
+from djangoProject_News_Portal.cache_config import clear_all
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth.models import User
+from django.urls import reverse
+
+
+@override_settings(AUTH_USER_CACHE=True, SESSION_ENGINE='django.contrib.sessions.backends.cached_db')
+class CachedAuthTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='testuser', password='testpass123')
+
+    def setUp(self):
+        clear_all()
+        self.client.force_login(self.user)
+
+    def auth_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('main_page'))
+        self.assertEqual(response.status_code, 200)
+        return [q['sql'] for q in queries.captured_queries
+                if 'FROM "django_session"' in q['sql'] or 'FROM "auth_user" WHERE "auth_user"."id" =' in q['sql']]
+
+    def test_session_and_user_from_cache(self):
+        self.auth_queries()
+        self.assertEqual(self.auth_queries(), [])
+        self.assertEqual(self.client.get(reverse('main_page')).context['user'], self.user)
+
+    @override_settings(AUTH_USER_CACHE=False, SESSION_ENGINE='django.contrib.sessions.backends.db')
+    def test_disabled(self):
+        self.client.force_login(self.user)
+        self.auth_queries()
+        self.assertEqual(len(self.auth_queries()), 2)  # сессия и пользователь из базы на каждый запрос
+
+    def test_password_change_ends_sessions(self):
+        self.auth_queries()
+        user = User.objects.get(pk=self.user.pk)
+        user.set_password('новый пароль')
+        user.save()  # сигнал сбрасывает пользователя в кэше, хэш сессии больше не совпадает
+        response = self.client.get(reverse('main_page'))
+        self.assertEqual(response.status_code, 302)
+
+    def test_deactivated_user_logged_out(self):
+        self.auth_queries()
+        user = User.objects.get(pk=self.user.pk)
+        user.is_active = False
+        user.save()
+        self.assertEqual(self.client.get(reverse('main_page')).status_code, 302)
+        user.delete()
+        self.assertEqual(self.client.get(reverse('main_page')).status_code, 302)
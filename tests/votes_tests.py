@@ -0,0 +1,110 @@
+from unittest import mock
+from djangoProject_News_Portal.cache_config import clear_all
+from django.db import DatabaseError
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from news_portal.models import Post, Author, Comment
+from news_portal import votes
+from news_portal.votes import flush_votes
+
+
+class VoteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='authoruser', password='testpass123')
+        cls.author = Author.objects.create(user=cls.user)
+        cls.post = Post.objects.create(author=cls.author, title='Пост 1', content='текст')
+        cls.comment = Comment.objects.create(post=cls.post, user=cls.user, comment_text='к')
+
+    def setUp(self):
+        clear_all()
+
+    def test_like_is_atomic(self):
+        stale = Post.objects.get(pk=self.post.pk)  # устаревшая копия объекта
+        self.post.like()
+        stale.like()
+        stale.dislike()
+        self.post.like()
+        self.assertEqual(Post.objects.get(pk=self.post.pk).raiting, 2)
+
+    def test_stale_save_keeps_votes(self):
+        stale = Post.objects.get(pk=self.post.pk)
+        self.post.like()
+        stale.title = 'Новый заголовок'
+        stale.save()
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertEqual((post.title, post.raiting), ('Новый заголовок', 1))
+
+    def test_explicit_edit_is_saved(self):
+        post = Post.objects.get(pk=self.post.pk)
+        post.raiting = 42  # правка рейтинга в админке или shell
+        post.save()
+        self.assertEqual(Post.objects.get(pk=self.post.pk).raiting, 42)
+
+    def test_save_after_like_keeps_other_votes(self):
+        post = Post.objects.get(pk=self.post.pk)
+        post.like()
+        Post.objects.get(pk=self.post.pk).like()
+        post.title = 'Новый заголовок'
+        post.save()
+        self.assertEqual(Post.objects.get(pk=self.post.pk).raiting, 2)
+
+    def test_like_does_not_rewrite_content(self):
+        stale = Post.objects.get(pk=self.post.pk)
+        Post.objects.filter(pk=self.post.pk).update(content='новый текст')
+        stale.like()
+        self.assertEqual(Post.objects.get(pk=self.post.pk).content, 'новый текст')
+
+    @override_settings(VOTES_BUFFERED=True)
+    def test_buffered_votes(self):
+        for _ in range(5):
+            self.post.like()
+        self.post.dislike()
+        self.comment.dislike()
+        self.assertEqual(Post.objects.get(pk=self.post.pk).raiting, 0)
+
+        self.assertEqual(flush_votes('news_portal.post'), 1)
+        self.assertEqual(flush_votes('news_portal.comment'), 1)
+        self.assertEqual(Post.objects.get(pk=self.post.pk).raiting, 4)
+        self.assertEqual(Comment.objects.get(pk=self.comment.pk).raiting, -1)
+
+        # повторный сброс ничего не меняет
+        self.assertEqual(flush_votes('news_portal.post'), 0)
+        self.assertEqual(Post.objects.get(pk=self.post.pk).raiting, 4)
+
+    @override_settings(VOTES_BUFFERED=True)
+    def test_votes_during_flush_are_kept(self):
+        second = Post.objects.create(author=self.author, title='Пост 2', content='текст')
+        self.post.like()
+        second.like()
+        touch = votes.cache.touch
+
+        def vote_after_read(*args, **kwargs):  # голос между чтением суммы и ее вычитанием
+            self.post.like()
+            return touch(*args, **kwargs)
+
+        with mock.patch.object(votes.cache, 'touch', side_effect=vote_after_read):
+            self.assertEqual(flush_votes('news_portal.post'), 2)
+        self.assertEqual(Post.objects.get(pk=self.post.pk).raiting, 1)
+        self.assertEqual(flush_votes('news_portal.post'), 1)
+        self.assertEqual(Post.objects.get(pk=self.post.pk).raiting, 3)
+        self.assertEqual(Post.objects.get(pk=second.pk).raiting, 1)
+        self.assertEqual(flush_votes('news_portal.post'), 0)
+
+    @override_settings(VOTES_BUFFERED=True)
+    def test_failed_flush_keeps_votes(self):
+        self.post.like()
+        with mock.patch('django.db.models.query.QuerySet.update', side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                flush_votes('news_portal.post')
+        self.assertEqual(flush_votes('news_portal.post'), 1)
+        self.assertEqual(Post.objects.get(pk=self.post.pk).raiting, 1)
+
+    @override_settings(VOTES_BUFFERED=True)
+    def test_unfinished_registration(self):
+        tail = votes._journal_key('news_portal.post', 'tail')
+        votes.cache.set(tail, 1)  # номер журнала выдан, но объект в него не записан
+        self.post.like()
+        self.assertEqual(flush_votes('news_portal.post'), 0)  # ждет пропущенный номер до следующего сброса
+        self.assertEqual(flush_votes('news_portal.post'), 1)
+        self.assertEqual(Post.objects.get(pk=self.post.pk).raiting, 1)